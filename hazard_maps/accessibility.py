@@ -0,0 +1,236 @@
+"""
+Precomputed facility-accessibility rasters for the whole province.
+
+A batch job (``build_accessibility_rasters``) turns the local Facility
+table into a regular UTM 51N grid holding, per cell:
+
+- the distance to the nearest evacuation site, medical facility and
+  fire station (Euclidean distance transform), and
+- the number of facilities of each group within 3 km (focal count).
+
+Rasters are plain ``.npy`` files opened memory-mapped, so the
+accessibility and infrastructure parts of the suitability score become
+array lookups with no Overpass round trip.
+"""
+import json
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from scipy import ndimage
+from scipy.signal import fftconvolve
+
+from .spatial import UTM_SRID, province_bbox, to_utm
+from .utils import FACILITY_GROUPS, facility_group
+
+DEFAULT_CELL_M = 100
+COUNT_RADIUS_M = 3000
+
+# Extra room around the province so coastal cells see offshore-island facilities
+MARGIN_M = 5000
+
+# Nearest-facility distance layers: layer name -> facility types
+DISTANCE_LAYERS = {
+    'dist_evacuation': FACILITY_GROUPS['evacuation'],
+    'dist_medical': FACILITY_GROUPS['medical'],
+    'dist_fire_station': ['fire_station'],
+}
+
+# Focal-count layers: layer name -> facility group (None counts everything)
+COUNT_LAYERS = {
+    'count_evacuation': 'evacuation',
+    'count_medical': 'medical',
+    'count_emergency_services': 'emergency_services',
+    'count_essential': 'essential',
+    'count_total': None,
+}
+
+METADATA_FILE = 'metadata.json'
+
+
+def _disk_kernel(radius_cells):
+    r = int(np.ceil(radius_cells))
+    yy, xx = np.ogrid[-r:r + 1, -r:r + 1]
+    return (xx * xx + yy * yy <= radius_cells * radius_cells).astype(np.float32)
+
+
+def build_accessibility_rasters(output_dir=None, cell=DEFAULT_CELL_M, radius=COUNT_RADIUS_M, bbox=None):
+    """
+    Build the distance and focal-count rasters from the Facility table
+
+    Returns:
+        The metadata dict written next to the rasters
+    """
+    from .models import Facility
+
+    start = time.time()
+    output_dir = str(output_dir or settings.ACCESSIBILITY_RASTER_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    facilities = list(Facility.objects.values_list('facility_type', 'location'))
+    if not facilities:
+        raise ValueError("The Facility table is empty. Run 'python manage.py sync_facilities' first.")
+
+    types = np.array([t for t, _ in facilities])
+    fx, fy = to_utm([loc.x for _, loc in facilities], [loc.y for _, loc in facilities])
+    groups = np.array([facility_group(t) for t in types])
+
+    # Grid covering the province, origin at the north-west corner
+    south, west, north, east = bbox or province_bbox()
+    cx, cy = to_utm([west, east, west, east], [south, south, north, north])
+    xmin = np.floor((cx.min() - MARGIN_M) / cell) * cell
+    ymax = np.ceil((cy.max() + MARGIN_M) / cell) * cell
+    width = int(np.ceil((cx.max() + MARGIN_M - xmin) / cell))
+    height = int(np.ceil((ymax - (cy.min() - MARGIN_M)) / cell))
+
+    cols = np.floor((fx - xmin) / cell).astype(np.int64)
+    rows = np.floor((ymax - fy) / cell).astype(np.int64)
+    inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+
+    print(f"🗺️ Accessibility grid: {width} x {height} cells at {cell} m, "
+          f"{int(inside.sum())} of {len(facilities)} facilities inside")
+
+    layers = {}
+
+    for name, facility_types in DISTANCE_LAYERS.items():
+        selected = inside & np.isin(types, facility_types)
+        if not selected.any():
+            layers[name] = np.full((height, width), np.inf, dtype=np.float32)
+            continue
+        seeds = np.ones((height, width), dtype=bool)
+        seeds[rows[selected], cols[selected]] = False
+        layers[name] = ndimage.distance_transform_edt(seeds, sampling=cell).astype(np.float32)
+
+    kernel = _disk_kernel(radius / cell)
+    for name, group in COUNT_LAYERS.items():
+        selected = inside if group is None else inside & (groups == group)
+        counts = np.zeros((height, width), dtype=np.float32)
+        np.add.at(counts, (rows[selected], cols[selected]), 1)
+        if selected.any():
+            counts = fftconvolve(counts, kernel, mode='same')
+        layers[name] = np.clip(np.rint(counts), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+
+    # Write to temporary names first so readers never see a half-written set
+    for name, array in layers.items():
+        tmp_path = os.path.join(output_dir, f"{name}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(output_dir, f"{name}.npy"))
+
+    metadata = {
+        'srid': UTM_SRID,
+        'x0': float(xmin),
+        'y0': float(ymax),
+        'cell': float(cell),
+        'width': width,
+        'height': height,
+        'count_radius': float(radius),
+        'facility_count': len(facilities),
+        'layers': sorted(layers),
+        'version': int(time.time()),
+    }
+    tmp_path = os.path.join(output_dir, METADATA_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, METADATA_FILE))
+
+    print(f"✅ Accessibility rasters written to {output_dir} ({time.time() - start:.1f}s)")
+    return metadata
+
+
+class AccessibilityRasters:
+    """Memory-mapped view of the accessibility rasters"""
+
+    def __init__(self, directory, metadata):
+        self.directory = directory
+        self.metadata = metadata
+        self.x0 = metadata['x0']
+        self.y0 = metadata['y0']
+        self.cell = metadata['cell']
+        self.shape = (metadata['height'], metadata['width'])
+        self.version = metadata['version']
+        self.layers = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in metadata['layers']
+        }
+
+    def cell_index(self, lats, lngs):
+        """Return (rows, cols, inside) for coordinate arrays"""
+        x, y = to_utm(np.atleast_1d(lngs), np.atleast_1d(lats))
+        cols = np.floor((x - self.x0) / self.cell).astype(np.int64)
+        rows = np.floor((self.y0 - y) / self.cell).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+    def sample(self, layer, lats, lngs):
+        """Vectorized lookup of one layer; NaN outside the grid"""
+        rows, cols, inside = self.cell_index(lats, lngs)
+        values = np.asarray(self.layers[layer][rows, cols], dtype=np.float64)
+        values[~inside] = np.nan
+        return values
+
+    def nearby_facilities(self, lat, lng):
+        """
+        Facility summary for one point in the shape calculate_suitability_score
+        expects, or None if the point lies outside the grid
+        """
+        rows, cols, inside = self.cell_index([lat], [lng])
+        if not inside[0]:
+            return None
+        row, col = rows[0], cols[0]
+
+        def summary(layer):
+            distance = float(self.layers[layer][row, col])
+            if not np.isfinite(distance):
+                return None
+            return {
+                'name': None,
+                'distance': f"{round(distance / 1000, 2)} km",
+                'distance_meters': distance,
+                'duration': 'N/A',
+                'is_walkable': distance <= 500,
+            }
+
+        return {
+            'summary': {
+                'nearest_evacuation': summary('dist_evacuation'),
+                'nearest_hospital': summary('dist_medical'),
+                'nearest_fire_station': summary('dist_fire_station'),
+            },
+            'counts': {
+                'evacuation': int(self.layers['count_evacuation'][row, col]),
+                'medical': int(self.layers['count_medical'][row, col]),
+                'emergency_services': int(self.layers['count_emergency_services'][row, col]),
+                'essential': int(self.layers['count_essential'][row, col]),
+                'total': int(self.layers['count_total'][row, col]),
+            },
+            'source': 'accessibility_raster',
+        }
+
+
+_raster_cache = {'mtime': None, 'rasters': None}
+
+
+def get_accessibility_rasters():
+    """
+    Return the rasters from settings.ACCESSIBILITY_RASTER_DIR, or None if
+    they have not been built. Reopens them after a rebuild.
+    """
+    directory = str(settings.ACCESSIBILITY_RASTER_DIR)
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    try:
+        mtime = os.path.getmtime(metadata_path)
+    except OSError:
+        return None
+
+    if _raster_cache['rasters'] is None or _raster_cache['mtime'] != mtime:
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            _raster_cache['rasters'] = AccessibilityRasters(directory, metadata)
+            _raster_cache['mtime'] = mtime
+        except Exception as e:
+            print(f"⚠️ Could not open accessibility rasters: {e}")
+            return None
+
+    return _raster_cache['rasters']
@@ -0,0 +1,132 @@
+"""
+Barangay adjacency graph and side-by-side neighbour summaries.
+
+Neighbours are found once per boundary ingest with a self-join on the GiST
+index (``&&`` then ``ST_Intersects``, which also tolerates the small
+overlaps common in digitised boundaries) and stored in BarangayAdjacency
+with the length of the shared boundary, so selecting a barangay never has
+to run ``ST_Touches`` over large multipolygons. Where two boundaries
+overlap, their intersection is a thin sliver rather than a line, and half
+its perimeter is counted as the shared length.
+"""
+import time
+
+from django.db import connection, transaction
+
+from .exposure import DEFAULT_EXPOSED_LEVELS
+from .models import (
+    BarangayAdjacency, BarangayBoundaryNew, BarangayCharacteristic, BarangayHazardExposure, BarangayValuation,
+)
+from .spatial import UTM_SRID
+from .subdivided import HAZARD_SOURCES
+from .valuation import ALL_CLASSES
+
+
+def refresh_barangay_adjacency():
+    """Rebuild the adjacency table; returns the number of (directed) pairs"""
+    qn = connection.ops.quote_name
+    start = time.time()
+    with transaction.atomic(), connection.cursor() as cursor:
+        BarangayAdjacency.objects.all().delete()
+        cursor.execute(f"""
+            WITH b AS (
+                SELECT DISTINCT ON (adm4_pcode) adm4_pcode, adm4_en, adm3_en, geometry
+                FROM {qn(BarangayBoundaryNew._meta.db_table)}
+                WHERE active
+                ORDER BY adm4_pcode, id DESC
+            ),
+            pairs AS (
+                SELECT a.adm4_pcode AS a_code, n.adm4_pcode AS n_code,
+                       a.adm4_en AS a_name, a.adm3_en AS a_municipality,
+                       n.adm4_en AS n_name, n.adm3_en AS n_municipality,
+                       ST_Length(ST_CollectionExtract(i.shared, 2))
+                           + ST_Perimeter(ST_CollectionExtract(i.shared, 3)) / 2 AS length
+                FROM b a
+                JOIN b n ON a.adm4_pcode < n.adm4_pcode
+                        AND a.geometry && n.geometry
+                        AND ST_Intersects(a.geometry, n.geometry)
+                CROSS JOIN LATERAL (
+                    SELECT ST_Transform(ST_Intersection(a.geometry, n.geometry), {UTM_SRID}) AS shared
+                ) i
+            )
+            INSERT INTO {qn(BarangayAdjacency._meta.db_table)}
+                (adm4_pcode, neighbor_pcode, neighbor_name, neighbor_municipality, shared_length_m)
+            SELECT a_code, n_code, n_name, n_municipality, length FROM pairs
+            UNION ALL
+            SELECT n_code, a_code, a_name, a_municipality, length FROM pairs
+        """)
+        rows = cursor.rowcount
+
+    print(f"🧭 Refreshed barangay adjacency: {rows} neighbour pairs ({time.time() - start:.1f}s)")
+    return rows
+
+
+def _summaries(codes):
+    """Hazard, characteristics and zonal summaries of many barangays, one query per table"""
+    summaries = {code: {'hazards': {}, 'characteristics': None, 'zonal_values': None} for code in codes}
+
+    exposure = BarangayHazardExposure.objects.filter(adm4_pcode__in=codes).values_list(
+        'adm4_pcode', 'hazard_type', 'susceptibility', 'percentage',
+    )
+    for code, hazard_type, level, percentage in exposure:
+        hazard = summaries[code]['hazards'].setdefault(hazard_type, {'exposed_percentage': 0, 'classes': {}})
+        hazard['classes'][level] = round(percentage, 2)
+        if level in DEFAULT_EXPOSED_LEVELS[hazard_type]:
+            hazard['exposed_percentage'] = round(hazard['exposed_percentage'] + percentage, 2)
+
+    characteristics = BarangayCharacteristic.objects.filter(barangay_code__in=codes).values(
+        'barangay_code', 'population', 'ecological_landscape', 'urbanization',
+        'cellular_signal', 'public_street_sweeper',
+    )
+    for row in characteristics:
+        summaries[row.pop('barangay_code')]['characteristics'] = row
+
+    valuations = BarangayValuation.objects.filter(barangay_code__in=codes, land_class=ALL_CLASSES).values(
+        'barangay_code', 'entry_count', 'avg_price', 'median_price', 'min_price', 'max_price',
+    )
+    for row in valuations:
+        code = row.pop('barangay_code')
+        summaries[code]['zonal_values'] = {
+            key: round(value, 2) if isinstance(value, float) else value for key, value in row.items()
+        }
+
+    return summaries
+
+
+def barangay_neighbors(adm4_pcode):
+    """
+    The barangay and its neighbours with their summaries, longest shared
+    boundary first; None if the barangay has no boundary loaded
+    """
+    barangay = BarangayBoundaryNew.objects.active().filter(adm4_pcode=adm4_pcode).order_by('-id').values(
+        'adm4_en', 'adm3_en', 'adm3_pcode',
+    ).first()
+    if barangay is None:
+        return None
+
+    neighbors = list(BarangayAdjacency.objects.filter(adm4_pcode=adm4_pcode).order_by('-shared_length_m').values(
+        'neighbor_pcode', 'neighbor_name', 'neighbor_municipality', 'shared_length_m',
+    ))
+    summaries = _summaries([adm4_pcode] + [n['neighbor_pcode'] for n in neighbors])
+
+    return {
+        'barangay': {
+            'name': barangay['adm4_en'],
+            'code': adm4_pcode,
+            'municipality': barangay['adm3_en'],
+            'municipality_code': barangay['adm3_pcode'],
+            **summaries[adm4_pcode],
+        },
+        'neighbors': [
+            {
+                'name': n['neighbor_name'],
+                'code': n['neighbor_pcode'],
+                'municipality': n['neighbor_municipality'],
+                'shared_boundary_m': round(n['shared_length_m'], 1),
+                **summaries[n['neighbor_pcode']],
+            }
+            for n in neighbors
+        ],
+        'hazard_types': list(HAZARD_SOURCES),
+        'exposed_levels': DEFAULT_EXPOSED_LEVELS,
+    }
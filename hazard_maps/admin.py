@@ -1,13 +1,13 @@
 from django.contrib import admin
 from django.contrib.gis.admin import GISModelAdmin
-from .models import HazardDataset, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility, BarangayBoundaryNew, MunicipalityCharacteristic, BarangayCharacteristic, ZonalValue
+from .models import HazardDataset, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility, BarangayBoundaryNew, MunicipalityCharacteristic, BarangayCharacteristic, ZonalValue, SubdividedHazard, BarangayHazardExposure, BarangayValuation, HazardDatasetDiff, HazardChange, BarangayAdjacency, IngestJob
 
 @admin.register(HazardDataset)
 class HazardDatasetAdmin(admin.ModelAdmin):
-    list_display = ['name', 'dataset_type', 'upload_date', 'file_name']
-    list_filter = ['dataset_type', 'upload_date']
+    list_display = ['name', 'dataset_type', 'status', 'version', 'upload_date', 'file_name']
+    list_filter = ['dataset_type', 'status', 'upload_date']
     search_fields = ['name', 'file_name']
-    readonly_fields = ['upload_date']
+    readonly_fields = ['upload_date', 'status', 'version', 'activated_at']
 
 @admin.register(FloodSusceptibility)
 class FloodSusceptibilityAdmin(GISModelAdmin):
@@ -128,4 +128,50 @@ class ZonalValueAdmin(admin.ModelAdmin):
     
     def get_price_display(self, obj):
         return obj.get_price_display()
-    get_price_display.short_description = 'Price Display'
\ No newline at end of file
+    get_price_display.short_description = 'Price Display'
+
+
+@admin.register(SubdividedHazard)
+class SubdividedHazardAdmin(GISModelAdmin):
+    list_display = ['hazard_type', 'susceptibility', 'source_id', 'dataset']
+    list_filter = ['hazard_type', 'susceptibility', 'dataset']
+
+
+@admin.register(BarangayHazardExposure)
+class BarangayHazardExposureAdmin(admin.ModelAdmin):
+    list_display = ['adm4_en', 'adm3_en', 'hazard_type', 'susceptibility', 'percentage', 'population_exposed']
+    list_filter = ['hazard_type', 'susceptibility', 'adm3_en']
+    search_fields = ['adm4_en', 'adm4_pcode', 'adm3_en']
+
+
+@admin.register(BarangayValuation)
+class BarangayValuationAdmin(admin.ModelAdmin):
+    list_display = ['barangay_name', 'municipality', 'land_class', 'entry_count', 'avg_price', 'flood_value_at_risk']
+    list_filter = ['land_class', 'municipality']
+    search_fields = ['barangay_name', 'barangay_code', 'municipality']
+
+
+@admin.register(HazardDatasetDiff)
+class HazardDatasetDiffAdmin(admin.ModelAdmin):
+    list_display = ['id', 'hazard_type', 'old_dataset', 'new_dataset', 'status', 'change_count', 'created_at']
+    list_filter = ['hazard_type', 'status']
+
+
+@admin.register(HazardChange)
+class HazardChangeAdmin(GISModelAdmin):
+    list_display = ['adm4_en', 'adm3_en', 'change_type', 'old_level', 'new_level', 'area_sqm', 'diff']
+    list_filter = ['change_type', 'diff']
+    search_fields = ['adm4_en', 'adm4_pcode']
+
+
+@admin.register(BarangayAdjacency)
+class BarangayAdjacencyAdmin(admin.ModelAdmin):
+    list_display = ['adm4_pcode', 'neighbor_name', 'neighbor_municipality', 'shared_length_m']
+    search_fields = ['adm4_pcode', 'neighbor_pcode', 'neighbor_name']
+
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'file_name', 'dataset_type', 'status', 'stage', 'features_processed', 'error_count', 'created_at']
+    list_filter = ['status', 'dataset_type']
+    search_fields = ['file_name']
@@ -0,0 +1,161 @@
+"""
+Hazard exposure of linear infrastructure (roads, pipelines, power lines).
+
+All lines are sent to PostGIS in one statement and intersected with the
+three hazard layers at once (a UNION ALL over the subdivided pieces, or
+the original polygons for layers not yet subdivided). Lengths are summed
+per line, layer and class in UTM 51N, and the intersecting segments come
+back merged per class.
+"""
+import json
+import time
+
+from django.db import connection
+
+from .spatial import UTM_SRID
+from .subdivided import HAZARD_SOURCES, overlay_source
+
+MAX_LINES = 500
+MAX_TOTAL_LENGTH_KM = 500
+
+LEVEL_ORDER = ['LS', 'MS', 'HS', 'VHS', 'DF']
+
+# Classes a corridor should avoid: layer -> classes
+CRITICAL_CLASSES = {
+    'flood': ['HS', 'VHS'],
+    'landslide': ['DF'],
+}
+
+
+def line_length_m(line):
+    return line.transform(UTM_SRID, clone=True).length
+
+
+def _exposure_rows(lines, with_segments):
+    """
+    (line index, hazard type, level, metres, merged segment GeoJSON) rows,
+    plus one (line index, None, None, metres, None) row per line with the
+    length inside any critical class, each metre counted once
+    """
+    hazard_selects = []
+    params = [[line.ewkt for line in lines]]
+    for hazard_type in HAZARD_SOURCES:
+        source = overlay_source(hazard_type)
+        hazard_selects.append(f"""
+            SELECT %s AS hazard_type, h.{source['column']} AS level, h.geometry
+            FROM {source['table']} h
+            WHERE TRUE {source['where']}
+        """)
+        params += [hazard_type] + source['params']
+
+    critical = [f"{hazard_type}:{level}" for hazard_type, levels in CRITICAL_CLASSES.items() for level in levels]
+    segments = "ST_AsGeoJSON(ST_LineMerge(ST_Union(p.geom)), 6)" if with_segments else "NULL"
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH lines AS (
+                SELECT t.ord - 1 AS line_id, ST_GeomFromEWKT(t.ewkt) AS geom
+                FROM unnest(%s::text[]) WITH ORDINALITY AS t(ewkt, ord)
+            ),
+            hazards AS ({' UNION ALL '.join(hazard_selects)}),
+            pieces AS (
+                SELECT l.line_id, z.hazard_type, z.level,
+                       ST_CollectionExtract(ST_Intersection(l.geom, z.geometry), 2) AS geom
+                FROM lines l
+                JOIN hazards z ON z.geometry && l.geom AND ST_Intersects(z.geometry, l.geom)
+            )
+            SELECT p.line_id, p.hazard_type, p.level,
+                   ST_Length(ST_Transform(ST_Union(p.geom), {UTM_SRID})),
+                   {segments}
+            FROM pieces p
+            WHERE NOT ST_IsEmpty(p.geom)
+            GROUP BY p.line_id, p.hazard_type, p.level
+            UNION ALL
+            SELECT p.line_id, NULL, NULL,
+                   ST_Length(ST_Transform(ST_Union(p.geom), {UTM_SRID})),
+                   NULL
+            FROM pieces p
+            WHERE NOT ST_IsEmpty(p.geom) AND p.hazard_type || ':' || p.level = ANY(%s::text[])
+            GROUP BY p.line_id
+        """, params + [critical])
+        return cursor.fetchall()
+
+
+def corridor_exposure(lines, names=None, with_segments=True):
+    """
+    Per-class exposure lengths for WGS84 LineStrings/MultiLineStrings
+
+    Args:
+        lines: GEOS line geometries
+        names: optional display name per line
+        with_segments: include the intersecting segments as GeoJSON features
+    """
+    start = time.time()
+    names = names or [None] * len(lines)
+    lengths = [line_length_m(line) for line in lines]
+
+    results = [
+        {
+            'line_id': i,
+            'name': names[i] or f"Line {i + 1}",
+            'length_m': round(lengths[i], 1),
+            'hazards': {hazard_type: {} for hazard_type in HAZARD_SOURCES},
+            'critical_length_m': 0,
+        }
+        for i in range(len(lines))
+    ]
+    features = []
+
+    for line_id, hazard_type, level, length, geojson in _exposure_rows(lines, with_segments):
+        # Overlapping source polygons can push the union past the line length
+        length = min(float(length or 0), lengths[line_id])
+        if hazard_type is None:
+            results[line_id]['critical_length_m'] = round(length, 1)
+            continue
+        results[line_id]['hazards'][hazard_type][level] = length
+        if geojson:
+            features.append({
+                'type': 'Feature',
+                'properties': {
+                    'line_id': line_id,
+                    'hazard_type': hazard_type,
+                    'level': level,
+                    'length_m': round(length, 1),
+                },
+                'geometry': json.loads(geojson),
+            })
+
+    totals = {hazard_type: {} for hazard_type in HAZARD_SOURCES}
+    for result, total_length in zip(results, lengths):
+        for hazard_type, (model, field) in HAZARD_SOURCES.items():
+            labels = dict(model._meta.get_field(field).choices)
+            by_level = result['hazards'][hazard_type]
+            for level, length in by_level.items():
+                totals[hazard_type][level] = totals[hazard_type].get(level, 0) + length
+
+            mapped = min(total_length, sum(by_level.values()))
+            result['hazards'][hazard_type] = {
+                'classes': [
+                    {
+                        'level': level,
+                        'label': labels.get(level, level),
+                        'length_m': round(by_level[level], 1),
+                        'percentage': round(by_level[level] / total_length * 100, 2) if total_length else 0,
+                    }
+                    for level in sorted(by_level, key=lambda l: LEVEL_ORDER.index(l) if l in LEVEL_ORDER else -1)
+                ],
+                'unmapped_length_m': round(total_length - mapped, 1),
+            }
+
+    return {
+        'line_count': len(lines),
+        'total_length_m': round(sum(lengths), 1),
+        'lines': results,
+        'totals': {
+            hazard_type: {level: round(length, 1) for level, length in by_level.items()}
+            for hazard_type, by_level in totals.items()
+        },
+        'critical_classes': CRITICAL_CLASSES,
+        'segments': {'type': 'FeatureCollection', 'features': features} if with_segments else None,
+        'elapsed_ms': round((time.time() - start) * 1000),
+    }
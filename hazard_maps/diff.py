@@ -0,0 +1,229 @@
+"""
+Class changes between two uploads of the same hazard layer.
+
+Both datasets are compared on their subdivided pieces, one tile at a time,
+with barangays as the tiles: within each barangay the old and new pieces
+are clipped and unioned per class, then intersected (class changes) and
+differenced (areas added or removed). Tiles run in parallel in a thread
+pool, and every changed area is stored as a HazardChange row, so the diff
+is its own layer with per-barangay statistics.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import BarangayBoundaryNew, HazardChange, HazardDatasetDiff, SubdividedHazard
+from .spatial import UTM_SRID
+from .subdivided import HAZARD_SOURCES, subdivide_dataset
+
+# Susceptibility classes from least to most severe
+LEVEL_ORDER = ['LS', 'MS', 'HS', 'VHS', 'DF']
+
+TILE_SIZE = 25  # barangays per task
+MAX_WORKERS = 4
+MIN_CHANGE_SQM = 1.0  # drops slivers from edge noise
+
+
+def _diff_tile(diff, barangay_ids):
+    """Insert the changes of a batch of barangays; returns the number of rows"""
+    qn = connection.ops.quote_name
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH b AS (
+                    SELECT id, adm4_pcode, adm4_en, adm3_pcode, adm3_en, geometry
+                    FROM {qn(BarangayBoundaryNew._meta.db_table)}
+                    WHERE id = ANY(%s)
+                ),
+                clipped AS (
+                    SELECT b.id AS bid, h.dataset_id, h.susceptibility AS level,
+                           CASE WHEN ST_CoveredBy(h.geometry, b.geometry) THEN h.geometry
+                                ELSE ST_Intersection(h.geometry, b.geometry) END AS geom
+                    FROM b
+                    JOIN {qn(SubdividedHazard._meta.db_table)} h
+                      ON h.geometry && b.geometry AND ST_Intersects(h.geometry, b.geometry)
+                    WHERE h.dataset_id IN (%s, %s)
+                ),
+                old AS (
+                    SELECT bid, level, ST_Union(geom) AS geom FROM clipped
+                    WHERE dataset_id = %s GROUP BY bid, level
+                ),
+                new AS (
+                    SELECT bid, level, ST_Union(geom) AS geom FROM clipped
+                    WHERE dataset_id = %s GROUP BY bid, level
+                ),
+                old_all AS (SELECT bid, ST_Union(geom) AS geom FROM old GROUP BY bid),
+                new_all AS (SELECT bid, ST_Union(geom) AS geom FROM new GROUP BY bid),
+                changes AS (
+                    SELECT o.bid, o.level AS old_level, n.level AS new_level,
+                           ST_Intersection(o.geom, n.geom) AS geom
+                    FROM old o
+                    JOIN new n ON n.bid = o.bid AND n.level <> o.level AND ST_Intersects(o.geom, n.geom)
+                    UNION ALL
+                    SELECT o.bid, o.level, NULL,
+                           CASE WHEN a.geom IS NULL THEN o.geom ELSE ST_Difference(o.geom, a.geom) END
+                    FROM old o LEFT JOIN new_all a ON a.bid = o.bid
+                    UNION ALL
+                    SELECT n.bid, NULL, n.level,
+                           CASE WHEN a.geom IS NULL THEN n.geom ELSE ST_Difference(n.geom, a.geom) END
+                    FROM new n LEFT JOIN old_all a ON a.bid = n.bid
+                ),
+                pieces AS (
+                    SELECT bid, old_level, new_level,
+                           ST_Multi(ST_CollectionExtract(ST_MakeValid(geom), 3)) AS geom
+                    FROM changes
+                    WHERE NOT ST_IsEmpty(geom)
+                ),
+                measured AS (
+                    SELECT p.*, ST_Area(ST_Transform(p.geom, {UTM_SRID})) AS area FROM pieces p
+                )
+                INSERT INTO {qn(HazardChange._meta.db_table)}
+                    (diff_id, adm4_pcode, adm4_en, adm3_pcode, adm3_en,
+                     change_type, old_level, new_level, area_sqm, geometry)
+                SELECT %s, b.adm4_pcode, b.adm4_en, b.adm3_pcode, b.adm3_en,
+                       CASE WHEN m.old_level IS NULL THEN 'added'
+                            WHEN m.new_level IS NULL THEN 'removed'
+                            WHEN array_position(%s::text[], m.new_level) > array_position(%s::text[], m.old_level)
+                                THEN 'upgraded'
+                            ELSE 'downgraded' END,
+                       m.old_level, m.new_level, m.area, m.geom
+                FROM measured m
+                JOIN b ON b.id = m.bid
+                WHERE m.area >= %s
+            """, [
+                barangay_ids, diff.old_dataset_id, diff.new_dataset_id,
+                diff.old_dataset_id, diff.new_dataset_id,
+                diff.id, LEVEL_ORDER, LEVEL_ORDER, MIN_CHANGE_SQM,
+            ])
+            rows = cursor.rowcount
+        HazardDatasetDiff.objects.filter(pk=diff.pk).update(tiles_done=F('tiles_done') + 1)
+        return rows
+    finally:
+        connection.close()
+
+
+def run_diff(diff_id, workers=MAX_WORKERS):
+    """Compute a pending diff; failures are recorded on the diff, not raised"""
+    diff = HazardDatasetDiff.objects.select_related('old_dataset', 'new_dataset').get(pk=diff_id)
+    start = time.time()
+    try:
+        # Both uploads need subdivided pieces (older uploads may predate them)
+        for dataset in (diff.old_dataset, diff.new_dataset):
+            if not SubdividedHazard.objects.filter(dataset=dataset).exists():
+                subdivide_dataset(dataset)
+
+        HazardChange.objects.filter(diff=diff).delete()
+        # One tile per barangay code, latest boundary upload wins
+        barangay_ids = list(
+            BarangayBoundaryNew.objects.active().order_by('adm4_pcode', '-id').distinct('adm4_pcode').values_list('id', flat=True)
+        )
+        tiles = [barangay_ids[i:i + TILE_SIZE] for i in range(0, len(barangay_ids), TILE_SIZE)]
+        HazardDatasetDiff.objects.filter(pk=diff.pk).update(
+            status='running', tiles_total=len(tiles), tiles_done=0, error='',
+        )
+
+        rows = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_diff_tile, diff, tile) for tile in tiles]
+            for future in as_completed(futures):
+                rows += future.result()
+
+        HazardDatasetDiff.objects.filter(pk=diff.pk).update(
+            status='completed', change_count=rows, completed_at=timezone.now(),
+        )
+        print(f"🗺️ Hazard diff #{diff.id}: {rows} changed areas in {len(tiles)} tiles ({time.time() - start:.1f}s)")
+    except Exception as e:
+        HazardDatasetDiff.objects.filter(pk=diff.pk).update(
+            status='failed', error=str(e), completed_at=timezone.now(),
+        )
+        print(f"❌ Hazard diff #{diff.id} failed: {e}")
+
+
+def _run_in_background(diff_id, workers):
+    try:
+        run_diff(diff_id, workers)
+    finally:
+        connection.close()
+
+
+def start_diff(old_dataset, new_dataset, background=True, workers=MAX_WORKERS):
+    """
+    Create a diff between two datasets of the same hazard type and compute
+    it (in a background thread unless background=False)
+
+    Raises:
+        ValueError: if the datasets cannot be compared
+    """
+    if old_dataset.pk == new_dataset.pk:
+        raise ValueError("Choose two different datasets")
+    if old_dataset.dataset_type != new_dataset.dataset_type:
+        raise ValueError("Both datasets must be of the same hazard type")
+    if old_dataset.dataset_type not in HAZARD_SOURCES:
+        raise ValueError(f"Only hazard layers can be compared: {list(HAZARD_SOURCES)}")
+
+    diff = HazardDatasetDiff.objects.create(
+        hazard_type=old_dataset.dataset_type, old_dataset=old_dataset, new_dataset=new_dataset,
+    )
+    if background:
+        threading.Thread(target=_run_in_background, args=(diff.id, workers), daemon=True).start()
+    else:
+        run_diff(diff.id, workers)
+        diff.refresh_from_db()
+    return diff
+
+
+def diff_summary(diff, barangay_code=None):
+    """Status, totals per change type and class transition, and per-barangay stats"""
+    result = {
+        'id': diff.id,
+        'hazard_type': diff.hazard_type,
+        'old_dataset': {'id': diff.old_dataset_id, 'name': diff.old_dataset.name},
+        'new_dataset': {'id': diff.new_dataset_id, 'name': diff.new_dataset.name},
+        'status': diff.status,
+        'progress': round(100 * diff.tiles_done / diff.tiles_total, 1) if diff.tiles_total else 0,
+        'error': diff.error or None,
+        'created_at': diff.created_at,
+        'completed_at': diff.completed_at,
+    }
+    if diff.status != 'completed':
+        return result
+
+    changes = HazardChange.objects.filter(diff=diff)
+    if barangay_code:
+        changes = changes.filter(adm4_pcode=barangay_code)
+
+    by_type = {
+        row['change_type']: {'count': row['count'], 'area_sqm': round(row['area'], 1)}
+        for row in changes.values('change_type').annotate(count=Count('id'), area=Sum('area_sqm'))
+    }
+    transitions = [
+        {
+            'old_level': row['old_level'],
+            'new_level': row['new_level'],
+            'area_sqm': round(row['area'], 1),
+        }
+        for row in changes.values('old_level', 'new_level').annotate(area=Sum('area_sqm')).order_by('-area')
+    ]
+
+    barangays = {}
+    for row in changes.values('adm4_pcode', 'adm4_en', 'adm3_en', 'change_type').annotate(area=Sum('area_sqm')):
+        entry = barangays.setdefault(row['adm4_pcode'], {
+            'barangay': row['adm4_en'],
+            'barangay_code': row['adm4_pcode'],
+            'municipality': row['adm3_en'],
+            'changed_area_sqm': 0,
+        })
+        entry[f"{row['change_type']}_sqm"] = round(row['area'], 1)
+        entry['changed_area_sqm'] = round(entry['changed_area_sqm'] + row['area'], 1)
+
+    result.update({
+        'change_count': diff.change_count,
+        'by_change_type': by_type,
+        'transitions': transitions,
+        'barangays': sorted(barangays.values(), key=lambda b: -b['changed_area_sqm']),
+    })
+    return result
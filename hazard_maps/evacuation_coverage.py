@@ -0,0 +1,268 @@
+"""
+Evacuation centre service areas and population coverage.
+
+Every demand point (a barangay's interior point, or a populated grid cell
+when population is spread evenly over each barangay) is assigned to its
+nearest evacuation centre, either by straight-line distance (a Voronoi
+partition, answered by one KD-tree query) or by travel time on the road
+graph (one multi-source Dijkstra from all centres at once). Population per
+centre and uncovered population per barangay are then summed with
+``np.bincount``, so a province-wide run takes a few seconds.
+"""
+import json
+import time
+
+import numpy as np
+from django.db import connection
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from .models import BarangayBoundaryNew, BarangayCharacteristic, Facility
+from .spatial import UTM_SRID, from_utm, to_utm
+from .utils import EVACUATION_TYPES
+
+METHODS = ('euclidean', 'network')
+UNITS = ('barangay', 'grid')
+
+DEFAULT_MAX_DISTANCE_M = 2000  # walking distance to a centre considered covered
+DEFAULT_MAX_MINUTES = 30
+DEFAULT_CELL_M = 250
+MIN_CELL_M = 100
+
+
+def _barangays(with_geometry=False):
+    """Latest boundary per barangay with its interior point and population"""
+    qn = connection.ops.quote_name
+    geometry = f", ST_AsGeoJSON(ST_Transform(b.geometry, {UTM_SRID}))" if with_geometry else ""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT DISTINCT ON (b.adm4_pcode)
+                   b.adm4_pcode, b.adm4_en, b.adm3_pcode, b.adm3_en,
+                   ST_X(ST_PointOnSurface(b.geometry)), ST_Y(ST_PointOnSurface(b.geometry)),
+                   c.population{geometry}
+            FROM {qn(BarangayBoundaryNew._meta.db_table)} b
+            LEFT JOIN {qn(BarangayCharacteristic._meta.db_table)} c ON c.barangay_code = b.adm4_pcode
+            WHERE b.active
+            ORDER BY b.adm4_pcode, b.id DESC
+        """)
+        return cursor.fetchall()
+
+
+def _centres():
+    rows = list(Facility.objects.filter(facility_type__in=EVACUATION_TYPES).values_list(
+        'id', 'name', 'facility_type', 'location',
+    ))
+    return {
+        'id': [r[0] for r in rows],
+        'name': [r[1] for r in rows],
+        'facility_type': [r[2] for r in rows],
+        'lng': np.array([r[3].x for r in rows], dtype=float),
+        'lat': np.array([r[3].y for r in rows], dtype=float),
+    }
+
+
+def _grid_demand(barangays, population, cell):
+    """
+    Spread each barangay's population evenly over the grid cells it covers
+
+    Returns:
+        (cell x, cell y, cell population, cell barangay index)
+    """
+    from rasterio import features
+    from rasterio.transform import from_origin
+
+    shapes = [(json.loads(row[7]), i + 1) for i, row in enumerate(barangays) if row[7]]
+    extents = np.array([
+        [min(c[0] for c in ring), min(c[1] for c in ring), max(c[0] for c in ring), max(c[1] for c in ring)]
+        for shape, _ in shapes
+        for ring in _rings(shape)
+    ])
+    xmin, ymin = np.floor(extents[:, :2].min(axis=0) / cell) * cell
+    xmax, ymax = np.ceil(extents[:, 2:].max(axis=0) / cell) * cell
+    width, height = int((xmax - xmin) / cell), int((ymax - ymin) / cell)
+
+    grid = features.rasterize(
+        shapes, out_shape=(height, width), transform=from_origin(xmin, ymax, cell, cell),
+        fill=0, dtype='int32',
+    )
+    rows, cols = np.nonzero(grid)
+    index = grid[rows, cols] - 1
+
+    # Barangays smaller than a cell still get their interior point
+    cells_per_barangay = np.bincount(index, minlength=len(barangays))
+    missing = np.flatnonzero(cells_per_barangay == 0)
+    x = xmin + (cols + 0.5) * cell
+    y = ymax - (rows + 0.5) * cell
+    if len(missing):
+        mx, my = to_utm([barangays[i][4] for i in missing], [barangays[i][5] for i in missing])
+        x, y = np.concatenate([x, mx]), np.concatenate([y, my])
+        index = np.concatenate([index, missing])
+        cells_per_barangay[missing] = 1
+
+    return x, y, population[index] / cells_per_barangay[index], index
+
+
+def _rings(geometry):
+    if geometry['type'] == 'Polygon':
+        return geometry['coordinates'][:1]
+    return [polygon[0] for polygon in geometry['coordinates']]
+
+
+def _assign_euclidean(centres, x, y):
+    """(nearest centre index, distance in metres) per demand point"""
+    cx, cy = to_utm(centres['lng'], centres['lat'])
+    distance, nearest = cKDTree(np.column_stack([cx, cy])).query(np.column_stack([x, y]))
+    return nearest, distance
+
+
+def _assign_network(centres, lng, lat, mode):
+    """(nearest centre index, travel seconds) per demand point; -1/inf if unreachable"""
+    from .routing import CONNECTOR_SPEED_KPH, DEFAULT_SEARCH_LIMIT_S, MAX_SNAP_DISTANCE_M, get_road_graph
+
+    graph = get_road_graph()
+    if graph is None:
+        raise ValueError("Road network not available. Run 'python manage.py build_road_graph' first.")
+    connector = CONNECTOR_SPEED_KPH[mode] / 3.6
+
+    centre_nodes, centre_snap = graph.snap(centres['lng'], centres['lat'], mode)
+    reachable = np.flatnonzero(centre_snap <= MAX_SNAP_DISTANCE_M)
+    if not len(reachable):
+        return np.full(len(lng), -1), np.full(len(lng), np.inf)
+
+    # Closest centre per snapped node, so the search starts once per node
+    order = reachable[np.argsort(centre_snap[reachable])]
+    nodes, first = np.unique(centre_nodes[order], return_index=True)
+    centre_at_node = np.full(graph.node_count, -1)
+    centre_at_node[nodes] = order[first]
+
+    # Search on the reversed graph: times run from each node to a centre
+    seconds, _, sources = dijkstra(
+        graph.csgraph(mode).T.tocsr(), directed=True, indices=nodes,
+        min_only=True, return_predecessors=True, limit=DEFAULT_SEARCH_LIMIT_S,
+    )
+
+    demand_nodes, demand_snap = graph.snap(lng, lat, mode)
+    source = sources[demand_nodes]
+    nearest = np.where(source >= 0, centre_at_node[np.maximum(source, 0)], -1)
+    times = seconds[demand_nodes] + demand_snap / connector + centre_snap[np.maximum(nearest, 0)] / connector
+    unreachable = (nearest < 0) | (demand_snap > MAX_SNAP_DISTANCE_M) | ~np.isfinite(times)
+    return np.where(unreachable, -1, nearest), np.where(unreachable, np.inf, times)
+
+
+def evacuation_coverage(method='euclidean', mode='walk', unit='barangay',
+                        max_distance=DEFAULT_MAX_DISTANCE_M, max_minutes=DEFAULT_MAX_MINUTES,
+                        cell=DEFAULT_CELL_M):
+    """
+    Nearest-centre assignment of the whole province
+
+    Args:
+        method: 'euclidean' (Voronoi, metres) or 'network' (road travel time)
+        mode: travel mode for the network method, 'walk' or 'drive'
+        unit: demand points are barangay interior points or populated grid cells
+        max_distance: metres within which a point is covered (euclidean)
+        max_minutes: minutes within which a point is covered (network)
+        cell: grid cell size in metres for unit='grid'
+    """
+    start = time.time()
+    centres = _centres()
+    barangays = _barangays(with_geometry=unit == 'grid')
+    if not barangays:
+        raise ValueError("No barangay boundaries loaded")
+
+    population = np.array([row[6] or 0 for row in barangays], dtype=float)
+    if unit == 'grid':
+        x, y, demand_population, demand_barangay = _grid_demand(barangays, population, max(cell, MIN_CELL_M))
+        lng, lat = from_utm(x, y)
+    else:
+        lng = np.array([row[4] for row in barangays], dtype=float)
+        lat = np.array([row[5] for row in barangays], dtype=float)
+        x, y = to_utm(lng, lat)
+        demand_population, demand_barangay = population, np.arange(len(barangays))
+
+    if not len(centres['id']):
+        nearest, cost = np.full(len(x), -1), np.full(len(x), np.inf)
+    elif method == 'network':
+        nearest, cost = _assign_network(centres, lng, lat, mode)
+    else:
+        nearest, cost = _assign_euclidean(centres, x, y)
+
+    limit = max_minutes * 60 if method == 'network' else max_distance
+    covered = (nearest >= 0) & (cost <= limit)
+    assigned = nearest >= 0
+
+    # Population-weighted sums per centre and per barangay
+    n_barangays = len(barangays)
+    served = np.bincount(nearest[assigned], weights=demand_population[assigned], minlength=len(centres['id']))
+    covered_by_centre = np.bincount(
+        nearest[covered], weights=demand_population[covered], minlength=len(centres['id']),
+    )
+    uncovered = np.bincount(demand_barangay, weights=demand_population * ~covered, minlength=n_barangays)
+    finite = np.isfinite(cost)
+    weight = np.where(finite, np.maximum(demand_population, 1e-9), 0)
+    cost_sum = np.bincount(demand_barangay, weights=np.where(finite, cost, 0) * weight, minlength=n_barangays)
+    weight_sum = np.bincount(demand_barangay, weights=weight, minlength=n_barangays)
+    # For barangay units this is the barangay's own centre; for grids the one serving most people
+    main_centre = np.full(n_barangays, -1)
+    if assigned.any():
+        pairs = demand_barangay[assigned] * len(centres['id']) + nearest[assigned]
+        by_pair = np.bincount(pairs, weights=demand_population[assigned] + 1e-9,
+                              minlength=n_barangays * len(centres['id']))
+        by_pair = by_pair.reshape(n_barangays, len(centres['id']))
+        main_centre = np.where(by_pair.max(axis=1) > 0, by_pair.argmax(axis=1), -1)
+
+    cost_key = 'mean_travel_minutes' if method == 'network' else 'mean_distance_m'
+    scale = 1 / 60 if method == 'network' else 1
+
+    barangay_rows = []
+    for i, row in enumerate(barangays):
+        mean_cost = float(cost_sum[i] / weight_sum[i]) if weight_sum[i] > 0 else None
+        centre = main_centre[i]
+        barangay_rows.append({
+            'barangay': row[1],
+            'barangay_code': row[0],
+            'municipality': row[3],
+            'municipality_code': row[2],
+            'population': row[6],
+            'uncovered_population': round(float(uncovered[i])),
+            'uncovered_percentage': round(float(100 * uncovered[i] / population[i]), 1) if population[i] else None,
+            cost_key: round(mean_cost * scale, 1) if mean_cost is not None else None,
+            'nearest_centre_id': centres['id'][centre] if centre >= 0 else None,
+        })
+    barangay_rows.sort(key=lambda b: (-b['uncovered_population'], b['barangay']))
+
+    centre_rows = [
+        {
+            'id': centres['id'][i],
+            'name': centres['name'][i],
+            'facility_type': centres['facility_type'][i],
+            'lat': float(centres['lat'][i]),
+            'lng': float(centres['lng'][i]),
+            'population_assigned': round(float(served[i])),
+            'population_covered': round(float(covered_by_centre[i])),
+        }
+        for i in np.argsort(-served)
+    ]
+
+    total = float(demand_population.sum())
+    uncovered_total = float(uncovered.sum())
+    result = {
+        'method': method,
+        'mode': mode if method == 'network' else None,
+        'unit': unit,
+        'cell_m': max(cell, MIN_CELL_M) if unit == 'grid' else None,
+        'coverage_threshold': {'minutes': max_minutes} if method == 'network' else {'metres': max_distance},
+        'centre_count': len(centres['id']),
+        'demand_points': len(x),
+        'total_population': round(total),
+        'covered_population': round(total - uncovered_total),
+        'uncovered_population': round(uncovered_total),
+        'coverage_percentage': round(100 * (total - uncovered_total) / total, 1) if total else None,
+        'barangays_without_population': int(sum(1 for row in barangays if row[6] is None)),
+        'underserved_barangay_count': sum(1 for b in barangay_rows if b['uncovered_population'] > 0),
+        'centres': centre_rows,
+        'barangays': barangay_rows,
+        'elapsed_ms': round((time.time() - start) * 1000),
+    }
+    print(f"🏫 Evacuation coverage ({method}, {unit}): {result['coverage_percentage']}% of "
+          f"{result['total_population']:,} covered by {result['centre_count']} centres ({result['elapsed_ms']} ms)")
+    return result
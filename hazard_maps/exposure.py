@@ -0,0 +1,228 @@
+"""
+Per-barangay hazard exposure statistics.
+
+``refresh_barangay_exposure`` overlays every barangay with each hazard
+layer in PostGIS (one INSERT ... SELECT per layer) and stores the area,
+percentage and estimated exposed population of every class in
+BarangayHazardExposure. Views only ever read that table.
+"""
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import BarangayBoundaryNew, BarangayCharacteristic, BarangayHazardExposure
+from .spatial import UTM_SRID
+from .subdivided import HAZARD_SOURCES, overlay_source
+
+UNMAPPED = 'NONE'
+
+EXPOSURE_VERSION_KEY = 'barangay_exposure_version'
+
+LEVEL_ORDER = [UNMAPPED, 'LS', 'MS', 'HS', 'VHS', 'DF']
+
+# Classes counted as "exposed" when no levels are requested
+DEFAULT_EXPOSED_LEVELS = {
+    'flood': ['HS', 'VHS'],
+    'landslide': ['HS', 'VHS', 'DF'],
+    'liquefaction': ['HS'],
+}
+
+# Sequential choropleth palette (light to dark red)
+CHOROPLETH_COLORS = ['#fee5d9', '#fcae91', '#fb6a4a', '#de2d26', '#a50f15']
+
+
+def _insert_exposure(cursor, hazard_type):
+    qn = connection.ops.quote_name
+    source = overlay_source(hazard_type)
+    cursor.execute(f"""
+        WITH b AS (
+            SELECT DISTINCT ON (adm4_pcode)
+                   adm4_pcode, adm4_en, adm3_pcode, adm3_en, geometry,
+                   ST_Area(ST_Transform(geometry, {UTM_SRID})) AS area
+            FROM {qn(BarangayBoundaryNew._meta.db_table)}
+            WHERE active
+            ORDER BY adm4_pcode, id DESC
+        ),
+        classes AS (
+            SELECT b.adm4_pcode, h.{source['column']} AS level,
+                   LEAST(MAX(b.area), SUM(CASE
+                       WHEN ST_CoveredBy(h.geometry, b.geometry)
+                           THEN ST_Area(ST_Transform(h.geometry, {UTM_SRID}))
+                       ELSE ST_Area(ST_Transform(ST_Intersection(h.geometry, b.geometry), {UTM_SRID}))
+                   END)) AS area
+            FROM b
+            JOIN {source['table']} h ON h.geometry && b.geometry AND ST_Intersects(h.geometry, b.geometry)
+            WHERE TRUE {source['where']}
+            GROUP BY b.adm4_pcode, h.{source['column']}
+        ),
+        remainder AS (
+            SELECT b.adm4_pcode, %s AS level, GREATEST(0, b.area - COALESCE(SUM(c.area), 0)) AS area
+            FROM b LEFT JOIN classes c ON c.adm4_pcode = b.adm4_pcode
+            GROUP BY b.adm4_pcode, b.area
+        )
+        INSERT INTO {qn(BarangayHazardExposure._meta.db_table)}
+            (adm4_pcode, adm4_en, adm3_pcode, adm3_en, hazard_type, susceptibility,
+             area_sqm, barangay_area_sqm, percentage, population_exposed, refreshed_at)
+        SELECT b.adm4_pcode, b.adm4_en, b.adm3_pcode, b.adm3_en, %s, x.level,
+               x.area, b.area,
+               CASE WHEN b.area > 0 THEN 100 * x.area / b.area ELSE 0 END,
+               CASE WHEN b.area > 0 THEN c.population * x.area / b.area END,
+               NOW()
+        FROM (SELECT * FROM classes UNION ALL SELECT * FROM remainder) x
+        JOIN b ON b.adm4_pcode = x.adm4_pcode
+        LEFT JOIN {qn(BarangayCharacteristic._meta.db_table)} c ON c.barangay_code = b.adm4_pcode
+    """, source['params'] + [UNMAPPED, hazard_type])
+    return cursor.rowcount
+
+
+def refresh_barangay_exposure():
+    """Rebuild the whole exposure table; returns the number of rows written"""
+    start = time.time()
+    rows = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        BarangayHazardExposure.objects.all().delete()
+        for hazard_type in HAZARD_SOURCES:
+            rows += _insert_exposure(cursor, hazard_type)
+
+    # Cached choropleths are keyed on this version
+    cache.set(EXPOSURE_VERSION_KEY, int(time.time()), None)
+    print(f"📊 Refreshed barangay hazard exposure: {rows} rows ({time.time() - start:.1f}s)")
+    return rows
+
+
+def refresh_after_ingest(dataset_type):
+    """Refresh exposure and valuation when an ingest changed their inputs; never raises"""
+    exposure_input = dataset_type in set(HAZARD_SOURCES) | {'barangay', 'barangay_characteristics'}
+    if exposure_input:
+        try:
+            refresh_barangay_exposure()
+        except Exception as e:
+            print(f"⚠️ Could not refresh barangay hazard exposure: {e}")
+
+    # Value at risk depends on the exposed areas as well as the zonal values
+    if exposure_input or dataset_type == 'zonal_values':
+        from .valuation import refresh_barangay_valuation
+        try:
+            refresh_barangay_valuation()
+        except Exception as e:
+            print(f"⚠️ Could not refresh barangay valuation: {e}")
+
+
+def _level_key(level):
+    return LEVEL_ORDER.index(level) if level in LEVEL_ORDER else len(LEVEL_ORDER)
+
+
+def _group_classes(rows):
+    """{hazard_type: [class dicts]} from exposure rows with area/percentage/population"""
+    hazards = {hazard_type: [] for hazard_type in HAZARD_SOURCES}
+    for row in sorted(rows, key=lambda r: (r['hazard_type'], _level_key(r['susceptibility']))):
+        population = row['population_exposed']
+        hazards[row['hazard_type']].append({
+            'level': row['susceptibility'],
+            'area_sqm': round(row['area_sqm'], 1),
+            'percentage': round(row['percentage'], 2),
+            'population_exposed': round(population) if population is not None else None,
+        })
+    return hazards
+
+
+def barangay_exposure(adm4_pcode):
+    """Exposure breakdown of one barangay, or None if it has not been computed"""
+    rows = list(BarangayHazardExposure.objects.filter(adm4_pcode=adm4_pcode).values(
+        'adm4_en', 'adm3_pcode', 'adm3_en', 'hazard_type', 'susceptibility',
+        'area_sqm', 'barangay_area_sqm', 'percentage', 'population_exposed', 'refreshed_at',
+    ))
+    if not rows:
+        return None
+    return {
+        'barangay': rows[0]['adm4_en'],
+        'barangay_code': adm4_pcode,
+        'municipality': rows[0]['adm3_en'],
+        'municipality_code': rows[0]['adm3_pcode'],
+        'area_sqm': round(rows[0]['barangay_area_sqm'], 1),
+        'hazards': _group_classes(rows),
+        'refreshed_at': rows[0]['refreshed_at'],
+    }
+
+
+def municipality_exposure(adm3_pcode):
+    """Roll-up of all barangays of a municipality, or None if unknown"""
+    queryset = BarangayHazardExposure.objects.filter(adm3_pcode=adm3_pcode)
+    rows = list(queryset.values('hazard_type', 'susceptibility').annotate(
+        area_sqm=Sum('area_sqm'), population_exposed=Sum('population_exposed'),
+    ))
+    if not rows:
+        return None
+
+    # Every barangay has one row per class including NONE, so a layer's classes sum to the total
+    totals = {}
+    for row in rows:
+        totals[row['hazard_type']] = totals.get(row['hazard_type'], 0) + row['area_sqm']
+    for row in rows:
+        total = totals[row['hazard_type']]
+        row['percentage'] = 100 * row['area_sqm'] / total if total else 0
+
+    first = queryset.values('adm3_en').first()
+    return {
+        'municipality': first['adm3_en'],
+        'municipality_code': adm3_pcode,
+        'barangay_count': queryset.values('adm4_pcode').distinct().count(),
+        'area_sqm': round(max(totals.values()), 1),
+        'hazards': _group_classes(rows),
+    }
+
+
+def choropleth_values(hazard_type, levels=None, unit='barangay', metric='percentage'):
+    """
+    One value per barangay (adm4_pcode) or municipality (adm3_pcode): the
+    share of area, or the population, in the given hazard classes
+
+    Returns:
+        {'values': {code: value}, 'names': {code: name}, 'breaks': [...], 'colors': [...]}
+    """
+    levels = levels or DEFAULT_EXPOSED_LEVELS[hazard_type]
+    code_field, name_field = ('adm4_pcode', 'adm4_en') if unit == 'barangay' else ('adm3_pcode', 'adm3_en')
+
+    # Every unit appears, including ones with no exposure at all
+    base = BarangayHazardExposure.objects.filter(hazard_type=hazard_type)
+    totals = {
+        row[code_field]: row
+        for row in base.values(code_field, name_field).annotate(total_area=Sum('area_sqm'))
+    }
+    exposed = {
+        row[code_field]: row
+        for row in base.filter(susceptibility__in=levels).values(code_field).annotate(
+            area=Sum('area_sqm'), population=Sum('population_exposed'),
+        )
+    }
+
+    values = {}
+    for code, row in totals.items():
+        hit = exposed.get(code)
+        if metric == 'population':
+            values[code] = round(hit['population'] or 0) if hit else 0
+        else:
+            area = hit['area'] if hit else 0
+            values[code] = round(100 * area / row['total_area'], 2) if row['total_area'] else 0
+
+    # Quantile class breaks over the non-zero values
+    nonzero = np.array([v for v in values.values() if v > 0], dtype=float)
+    breaks = []
+    if len(nonzero):
+        quantiles = np.linspace(0, 1, len(CHOROPLETH_COLORS) + 1)[1:-1]
+        breaks = sorted({round(float(b), 2) for b in np.quantile(nonzero, quantiles)})
+
+    return {
+        'hazard_type': hazard_type,
+        'levels': levels,
+        'unit': unit,
+        'metric': metric,
+        'values': values,
+        'names': {code: row[name_field] for code, row in totals.items()},
+        'breaks': breaks,
+        'colors': CHOROPLETH_COLORS[:len(breaks) + 1],
+        'max': max(values.values()) if values else 0,
+    }
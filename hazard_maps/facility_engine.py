@@ -0,0 +1,346 @@
+"""
+Vectorized nearest-facility engine.
+
+Facilities are held as a structured NumPy array (UTM 51N coordinates,
+group code, priority) next to the original facility dicts. Radius and
+per-group k-nearest queries go through ``cKDTree``, and ``categorize``
+returns the distance-annotated, grouped facility lists that the nearby
+facilities, location hazards and barangay characteristics views all
+build their responses from.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .spatial import to_utm
+from .utils import FACILITY_GROUPS, facility_group, format_distance, format_duration
+
+GROUP_NAMES = list(FACILITY_GROUPS) + ['other']
+GROUP_CODES = {name: code for code, name in enumerate(GROUP_NAMES)}
+
+FACILITY_DTYPE = np.dtype([
+    ('x', 'f8'),
+    ('y', 'f8'),
+    ('lat', 'f8'),
+    ('lng', 'f8'),
+    ('group', 'i1'),
+    ('priority', 'i1'),
+])
+
+# Straight-line travel time estimate used when no road graph is available
+FALLBACK_SPEED_KPH = 40
+
+WALKABLE_DISTANCE_M = 500
+
+
+class FacilityEngine:
+    """Spatial index over a set of facility dicts (Overpass or Facility table)"""
+
+    def __init__(self, facilities):
+        self.facilities = list(facilities)
+        self.records = np.zeros(len(self.facilities), dtype=FACILITY_DTYPE)
+
+        if self.facilities:
+            lat = np.array([f['lat'] for f in self.facilities], dtype=float)
+            lng = np.array([f['lng'] for f in self.facilities], dtype=float)
+            x, y = to_utm(lng, lat)
+            self.records['x'] = x
+            self.records['y'] = y
+            self.records['lat'] = lat
+            self.records['lng'] = lng
+            self.records['group'] = [
+                GROUP_CODES[facility_group(f.get('facility_type', ''))] for f in self.facilities
+            ]
+            self.records['priority'] = [f.get('priority', 9) for f in self.facilities]
+
+        self._tree = None
+        self._group_trees = {}
+
+    def __len__(self):
+        return len(self.facilities)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Build an engine from Facility model rows"""
+        from .overpass_client import OverpassClient
+
+        mappings = {
+            **OverpassClient.OFFICE_MAPPING,
+            **OverpassClient.SHOP_MAPPING,
+            **OverpassClient.AMENITY_MAPPING,
+        }
+        facilities = []
+        for row in queryset.values('id', 'name', 'facility_type', 'category', 'location', 'osm_id', 'osm_type'):
+            info = mappings.get(row['facility_type'], {})
+            facilities.append({
+                'id': row['id'],
+                'osm_id': row['osm_id'],
+                'osm_type': row['osm_type'],
+                'name': row['name'],
+                'facility_type': row['facility_type'],
+                'type_display': info.get('name', row['facility_type']),
+                'category': row['category'],
+                'subcategory': info.get('subcat', 'other'),
+                'priority': info.get('priority', 9),
+                'lat': row['location'].y,
+                'lng': row['location'].x,
+            })
+        return cls(facilities)
+
+    @property
+    def xy(self):
+        return np.column_stack([self.records['x'], self.records['y']])
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = cKDTree(self.xy)
+        return self._tree
+
+    def _group_tree(self, group):
+        """(KD-tree, member indices) for one facility group"""
+        code = GROUP_CODES[group]
+        if code not in self._group_trees:
+            members = np.flatnonzero(self.records['group'] == code)
+            tree = cKDTree(self.xy[members]) if len(members) else None
+            self._group_trees[code] = (tree, members)
+        return self._group_trees[code]
+
+    def within(self, lat, lng, radius=None):
+        """
+        Facilities within ``radius`` metres of a point (all when None)
+
+        Returns:
+            (indices, distances in metres), nearest first
+        """
+        if not self.facilities:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        x, y = to_utm(lng, lat)
+        if radius is None:
+            idx = np.arange(len(self.facilities))
+        else:
+            idx = np.asarray(self.tree.query_ball_point([float(x), float(y)], r=radius), dtype=np.int64)
+
+        distances = np.hypot(self.records['x'][idx] - x, self.records['y'][idx] - y)
+        order = np.argsort(distances, kind='stable')
+        return idx[order], distances[order]
+
+    def nearest(self, lats, lngs, group, k=1):
+        """
+        k nearest facilities of one group for one or many points
+
+        Returns:
+            (indices, distances) shaped (points, k); missing neighbours
+            have index -1 and distance inf
+        """
+        x, y = to_utm(np.atleast_1d(lngs), np.atleast_1d(lats))
+        tree, members = self._group_tree(group)
+
+        if tree is None:
+            shape = (len(x), k)
+            return np.full(shape, -1, dtype=np.int64), np.full(shape, np.inf)
+
+        distances, local = tree.query(np.column_stack([x, y]), k=k)
+        distances = distances.reshape(len(x), k)
+        local = local.reshape(len(x), k)
+        missing = local >= len(members)
+        indices = np.where(missing, -1, members[np.minimum(local, len(members) - 1)])
+        return indices, distances
+
+    def counts_within(self, lats, lngs, radius, group=None):
+        """Number of facilities (optionally of one group) within radius of each point"""
+        x, y = to_utm(np.atleast_1d(lngs), np.atleast_1d(lats))
+        if group is None:
+            tree = self.tree if self.facilities else None
+        else:
+            tree, _ = self._group_tree(group)
+        if tree is None:
+            return np.zeros(len(x), dtype=np.int64)
+        return np.asarray(tree.query_ball_point(np.column_stack([x, y]), r=radius, return_length=True))
+
+    def categorize(self, lat, lng, radius=None, travel_times=True):
+        """
+        Distance-annotate and group the facilities around a point
+
+        Facility dicts are copied, so engines can be shared between requests.
+
+        Returns:
+            {'facilities': [...nearest first], 'groups': {group: [...]}}
+        """
+        idx, distances = self.within(lat, lng, radius)
+
+        facilities = []
+        for i, distance in zip(idx, distances):
+            distance = float(distance)
+            duration_minutes = (distance / 1000) / FALLBACK_SPEED_KPH * 60
+            facility = dict(self.facilities[i])
+            facility.update({
+                'distance_meters': distance,
+                'distance_km': round(distance / 1000, 2),
+                'distance_display': format_distance(distance),
+                'is_walkable': distance <= WALKABLE_DISTANCE_M,
+                'duration_minutes': round(duration_minutes, 1),
+                'duration_display': format_duration(duration_minutes * 60),
+                'method': 'straight_line',
+            })
+            facilities.append(facility)
+
+        if travel_times:
+            # Replace the straight-line estimate with road-network times when a graph is built
+            from .routing import annotate_travel_times
+            annotate_travel_times(lat, lng, facilities)
+
+        groups = {name: [] for name in GROUP_NAMES}
+        for facility, code in zip(facilities, self.records['group'][idx]):
+            group = GROUP_NAMES[code]
+            if group == 'evacuation':
+                facility['subcategory'] = 'evacuation'
+            groups[group].append(facility)
+
+        return {'facilities': facilities, 'groups': groups}
+
+
+_local_engine = {'key': None, 'engine': None}
+
+
+def get_local_engine():
+    """
+    Engine over the whole local Facility table, rebuilt when the table changes
+    Returns None when no facilities have been synced.
+    """
+    from django.db.models import Count, Max
+    from .models import Facility
+
+    stats = Facility.objects.aggregate(count=Count('id'), latest=Max('created_at'), max_id=Max('id'))
+    if not stats['count']:
+        return None
+
+    key = (stats['count'], stats['latest'], stats['max_id'])
+    if _local_engine['engine'] is None or _local_engine['key'] != key:
+        _local_engine['engine'] = FacilityEngine.from_queryset(Facility.objects.all())
+        _local_engine['key'] = key
+
+    return _local_engine['engine']
+
+
+def build_facility_summary(facility):
+    """Compact description of a single facility for summaries"""
+    if not facility:
+        return None
+    return {
+        'name': facility.get('name', 'Unknown'),
+        'distance': facility.get('distance_display', 'N/A'),
+        'distance_meters': facility.get('distance_meters', 999999),
+        'duration': facility.get('duration_display', 'N/A'),
+        'is_walkable': facility.get('is_walkable', False),
+    }
+
+
+def facility_summary(categorized):
+    """Nearest evacuation/hospital/fire station plus group counts (suitability inputs)"""
+    groups = categorized['groups']
+    nearest_fire = next(
+        (f for f in groups['emergency_services'] if f.get('facility_type') == 'fire_station'), None
+    )
+    return {
+        'summary': {
+            'nearest_evacuation': build_facility_summary(groups['evacuation'][0] if groups['evacuation'] else None),
+            'nearest_hospital': build_facility_summary(groups['medical'][0] if groups['medical'] else None),
+            'nearest_fire_station': build_facility_summary(nearest_fire),
+        },
+        'counts': {
+            'evacuation': len(groups['evacuation']),  # Total evacuation sites (gov't + schools)
+            'medical': len(groups['medical']),
+            'emergency_services': len(groups['emergency_services']),
+            'essential': len(groups['essential']),
+            'other': len(groups['other']),
+            'total': len(categorized['facilities']),
+        },
+    }
+
+
+def nearby_facilities_response(categorized):
+    """Full grouped facility listing returned by the nearby facilities API"""
+    groups = categorized['groups']
+    result = facility_summary(categorized)
+    result.update({
+        'evacuation_centers': groups['evacuation'][:50],
+        'medical': groups['medical'][:50],
+        'emergency_services': groups['emergency_services'][:50],
+        'essential_services': groups['essential'][:50],
+        'other': groups['other'][:10],
+    })
+    return result
+
+
+BARANGAY_FACILITY_CATEGORIES = [
+    'education_elementary',
+    'education_highschool',
+    'education_college',
+    'hospital',
+    'health_center',
+    'fire_station',
+    'seaport',
+    'post_office',
+]
+
+
+def barangay_facility_categories(categorized):
+    """
+    Facilities split into the categories shown on the barangay panel
+
+    Categories:
+    - Education (Elementary/High School/College)
+    - Hospital
+    - Health Center/Clinic
+    - Fire Station
+    - Seaport
+    - Post Office
+    """
+    categorized_lists = {category: [] for category in BARANGAY_FACILITY_CATEGORIES}
+
+    for facility in categorized['facilities']:
+        ftype = facility.get('facility_type', '')
+        name = facility.get('name', 'Unnamed')
+        lowered = name.lower()
+
+        facility_info = {
+            'name': name,
+            'distance': facility.get('distance_display', 'N/A'),
+            'distance_meters': facility.get('distance_meters', 999999),
+            'duration': facility.get('duration_display', 'N/A'),
+            'method': facility.get('method', 'straight_line'),
+        }
+
+        if ftype in ['school', 'kindergarten']:
+            # Generic schools default to elementary
+            if 'elementary' in lowered or 'elem' in lowered or ftype == 'kindergarten':
+                category = 'education_elementary'
+            elif 'high' in lowered or 'secondary' in lowered:
+                category = 'education_highschool'
+            elif 'college' in lowered or 'university' in lowered:
+                category = 'education_college'
+            else:
+                category = 'education_elementary'
+        elif ftype in ['college', 'university']:
+            category = 'education_college'
+        elif ftype == 'hospital':
+            category = 'hospital'
+        elif ftype in ['clinic', 'doctors']:
+            category = 'health_center'
+        elif ftype == 'fire_station':
+            category = 'fire_station'
+        elif ftype in ['ferry_terminal', 'port']:
+            category = 'seaport'
+        elif ftype == 'post_office':
+            category = 'post_office'
+        else:
+            continue
+
+        # Facilities arrive nearest first, so each list stays sorted
+        categorized_lists[category].append(facility_info)
+
+    return {
+        'facilities': categorized_lists,
+        'counts': {category: len(items) for category, items in categorized_lists.items()},
+    }
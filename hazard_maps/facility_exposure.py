@@ -0,0 +1,163 @@
+"""
+Critical facility hazard exposure report.
+
+One SQL statement joins every critical facility in the local Facility
+table to the most severe flood, landslide and liquefaction class at its
+location (LATERAL lookups on the GiST indexes) and to its barangay. The
+report is cached under a fingerprint of the hazard and facility data, so
+it is only recomputed after an upload or a facility sync.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+
+from .models import BarangayBoundaryNew, Facility
+from .subdivided import HAZARD_SOURCES, overlay_source
+from .utils import FACILITY_GROUPS, facility_group
+from .versioning import data_version
+
+CRITICAL_GROUPS = ['evacuation', 'medical', 'emergency_services']
+
+# Bumped by sync_facilities so in-place facility updates invalidate the report
+FACILITY_VERSION_KEY = 'facility_data_version'
+
+# Classes that make a facility "high hazard"
+HIGH_HAZARD_CLASSES = {
+    'flood': ['HS', 'VHS'],
+    'landslide': ['HS', 'VHS', 'DF'],
+    'liquefaction': ['HS'],
+}
+
+SEVERITY_SQL = "CASE {column} WHEN 'DF' THEN 5 WHEN 'VHS' THEN 4 WHEN 'HS' THEN 3 WHEN 'MS' THEN 2 ELSE 1 END"
+
+
+def data_fingerprint():
+    """Changes whenever a hazard or boundary version is activated or the facility table changes"""
+    facilities = Facility.objects.aggregate(count=Count('id'), latest=Max('id'), created=Max('created_at'))
+    created = facilities['created'].timestamp() if facilities['created'] else 0
+    return (
+        f"{data_version()}-"
+        f"{facilities['count']}-{facilities['latest']}-{int(created)}-"
+        f"{cache.get(FACILITY_VERSION_KEY, 0)}"
+    )
+
+
+def _exposure_rows(facility_types):
+    qn = connection.ops.quote_name
+    laterals = []
+    selects = []
+    params = []
+    for alias, hazard_type in zip(('fl', 'ls', 'lq'), HAZARD_SOURCES):
+        source = overlay_source(hazard_type)
+        column = f"h.{source['column']}"
+        laterals.append(f"""
+            LEFT JOIN LATERAL (
+                SELECT {column} AS level
+                FROM {source['table']} h
+                WHERE h.geometry && f.location
+                  AND ST_Intersects(h.geometry, f.location)
+                  {source['where']}
+                ORDER BY {SEVERITY_SQL.format(column=column)} DESC
+                LIMIT 1
+            ) {alias} ON TRUE
+        """)
+        selects.append(f"{alias}.level")
+        params += source['params']
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT f.id, f.name, f.facility_type, ST_Y(f.location), ST_X(f.location),
+                   {', '.join(selects)},
+                   b.adm4_en, b.adm4_pcode, b.adm3_en, b.adm3_pcode
+            FROM {qn(Facility._meta.db_table)} f
+            {' '.join(laterals)}
+            LEFT JOIN LATERAL (
+                SELECT adm4_en, adm4_pcode, adm3_en, adm3_pcode
+                FROM {qn(BarangayBoundaryNew._meta.db_table)} bb
+                WHERE bb.geometry && f.location
+                  AND ST_Intersects(bb.geometry, f.location)
+                  AND bb.active
+                LIMIT 1
+            ) b ON TRUE
+            WHERE f.facility_type = ANY(%s)
+            ORDER BY b.adm3_en NULLS LAST, f.name
+        """, params + [facility_types])
+        return cursor.fetchall()
+
+
+def build_facility_exposure_report():
+    """Join every critical facility to its hazard classes, grouped by municipality"""
+    start = time.time()
+    facility_types = [t for group in CRITICAL_GROUPS for t in FACILITY_GROUPS[group]]
+
+    municipalities = {}
+    by_group = {group: {'total': 0, 'high_hazard': 0} for group in CRITICAL_GROUPS}
+    by_class = {hazard_type: {} for hazard_type in HAZARD_SOURCES}
+    total = 0
+
+    for (facility_id, name, facility_type, lat, lng, flood, landslide, liquefaction,
+         barangay, barangay_code, municipality, municipality_code) in _exposure_rows(facility_types):
+        levels = {'flood': flood, 'landslide': landslide, 'liquefaction': liquefaction}
+        high_hazard = any(levels[h] in classes for h, classes in HIGH_HAZARD_CLASSES.items())
+        group = facility_group(facility_type)
+
+        key = municipality_code or 'unknown'
+        entry = municipalities.setdefault(key, {
+            'code': municipality_code,
+            'name': municipality or 'Outside mapped barangays',
+            'facility_count': 0,
+            'high_hazard_count': 0,
+            'by_hazard': {hazard_type: {} for hazard_type in HAZARD_SOURCES},
+            'facilities': [],
+        })
+        entry['facility_count'] += 1
+        entry['high_hazard_count'] += high_hazard
+        for hazard_type, level in levels.items():
+            level = level or 'NONE'
+            entry['by_hazard'][hazard_type][level] = entry['by_hazard'][hazard_type].get(level, 0) + 1
+            by_class[hazard_type][level] = by_class[hazard_type].get(level, 0) + 1
+        entry['facilities'].append({
+            'id': facility_id,
+            'name': name,
+            'facility_type': facility_type,
+            'group': group,
+            'lat': lat,
+            'lng': lng,
+            'barangay': barangay,
+            'barangay_code': barangay_code,
+            **levels,
+            'high_hazard': high_hazard,
+        })
+
+        by_group[group]['total'] += 1
+        by_group[group]['high_hazard'] += high_hazard
+        total += 1
+
+    report = {
+        'facility_count': total,
+        'high_hazard_count': sum(g['high_hazard'] for g in by_group.values()),
+        'high_hazard_classes': HIGH_HAZARD_CLASSES,
+        'by_group': by_group,
+        'by_class': by_class,
+        # Municipalities with the most high-hazard facilities first
+        'municipalities': sorted(
+            municipalities.values(), key=lambda m: (-m['high_hazard_count'], m['name'])
+        ),
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'elapsed_ms': round((time.time() - start) * 1000),
+    }
+    print(f"🏥 Facility exposure report: {total} facilities, "
+          f"{report['high_hazard_count']} in high-hazard zones ({report['elapsed_ms']} ms)")
+    return report
+
+
+def get_facility_exposure_report(rebuild=False):
+    """Cached report, rebuilt only when the hazard or facility data changed"""
+    cache_key = f"facility_exposure_{data_fingerprint()}"
+    report = None if rebuild else cache.get(cache_key)
+    if report is None:
+        report = build_facility_exposure_report()
+        cache.set(cache_key, report, None)
+    return report
@@ -0,0 +1,274 @@
+"""
+Asynchronous upload processing.
+
+An upload is saved under INGEST_UPLOAD_DIR and queued as an IngestJob, and
+the request returns straight away. A worker (a daemon thread of the web
+process, or the ``run_ingest_worker`` command) claims queued jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` and runs the usual processors, which
+report their stage and feature counts through ``report_progress``. A
+running job whose progress stops being written lost its worker and is
+failed by the next claim.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import IngestJob
+
+CSV_TYPES = ('municipality_characteristics', 'barangay_characteristics', 'zonal_values')
+
+PROGRESS_INTERVAL_S = 1.0
+MAX_JOB_ERRORS = 200  # error lines kept on the job; error_count has the full number
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class _ProgressWriter(threading.Thread):
+    """
+    Copies processor progress to the job row about once a second. Writes go
+    through this thread's own connection: the loaders keep a transaction
+    open, and rows updated inside it stay invisible until it commits.
+    """
+
+    def __init__(self, job_id, errors):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.errors = errors
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def __call__(self, stage=None, processed=None, total=None):
+        with self.lock:
+            if stage is not None:
+                self.pending['stage'] = stage
+            if total is not None:
+                self.pending['features_total'] = total
+            if processed is not None:
+                self.pending['features_processed'] = processed
+
+    def run(self):
+        try:
+            while not self.done.wait(PROGRESS_INTERVAL_S):
+                self.flush()
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write pending progress; a failed write is retried on the next tick over a new connection"""
+        with self.lock:
+            fields, self.pending = self.pending, {}
+        try:
+            IngestJob.objects.filter(pk=self.job_id).update(
+                error_count=len(self.errors), updated_at=timezone.now(), **fields,
+            )
+        except Exception as e:
+            print(f"⚠️ Could not write progress of ingest job #{self.job_id}: {e}")
+            connection.close()
+            with self.lock:
+                self.pending = {**fields, **self.pending}
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def enqueue_upload(uploaded_file, dataset_type, upsert=False, province=''):
+    """
+    Save the upload and queue it (as an upsert of the stored layer if
+    ``upsert``; ``province`` picks the province kept from a barangay GDB).
+    Returns the IngestJob.
+    """
+    upload_dir = str(settings.INGEST_UPLOAD_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+    file_path = os.path.join(upload_dir, f"{uuid.uuid4().hex}_{os.path.basename(uploaded_file.name)}")
+
+    with open(file_path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    job = IngestJob.objects.create(
+        dataset_type=dataset_type, file_name=uploaded_file.name, file_path=file_path, upsert=upsert,
+        province=province,
+    )
+    print(
+        f"📥 Queued ingest job #{job.id}: {uploaded_file.name} "
+        f"({dataset_type}{', upsert' if upsert else ''}{f', {province}' if province else ''})"
+    )
+    return job
+
+
+def fail_stale_jobs():
+    """
+    Mark running jobs whose worker died (no progress written for
+    INGEST_STALE_JOB_SECONDS) as failed; returns the number failed. They are
+    not requeued: a file that killed its worker would only kill the next one.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'INGEST_STALE_JOB_SECONDS', 300))
+    with transaction.atomic():
+        stale = list(
+            IngestJob.objects.select_for_update(skip_locked=True)
+            .filter(status='running', updated_at__lt=cutoff)
+        )
+        for job in stale:
+            last_progress = job.updated_at
+            job.status = job.stage = 'failed'
+            job.message = "The worker stopped responding; upload the file again"
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'stage', 'message', 'finished_at', 'updated_at'])
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+            print(f"❌ Ingest job #{job.id} failed: no progress since {last_progress:%Y-%m-%d %H:%M:%S}")
+    return len(stale)
+
+
+def claim_next_job():
+    """Mark the oldest queued job as running and return it, or None"""
+    fail_stale_jobs()
+    with transaction.atomic():
+        job = (
+            IngestJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued').order_by('created_at').first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.stage = 'starting'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'stage', 'started_at', 'updated_at'])
+    return job
+
+
+def _repair_note(repairs):
+    """One line on the job message when the validation stage had to fix or drop geometries"""
+    if not repairs:
+        return ''
+    fixed = repairs.get('repaired', 0) + repairs.get('parts_dropped', 0)
+    dropped = repairs.get('dropped', 0) + repairs.get('failed', 0)
+    if not fixed and not dropped:
+        return ''
+    return f"\n🩹 {fixed} geometries repaired, {dropped} dropped"
+
+
+def run_job(job):
+    """Process a claimed job; failures are recorded on the job, not raised"""
+    from .utils import CSVProcessor, ShapefileProcessor
+
+    start = time.time()
+    errors = []
+    writer = None
+    try:
+        with open(job.file_path, 'rb') as source:
+            upload = File(source, name=job.file_name)
+            if job.dataset_type in CSV_TYPES:
+                processor = CSVProcessor(upload, job.dataset_type, upsert=job.upsert)
+            else:
+                processor = ShapefileProcessor(upload, job.dataset_type, province=job.province or None, upsert=job.upsert)
+            errors = processor.errors
+            writer = _ProgressWriter(job.id, errors)
+            processor.progress = writer
+            writer.start()
+            result = processor.process()
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    finally:
+        if writer is not None:
+            writer.stop()
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+
+    fields = {
+        'error_count': len(errors),
+        'errors': '\n'.join(errors[:MAX_JOB_ERRORS]),
+        'finished_at': timezone.now(),
+        'updated_at': timezone.now(),
+    }
+    if result['success']:
+        fields.update(
+            status='completed', stage='completed', dataset_id=result['dataset_id'],
+            data_version=result.get('data_version'), records_created=result['records_created'],
+            message=result['message'] + _repair_note(result.get('geometry_repairs')),
+        )
+        print(f"✅ Ingest job #{job.id} completed: {result['records_created']} records ({time.time() - start:.1f}s)")
+    else:
+        fields.update(status='failed', stage='failed', message=result['error'])
+        print(f"❌ Ingest job #{job.id} failed: {result['error']}")
+    # A job fail_stale_jobs gave up on keeps that verdict
+    if not IngestJob.objects.filter(pk=job.pk, status='running').update(**fields):
+        print(f"⚠️ Ingest job #{job.id} was already marked failed as stale; its result was not recorded")
+
+
+def run_pending_jobs():
+    """Run queued jobs until the queue is empty; returns the number run"""
+    count = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+
+def _drain_queue():
+    global _worker
+    try:
+        while True:
+            run_pending_jobs()
+            with _worker_lock:
+                # Checked under the lock so a job queued meanwhile starts a new thread
+                if not IngestJob.objects.filter(status='queued').exists():
+                    _worker = None
+                    return
+    finally:
+        connection.close()
+
+
+def start_worker_thread():
+    """Drain the queue in a daemon thread of this process, unless one is running"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_drain_queue, daemon=True)
+            _worker.start()
+
+
+def job_status(job):
+    """Stage, counts, throughput and errors of a job"""
+    elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds() if job.started_at else 0
+    total = job.features_total
+    return {
+        'id': job.id,
+        'dataset_type': job.dataset_type,
+        'upsert': job.upsert,
+        'province': job.province or None,
+        'file_name': job.file_name,
+        'status': job.status,
+        'stage': job.stage,
+        'features_total': total,
+        'features_processed': job.features_processed,
+        'progress': round(100 * min(job.features_processed / total, 1), 1) if total else None,
+        'rate': round(job.features_processed / elapsed, 1) if elapsed > 0 else None,  # features per second
+        'elapsed_seconds': round(elapsed, 1),
+        'records_created': job.records_created,
+        'error_count': job.error_count,
+        'errors': job.errors.splitlines() if job.errors else [],
+        'message': job.message or None,
+        'dataset_id': job.dataset_id,
+        'data_version': job.data_version,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
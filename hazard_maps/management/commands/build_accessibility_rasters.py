@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.accessibility import COUNT_RADIUS_M, DEFAULT_CELL_M, build_accessibility_rasters
+
+
+class Command(BaseCommand):
+    help = "Build province-wide nearest-facility distance and 3 km facility-count rasters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cell', type=float, default=DEFAULT_CELL_M, help="Cell size in metres")
+        parser.add_argument('--radius', type=float, default=COUNT_RADIUS_M, help="Focal count radius in metres")
+        parser.add_argument(
+            '--output',
+            default=str(settings.ACCESSIBILITY_RASTER_DIR),
+            help="Directory for the .npy rasters"
+        )
+        parser.add_argument(
+            '--sync-facilities',
+            action='store_true',
+            help="Refresh the Facility table from Overpass first"
+        )
+
+    def handle(self, *args, **options):
+        if options['sync_facilities']:
+            call_command('sync_facilities', stdout=self.stdout)
+
+        try:
+            metadata = build_accessibility_rasters(
+                output_dir=options['output'],
+                cell=options['cell'],
+                radius=options['radius'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Built {len(metadata['layers'])} rasters "
+            f"({metadata['width']} x {metadata['height']} cells) "
+            f"from {metadata['facility_count']} facilities"
+        ))
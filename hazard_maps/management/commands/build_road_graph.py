@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.overpass_client import OverpassClient
+from hazard_maps.routing import RoadGraph
+from hazard_maps.spatial import province_bbox
+
+
+class Command(BaseCommand):
+    help = "Build the local road graph used for facility travel times from an OSM road extract"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            help="Overpass JSON or GeoJSON road extract. Downloaded from Overpass when omitted."
+        )
+        parser.add_argument(
+            '--bbox',
+            help="south,west,north,east to download (defaults to the barangay boundary extent)"
+        )
+        parser.add_argument(
+            '--output',
+            default=str(settings.ROAD_GRAPH_PATH),
+            help="Where to write the .npz graph"
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            if options['bbox']:
+                try:
+                    south, west, north, east = [float(v) for v in options['bbox'].split(',')]
+                except ValueError:
+                    raise CommandError("--bbox must be south,west,north,east")
+            else:
+                south, west, north, east = province_bbox()
+            data = OverpassClient.query_road_network(south, west, north, east)
+
+        if data.get('type') == 'FeatureCollection':
+            graph = RoadGraph.from_geojson(data)
+        elif 'elements' in data:
+            graph = RoadGraph.from_overpass(data)
+        else:
+            raise CommandError("Input is neither Overpass JSON nor a GeoJSON FeatureCollection")
+
+        if graph.node_count == 0:
+            raise CommandError("No routable roads found in the extract")
+
+        graph.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Road graph written to {options['output']}: "
+            f"{graph.node_count} nodes, {graph.edge_count} edges "
+            f"({time.time() - start:.1f}s)"
+        ))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.suitability import DEFAULT_MIN_ZOOM, DEFAULT_ZOOM, build_suitability_heatmap
+
+
+class Command(BaseCommand):
+    help = "Score development suitability across the province into a COG and PNG tile pyramid"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--zoom',
+            type=int,
+            default=DEFAULT_ZOOM,
+            help="Tile zoom of the scoring grid (12 = ~38 m cells, 13 = ~19 m)"
+        )
+        parser.add_argument('--min-zoom', type=int, default=DEFAULT_MIN_ZOOM, help="Lowest tile zoom to write")
+        parser.add_argument('--workers', type=int, help="Scoring threads (defaults to the CPU count)")
+        parser.add_argument(
+            '--output',
+            default=str(settings.SUITABILITY_HEATMAP_DIR),
+            help="Directory for the COG, tiles and metadata"
+        )
+        parser.add_argument(
+            '--build-accessibility',
+            action='store_true',
+            help="Rebuild the accessibility rasters first"
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['zoom'] - options['min_zoom'] <= 8:
+            raise CommandError("--min-zoom must be between zoom - 8 and zoom")
+
+        if options['build_accessibility']:
+            call_command('build_accessibility_rasters', stdout=self.stdout)
+
+        try:
+            metadata = build_suitability_heatmap(
+                output_dir=options['output'],
+                zoom=options['zoom'],
+                min_zoom=options['min_zoom'],
+                workers=options['workers'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Scored {metadata['scored_cells']} cells "
+            f"({metadata['width']} x {metadata['height']} grid), wrote {metadata['tile_count']} tiles"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.diff import MAX_WORKERS, start_diff
+from hazard_maps.models import HazardDataset
+
+
+class Command(BaseCommand):
+    help = "Compare two uploads of the same hazard layer and store the changed areas per barangay"
+
+    def add_arguments(self, parser):
+        parser.add_argument('old_dataset', type=int, help="HazardDataset id of the previous map")
+        parser.add_argument('new_dataset', type=int, help="HazardDataset id of the reissued map")
+        parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Tiles processed in parallel")
+
+    def handle(self, *args, **options):
+        try:
+            old_dataset = HazardDataset.objects.get(pk=options['old_dataset'])
+            new_dataset = HazardDataset.objects.get(pk=options['new_dataset'])
+        except HazardDataset.DoesNotExist:
+            raise CommandError("Dataset not found")
+
+        try:
+            diff = start_diff(old_dataset, new_dataset, background=False, workers=options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if diff.status != 'completed':
+            raise CommandError(f"Diff #{diff.id} failed: {diff.error}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Diff #{diff.id}: {diff.change_count} changed areas"))
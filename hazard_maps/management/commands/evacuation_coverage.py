@@ -0,0 +1,49 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.evacuation_coverage import (
+    DEFAULT_CELL_M, DEFAULT_MAX_DISTANCE_M, DEFAULT_MAX_MINUTES, METHODS, UNITS, evacuation_coverage,
+)
+
+
+class Command(BaseCommand):
+    help = "Assign every barangay (or populated grid cell) to its nearest evacuation centre and report coverage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=METHODS, default='euclidean')
+        parser.add_argument('--mode', choices=['walk', 'drive'], default='walk')
+        parser.add_argument('--unit', choices=UNITS, default='barangay')
+        parser.add_argument('--max-distance', type=float, default=DEFAULT_MAX_DISTANCE_M)
+        parser.add_argument('--max-minutes', type=float, default=DEFAULT_MAX_MINUTES)
+        parser.add_argument('--cell', type=float, default=DEFAULT_CELL_M, help="Grid cell size in metres")
+        parser.add_argument('--csv', help="Write the per-barangay results to this CSV file")
+        parser.add_argument('--top', type=int, default=10, help="Underserved barangays to list")
+
+    def handle(self, *args, **options):
+        try:
+            result = evacuation_coverage(
+                options['method'], options['mode'], options['unit'],
+                options['max_distance'], options['max_minutes'], options['cell'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for barangay in result['barangays'][:options['top']]:
+            if barangay['uncovered_population'] > 0:
+                self.stdout.write(
+                    f"  {barangay['barangay']}, {barangay['municipality']}: "
+                    f"{barangay['uncovered_population']:,} uncovered"
+                )
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(result['barangays'][0]))
+                writer.writeheader()
+                writer.writerows(result['barangays'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['coverage_percentage']}% of {result['total_population']:,} people covered; "
+            f"{result['uncovered_population']:,} uncovered in {result['underserved_barangay_count']} barangays "
+            f"({result['elapsed_ms']} ms)"
+        ))
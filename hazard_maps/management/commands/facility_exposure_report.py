@@ -0,0 +1,41 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from hazard_maps.facility_exposure import get_facility_exposure_report
+
+
+class Command(BaseCommand):
+    help = "Join critical facilities against every hazard layer and cache the exposure report"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync-facilities',
+            action='store_true',
+            help="Refresh the local Facility table from Overpass first"
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Recompute even if the cached report is still current"
+        )
+
+    def handle(self, *args, **options):
+        if options['sync_facilities']:
+            call_command('sync_facilities', stdout=self.stdout)
+
+        report = get_facility_exposure_report(rebuild=options['force'])
+        if not report['facility_count']:
+            self.stdout.write(self.style.WARNING(
+                "⚠️ No critical facilities in the local table. Run with --sync-facilities."
+            ))
+            return
+
+        for municipality in report['municipalities']:
+            self.stdout.write(
+                f"  {municipality['name']}: {municipality['high_hazard_count']}"
+                f"/{municipality['facility_count']} in high-hazard zones"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['high_hazard_count']} of {report['facility_count']} critical facilities "
+            f"in high-hazard zones"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hazard_maps.adjacency import refresh_barangay_adjacency
+
+
+class Command(BaseCommand):
+    help = "Recompute the neighbouring-barangay table and shared boundary lengths"
+
+    def handle(self, *args, **options):
+        rows = refresh_barangay_adjacency()
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {rows} barangay neighbour pairs"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from hazard_maps.exposure import refresh_barangay_exposure
+from hazard_maps.valuation import refresh_barangay_valuation
+
+
+class Command(BaseCommand):
+    help = "Recompute per-barangay hazard exposure, then the zonal valuation and value at risk"
+
+    def handle(self, *args, **options):
+        rows = refresh_barangay_exposure()
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {rows} barangay exposure rows"))
+
+        rows = refresh_barangay_valuation()
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {rows} barangay valuation rows"))
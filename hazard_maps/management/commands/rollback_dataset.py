@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hazard_maps.exposure import refresh_after_ingest
+from hazard_maps.subdivided import HAZARD_SOURCES
+from hazard_maps.versioning import rollback_layer
+
+
+class Command(BaseCommand):
+    help = "Reactivate the retained previous version of a hazard or boundary layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_type', choices=list(HAZARD_SOURCES) + ['barangay'])
+        parser.add_argument(
+            '--scope',
+            default='',
+            help="Version scope, the province for barangay boundaries (e.g. 'Negros Oriental')"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            dataset = rollback_layer(options['dataset_type'], options['scope'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if dataset.dataset_type == 'barangay':
+            from hazard_maps.adjacency import refresh_barangay_adjacency
+            refresh_barangay_adjacency()
+        refresh_after_ingest(dataset.dataset_type)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {dataset.dataset_type} rolled back to dataset #{dataset.id} (data version {dataset.version})"
+        ))
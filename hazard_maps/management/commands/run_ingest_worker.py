@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hazard_maps.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued uploads (set INGEST_THREAD_WORKER = False when running this)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between queue checks')
+
+    def handle(self, *args, **options):
+        self.stdout.write("👷 Ingest worker started")
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"✅ Processed {count} ingest jobs"))
+            if options['once']:
+                return
+            time.sleep(options['poll'])
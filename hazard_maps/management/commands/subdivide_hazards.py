@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hazard_maps.subdivided import HAZARD_SOURCES, MAX_VERTICES, rebuild_subdivided_hazards
+
+
+class Command(BaseCommand):
+    help = f"Rebuild the subdivided hazard pieces (ST_Subdivide, max {MAX_VERTICES} vertices) used by polygon overlays"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'hazard_types',
+            nargs='*',
+            choices=list(HAZARD_SOURCES),
+            help="Layers to rebuild (defaults to all)"
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        counts = rebuild_subdivided_hazards(options['hazard_types'] or None)
+        summary = ', '.join(f"{hazard_type}: {pieces}" for hazard_type, pieces in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"✅ Subdivided hazards ({summary}) in {time.time() - start:.1f}s"))
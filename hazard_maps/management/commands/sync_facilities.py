@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hazard_maps.facility_exposure import FACILITY_VERSION_KEY
+from hazard_maps.models import Facility
+from hazard_maps.overpass_client import OverpassClient
+from hazard_maps.spatial import province_bbox
+
+
+class Command(BaseCommand):
+    help = "Download every mapped facility in the province from Overpass into the local Facility table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bbox',
+            help="south,west,north,east to download (defaults to the barangay boundary extent)"
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help="Delete facilities that are no longer returned by Overpass"
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+
+        if options['bbox']:
+            try:
+                south, west, north, east = [float(v) for v in options['bbox'].split(',')]
+            except ValueError:
+                raise CommandError("--bbox must be south,west,north,east")
+        else:
+            south, west, north, east = province_bbox()
+
+        facilities = OverpassClient.query_facilities_bbox(south, west, north, east)
+        if not facilities:
+            raise CommandError("Overpass returned no facilities")
+
+        # osm_id is unique in the table, so keep the first of any node/way id clash
+        records = {}
+        for f in facilities:
+            if f['osm_id'] in records:
+                continue
+            records[f['osm_id']] = Facility(
+                name=f['name'][:200],
+                facility_type=f['facility_type'],
+                category=f['category'],
+                location=Point(f['lng'], f['lat'], srid=4326),
+                osm_id=f['osm_id'],
+                osm_type=f['osm_type'],
+            )
+
+        with transaction.atomic():
+            Facility.objects.bulk_create(
+                records.values(),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['osm_id'],
+                update_fields=['name', 'facility_type', 'category', 'location', 'osm_type'],
+            )
+            removed = 0
+            if options['replace']:
+                removed, _ = Facility.objects.exclude(osm_id__in=list(records)).delete()
+
+        # Upserts don't move created_at, so invalidate the cached exposure report explicitly
+        cache.set(FACILITY_VERSION_KEY, int(time.time()), None)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Synced {len(records)} facilities"
+            + (f", removed {removed} stale" if removed else "")
+            + f" ({time.time() - start:.1f}s)"
+        ))
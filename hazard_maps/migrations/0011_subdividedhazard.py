@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:44
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0010_zonalvalue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubdividedHazard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hazard_type', models.CharField(choices=[('flood', 'Flood'), ('landslide', 'Landslide'), ('liquefaction', 'Liquefaction')], max_length=20)),
+                ('susceptibility', models.CharField(max_length=3)),
+                ('source_id', models.IntegerField()),
+                ('geometry', django.contrib.gis.db.models.fields.PolygonField(srid=4326)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hazard_maps.hazarddataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hazard_type', 'susceptibility'], name='hazard_maps_hazard__330411_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0011_subdividedhazard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarangayHazardExposure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('adm4_pcode', models.CharField(max_length=50)),
+                ('adm4_en', models.CharField(max_length=100)),
+                ('adm3_pcode', models.CharField(db_index=True, max_length=50)),
+                ('adm3_en', models.CharField(max_length=100)),
+                ('hazard_type', models.CharField(choices=[('flood', 'Flood'), ('landslide', 'Landslide'), ('liquefaction', 'Liquefaction')], max_length=20)),
+                ('susceptibility', models.CharField(max_length=4)),
+                ('area_sqm', models.FloatField()),
+                ('barangay_area_sqm', models.FloatField()),
+                ('percentage', models.FloatField()),
+                ('population_exposed', models.FloatField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hazard_type', 'susceptibility'], name='hazard_maps_hazard__8642d5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('adm4_pcode', 'hazard_type', 'susceptibility'), name='unique_barangay_hazard_class')],
+            },
+        ),
+    ]
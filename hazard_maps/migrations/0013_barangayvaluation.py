@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0012_barangayhazardexposure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarangayValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barangay_code', models.CharField(max_length=50)),
+                ('barangay_name', models.CharField(max_length=100)),
+                ('municipality', models.CharField(max_length=100)),
+                ('land_class', models.CharField(max_length=50)),
+                ('entry_count', models.IntegerField()),
+                ('avg_price', models.FloatField()),
+                ('median_price', models.FloatField()),
+                ('min_price', models.FloatField()),
+                ('max_price', models.FloatField()),
+                ('barangay_area_sqm', models.FloatField(blank=True, null=True)),
+                ('flood_exposed_pct', models.FloatField(blank=True, null=True)),
+                ('landslide_exposed_pct', models.FloatField(blank=True, null=True)),
+                ('liquefaction_exposed_pct', models.FloatField(blank=True, null=True)),
+                ('flood_value_at_risk', models.FloatField(blank=True, null=True)),
+                ('landslide_value_at_risk', models.FloatField(blank=True, null=True)),
+                ('liquefaction_value_at_risk', models.FloatField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['municipality', 'barangay_name', 'land_class'],
+                'constraints': [models.UniqueConstraint(fields=('barangay_code', 'land_class'), name='unique_barangay_land_class')],
+            },
+        ),
+    ]
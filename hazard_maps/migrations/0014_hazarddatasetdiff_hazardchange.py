@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:52
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0013_barangayvaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HazardDatasetDiff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hazard_type', models.CharField(choices=[('flood', 'Flood'), ('landslide', 'Landslide'), ('liquefaction', 'Liquefaction')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('tiles_total', models.IntegerField(default=0)),
+                ('tiles_done', models.IntegerField(default=0)),
+                ('change_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('new_dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='diffs_as_new', to='hazard_maps.hazarddataset')),
+                ('old_dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='diffs_as_old', to='hazard_maps.hazarddataset')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HazardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('adm4_pcode', models.CharField(max_length=50)),
+                ('adm4_en', models.CharField(max_length=100)),
+                ('adm3_pcode', models.CharField(max_length=50)),
+                ('adm3_en', models.CharField(max_length=100)),
+                ('change_type', models.CharField(choices=[('added', 'Added'), ('removed', 'Removed'), ('upgraded', 'Upgraded'), ('downgraded', 'Downgraded')], max_length=20)),
+                ('old_level', models.CharField(blank=True, max_length=3, null=True)),
+                ('new_level', models.CharField(blank=True, max_length=3, null=True)),
+                ('area_sqm', models.FloatField()),
+                ('geometry', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                ('diff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='hazard_maps.hazarddatasetdiff')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['diff', 'adm4_pcode'], name='hazard_maps_diff_id_9728c1_idx'), models.Index(fields=['diff', 'change_type'], name='hazard_maps_diff_id_3983cc_idx')],
+            },
+        ),
+    ]
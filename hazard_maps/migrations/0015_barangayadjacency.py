@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0014_hazarddatasetdiff_hazardchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarangayAdjacency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('adm4_pcode', models.CharField(max_length=50)),
+                ('neighbor_pcode', models.CharField(max_length=50)),
+                ('neighbor_name', models.CharField(max_length=100)),
+                ('neighbor_municipality', models.CharField(max_length=100)),
+                ('shared_length_m', models.FloatField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('adm4_pcode', 'neighbor_pcode'), name='unique_barangay_neighbor')],
+            },
+        ),
+    ]
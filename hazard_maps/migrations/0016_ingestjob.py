@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0015_barangayadjacency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_type', models.CharField(choices=[('flood', 'Flood Susceptibility'), ('landslide', 'Landslide Susceptibility'), ('liquefaction', 'Liquefaction Susceptibility'), ('sea_level_rise', 'Sea Level Rise'), ('zonal_values', 'Zonal Values'), ('barangay', 'Barangay Boundaries'), ('municipality_characteristics', 'Municipality Characteristics'), ('barangay_characteristics', 'Barangay Characteristics'), ('barangay_new', 'Barangay Boundaries (GDB)')], max_length=50)),
+                ('file_name', models.CharField(max_length=200)),
+                ('file_path', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('stage', models.CharField(default='queued', max_length=50)),
+                ('features_total', models.IntegerField(blank=True, null=True)),
+                ('features_processed', models.IntegerField(default=0)),
+                ('records_created', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('errors', models.TextField(blank=True)),
+                ('message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('dataset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='hazard_maps.hazarddataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='hazard_maps_status_ce2080_idx')],
+            },
+        ),
+    ]
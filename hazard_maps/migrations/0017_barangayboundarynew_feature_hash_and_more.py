@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0016_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barangayboundarynew',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='barangaycharacteristic',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='floodsusceptibility',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='upsert',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='landslidesusceptibility',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='liquefactionsusceptibility',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='municipalitycharacteristic',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='zonalvalue',
+            name='feature_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:35
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def scope_barangay_datasets(apps, schema_editor):
+    # Boundary versions replace each other per province
+    HazardDataset = apps.get_model('hazard_maps', 'HazardDataset')
+    BarangayBoundaryNew = apps.get_model('hazard_maps', 'BarangayBoundaryNew')
+    for dataset in HazardDataset.objects.filter(dataset_type='barangay'):
+        province = BarangayBoundaryNew.objects.filter(dataset=dataset).values_list('adm2_en', flat=True).first()
+        if province:
+            HazardDataset.objects.filter(pk=dataset.pk).update(scope=province)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0017_barangayboundarynew_feature_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='subdividedhazard',
+            name='hazard_maps_hazard__330411_idx',
+        ),
+        migrations.AddField(
+            model_name='barangayboundarynew',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='floodsusceptibility',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='hazarddataset',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hazarddataset',
+            name='scope',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='hazarddataset',
+            name='status',
+            field=models.CharField(choices=[('staging', 'Staging'), ('active', 'Active'), ('retired', 'Retired')], default='active', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='hazarddataset',
+            name='version',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='data_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='landslidesusceptibility',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='liquefactionsusceptibility',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='subdividedhazard',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='barangayboundarynew',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(spatial_index=False, srid=4326),
+        ),
+        migrations.AlterField(
+            model_name='floodsusceptibility',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(spatial_index=False, srid=4326),
+        ),
+        migrations.AlterField(
+            model_name='landslidesusceptibility',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(spatial_index=False, srid=4326),
+        ),
+        migrations.AlterField(
+            model_name='liquefactionsusceptibility',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(spatial_index=False, srid=4326),
+        ),
+        migrations.AlterField(
+            model_name='subdividedhazard',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.PolygonField(spatial_index=False, srid=4326),
+        ),
+        migrations.AddIndex(
+            model_name='barangayboundarynew',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['geometry'], name='barangay_geom_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='floodsusceptibility',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['geometry'], name='flood_geom_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='hazarddataset',
+            index=models.Index(fields=['dataset_type', 'scope', 'status'], name='hazard_maps_dataset_ac3300_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landslidesusceptibility',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['geometry'], name='landslide_geom_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='liquefactionsusceptibility',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['geometry'], name='liquefaction_geom_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='subdividedhazard',
+            index=models.Index(condition=models.Q(('active', True)), fields=['hazard_type', 'susceptibility'], name='subdivided_active_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subdividedhazard',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['geometry'], name='subdivided_geom_active_gist'),
+        ),
+        migrations.RunPython(scope_barangay_datasets, migrations.RunPython.noop),
+    ]
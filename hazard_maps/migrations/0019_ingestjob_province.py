@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hazard_maps', '0018_remove_subdividedhazard_hazard_maps_hazard__330411_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='province',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
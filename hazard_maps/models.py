@@ -1,4 +1,14 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GistIndex
+from django.db.models import Q
+
+
+class VersionedQuerySet(models.QuerySet):
+    """Rows of layers loaded as staged, active and retired dataset versions"""
+    
+    def active(self):
+        return self.filter(active=True)
+
 
 class HazardDataset(models.Model):
     """Model to track uploaded datasets"""
@@ -19,6 +29,22 @@ class HazardDataset(models.Model):
     file_name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     
+    # Versioning: uploads load as staging and are swapped in on activation
+    STATUSES = [
+        ('staging', 'Staging'),
+        ('active', 'Active'),
+        ('retired', 'Retired'),
+    ]
+    status = models.CharField(max_length=10, choices=STATUSES, default='active')
+    scope = models.CharField(max_length=100, blank=True)  # Versions replace each other within (dataset_type, scope)
+    version = models.PositiveIntegerField(null=True, blank=True, unique=True)  # Data version published on activation
+    activated_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['dataset_type', 'scope', 'status']),
+        ]
+    
     def __str__(self):
         return f"{self.name} ({self.get_dataset_type_display()})"
 
@@ -37,7 +63,16 @@ class FloodSusceptibility(models.Model):
     shape_length = models.FloatField(null=True, blank=True)
     shape_area = models.FloatField(null=True, blank=True)
     orig_fid = models.IntegerField(null=True, blank=True)
-    geometry = models.MultiPolygonField(srid=4326)
+    geometry = models.MultiPolygonField(srid=4326, spatial_index=False)  # Indexed for active rows only
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
+    active = models.BooleanField(default=True)  # False while staged or after being retired
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            GistIndex(fields=['geometry'], name='flood_geom_active_gist', condition=Q(active=True)),
+        ]
     
     def __str__(self):
         return f"Flood {self.flood_susc} - FID: {self.orig_fid}"
@@ -58,7 +93,16 @@ class LandslideSusceptibility(models.Model):
     shape_length = models.FloatField(null=True, blank=True)
     shape_area = models.FloatField(null=True, blank=True)
     orig_fid = models.IntegerField(null=True, blank=True)
-    geometry = models.MultiPolygonField(srid=4326)
+    geometry = models.MultiPolygonField(srid=4326, spatial_index=False)  # Indexed for active rows only
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
+    active = models.BooleanField(default=True)  # False while staged or after being retired
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            GistIndex(fields=['geometry'], name='landslide_geom_active_gist', condition=Q(active=True)),
+        ]
     
     def __str__(self):
         return f"Landslide {self.landslide_susc} - FID: {self.orig_fid}"
@@ -74,7 +118,16 @@ class LiquefactionSusceptibility(models.Model):
     dataset = models.ForeignKey(HazardDataset, on_delete=models.CASCADE)
     liquefaction_susc = models.CharField(max_length=3, choices=SUSCEPTIBILITY_LEVELS)
     original_code = models.CharField(max_length=50)
-    geometry = models.MultiPolygonField(srid=4326)
+    geometry = models.MultiPolygonField(srid=4326, spatial_index=False)  # Indexed for active rows only
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
+    active = models.BooleanField(default=True)  # False while staged or after being retired
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            GistIndex(fields=['geometry'], name='liquefaction_geom_active_gist', condition=Q(active=True)),
+        ]
     
     def __str__(self):
         return f"Liquefaction {self.liquefaction_susc}"
@@ -149,7 +202,12 @@ class BarangayBoundaryNew(models.Model):
     area_sqkm = models.FloatField(null=True, blank=True)  # IMPORTANT: Area in square kilometers
     
     # Geometry
-    geometry = models.MultiPolygonField(srid=4326)
+    geometry = models.MultiPolygonField(srid=4326, spatial_index=False)  # Indexed for active rows only
+    
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
+    active = models.BooleanField(default=True)  # False while staged or after being retired
+    
+    objects = VersionedQuerySet.as_manager()
     
     class Meta:
         indexes = [
@@ -157,6 +215,7 @@ class BarangayBoundaryNew(models.Model):
             models.Index(fields=['adm3_en']),  # Municipality
             models.Index(fields=['adm2_en']),  # Province
             models.Index(fields=['adm4_pcode']),  # Barangay code
+            GistIndex(fields=['geometry'], name='barangay_geom_active_gist', condition=Q(active=True)),
         ]
         verbose_name = "Barangay Boundary (PSA-NAMRIA)"
         verbose_name_plural = "Barangay Boundaries (PSA-NAMRIA)"
@@ -194,6 +253,7 @@ class MunicipalityCharacteristic(models.Model):
     poverty_incidence_rate = models.FloatField(null=True, blank=True)  # Percentage
     
     created_at = models.DateTimeField(auto_now_add=True)
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
     
     class Meta:
         verbose_name = "Municipality Characteristic"
@@ -252,6 +312,7 @@ class BarangayCharacteristic(models.Model):
     public_street_sweeper = models.CharField(max_length=10, choices=YES_NO_CHOICES, null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
     
     class Meta:
         verbose_name = "Barangay Characteristic"
@@ -318,6 +379,7 @@ class ZonalValue(models.Model):
     price_per_sqm = models.DecimalField(max_digits=12, decimal_places=2)  # Price in PHP
     
     created_at = models.DateTimeField(auto_now_add=True)
+    feature_hash = models.CharField(max_length=40, blank=True, default='')
     
     class Meta:
         verbose_name = "Zonal Value"
@@ -341,4 +403,239 @@ class ZonalValue(models.Model):
         return f"₱{self.price_per_sqm:,.2f}/m²"
 
 
+class SubdividedHazard(models.Model):
+    """
+    Hazard polygons cut into small pieces with ST_Subdivide at ingest.
+    Small pieces keep bounding boxes tight, so polygon overlays (parcels,
+    corridors, barangays) only clip a few hundred vertices at a time.
+    """
+    HAZARD_TYPES = [
+        ('flood', 'Flood'),
+        ('landslide', 'Landslide'),
+        ('liquefaction', 'Liquefaction'),
+    ]
+    
+    dataset = models.ForeignKey(HazardDataset, on_delete=models.CASCADE)
+    hazard_type = models.CharField(max_length=20, choices=HAZARD_TYPES)
+    susceptibility = models.CharField(max_length=3)
+    source_id = models.IntegerField()  # Primary key of the original hazard polygon
+    geometry = models.PolygonField(srid=4326, spatial_index=False)  # Indexed for active pieces only
+    active = models.BooleanField(default=True)  # Follows the source dataset's version
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['hazard_type', 'susceptibility'], name='subdivided_active_level_idx', condition=Q(active=True)),
+            GistIndex(fields=['geometry'], name='subdivided_geom_active_gist', condition=Q(active=True)),
+        ]
+    
+    def __str__(self):
+        return f"{self.hazard_type} {self.susceptibility} piece of #{self.source_id}"
+
+
+class BarangayHazardExposure(models.Model):
+    """
+    Precomputed area, share and population of each barangay per hazard class.
+    Rebuilt in one pass by exposure.refresh_barangay_exposure() after hazard,
+    barangay or barangay characteristics ingests. Every barangay has a
+    'NONE' row per hazard type holding its unmapped remainder, so the
+    classes of one barangay always add up to its full area.
+    """
+    adm4_pcode = models.CharField(max_length=50)
+    adm4_en = models.CharField(max_length=100)
+    adm3_pcode = models.CharField(max_length=50, db_index=True)
+    adm3_en = models.CharField(max_length=100)
+    
+    hazard_type = models.CharField(max_length=20, choices=SubdividedHazard.HAZARD_TYPES)
+    susceptibility = models.CharField(max_length=4)  # LS/MS/HS/VHS/DF, or NONE for unmapped area
+    
+    area_sqm = models.FloatField()
+    barangay_area_sqm = models.FloatField()
+    percentage = models.FloatField()
+    population_exposed = models.FloatField(null=True, blank=True)  # Assumes evenly spread population
+    
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['adm4_pcode', 'hazard_type', 'susceptibility'],
+                name='unique_barangay_hazard_class',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hazard_type', 'susceptibility']),
+        ]
+    
+    def __str__(self):
+        return f"{self.adm4_en} {self.hazard_type} {self.susceptibility}: {self.percentage:.1f}%"
 
+
+class BarangayValuation(models.Model):
+    """
+    Zonal value statistics per barangay and land class, rebuilt by
+    valuation.refresh_barangay_valuation() after zonal value or exposure
+    changes. The 'ALL' row of a barangay covers every land class and
+    carries the hazard-exposed share of its area and the value at risk
+    (average price times exposed area).
+    """
+    barangay_code = models.CharField(max_length=50)
+    barangay_name = models.CharField(max_length=100)
+    municipality = models.CharField(max_length=100)
+    land_class = models.CharField(max_length=50)  # ZonalValue class, N/A if unclassified, or ALL
+    
+    entry_count = models.IntegerField()
+    avg_price = models.FloatField()
+    median_price = models.FloatField()
+    min_price = models.FloatField()
+    max_price = models.FloatField()
+    
+    # ALL rows only; null until the barangay's hazard exposure is computed
+    barangay_area_sqm = models.FloatField(null=True, blank=True)
+    flood_exposed_pct = models.FloatField(null=True, blank=True)
+    landslide_exposed_pct = models.FloatField(null=True, blank=True)
+    liquefaction_exposed_pct = models.FloatField(null=True, blank=True)
+    flood_value_at_risk = models.FloatField(null=True, blank=True)
+    landslide_value_at_risk = models.FloatField(null=True, blank=True)
+    liquefaction_value_at_risk = models.FloatField(null=True, blank=True)
+    
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['barangay_code', 'land_class'], name='unique_barangay_land_class'),
+        ]
+        ordering = ['municipality', 'barangay_name', 'land_class']
+    
+    def __str__(self):
+        return f"{self.barangay_name} {self.land_class}: ₱{self.avg_price:,.2f}/m²"
+
+
+class HazardDatasetDiff(models.Model):
+    """
+    Comparison of two uploads of the same hazard layer, computed in the
+    background by diff.run_diff(). The changed areas are stored as
+    HazardChange rows.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    hazard_type = models.CharField(max_length=20, choices=SubdividedHazard.HAZARD_TYPES)
+    old_dataset = models.ForeignKey(HazardDataset, on_delete=models.CASCADE, related_name='diffs_as_old')
+    new_dataset = models.ForeignKey(HazardDataset, on_delete=models.CASCADE, related_name='diffs_as_new')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    tiles_total = models.IntegerField(default=0)
+    tiles_done = models.IntegerField(default=0)
+    change_count = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.hazard_type} diff #{self.old_dataset_id} → #{self.new_dataset_id} ({self.status})"
+
+
+class HazardChange(models.Model):
+    """
+    One changed area of a HazardDatasetDiff, clipped to a barangay.
+    old_level is null for added areas and new_level for removed ones.
+    """
+    CHANGE_TYPES = [
+        ('added', 'Added'),
+        ('removed', 'Removed'),
+        ('upgraded', 'Upgraded'),
+        ('downgraded', 'Downgraded'),
+    ]
+    
+    diff = models.ForeignKey(HazardDatasetDiff, on_delete=models.CASCADE, related_name='changes')
+    adm4_pcode = models.CharField(max_length=50)
+    adm4_en = models.CharField(max_length=100)
+    adm3_pcode = models.CharField(max_length=50)
+    adm3_en = models.CharField(max_length=100)
+    
+    change_type = models.CharField(max_length=20, choices=CHANGE_TYPES)
+    old_level = models.CharField(max_length=3, null=True, blank=True)
+    new_level = models.CharField(max_length=3, null=True, blank=True)
+    area_sqm = models.FloatField()
+    geometry = models.MultiPolygonField(srid=4326)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['diff', 'adm4_pcode']),
+            models.Index(fields=['diff', 'change_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.adm4_en}: {self.old_level or '-'} → {self.new_level or '-'} ({self.area_sqm:.0f} m²)"
+
+
+class BarangayAdjacency(models.Model):
+    """
+    Neighbouring barangay pairs, stored in both directions, rebuilt by
+    adjacency.refresh_barangay_adjacency() after each boundary ingest.
+    Barangays meeting only at a corner have a shared length of 0.
+    """
+    adm4_pcode = models.CharField(max_length=50)
+    neighbor_pcode = models.CharField(max_length=50)
+    neighbor_name = models.CharField(max_length=100)
+    neighbor_municipality = models.CharField(max_length=100)
+    shared_length_m = models.FloatField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['adm4_pcode', 'neighbor_pcode'], name='unique_barangay_neighbor'),
+        ]
+    
+    def __str__(self):
+        return f"{self.adm4_pcode} ↔ {self.neighbor_pcode} ({self.shared_length_m:.0f} m)"
+
+
+class IngestJob(models.Model):
+    """
+    Queued upload, processed outside the request by jobs.run_pending_jobs()
+    (a background thread or the ``run_ingest_worker`` command). Loaders
+    report their stage and feature counts here as they go.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    dataset_type = models.CharField(max_length=50, choices=HazardDataset.DATASET_TYPES + [('barangay_new', 'Barangay Boundaries (GDB)')])
+    file_name = models.CharField(max_length=200)
+    file_path = models.CharField(max_length=500)  # Saved upload, deleted once processed
+    upsert = models.BooleanField(default=False)  # Update the stored layer in place instead of staging a new version
+    province = models.CharField(max_length=100, blank=True)  # Kept from a national barangay GDB; blank: the default province
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    stage = models.CharField(max_length=50, default='queued')
+    features_total = models.IntegerField(null=True, blank=True)
+    features_processed = models.IntegerField(default=0)
+    records_created = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.TextField(blank=True)  # One per line, first jobs.MAX_JOB_ERRORS only
+    message = models.TextField(blank=True)
+    dataset = models.ForeignKey(HazardDataset, on_delete=models.SET_NULL, null=True, blank=True)
+    data_version = models.PositiveIntegerField(null=True, blank=True)  # Published when the upload was activated
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Job #{self.id} {self.dataset_type} {self.file_name} ({self.status})"
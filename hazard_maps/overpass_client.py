@@ -52,6 +52,21 @@ class OverpassClient:
         'government': {'category': 'government', 'name': 'Government Office', 'priority': 3, 'subcat': 'government'},
     }
     
+    @classmethod
+    def _facility_filters(cls, area: str) -> str:
+        """Overpass union of every facility tag we map, restricted to an area clause"""
+        return f"""(
+        nwr["amenity"~"^(hospital|clinic|doctors|pharmacy|fire_station|police)$"]{area};
+        nwr["amenity"~"^(school|kindergarten|college|university|community_centre)$"]{area};
+        nwr["amenity"~"^(marketplace|bank|atm|fuel|townhall|public_building|post_office)$"]{area};
+        nwr["amenity"~"^(restaurant|fast_food|cafe|ferry_terminal)$"]{area};
+        nwr["shop"~"^(supermarket|convenience|mall|department_store)$"]{area};
+        nwr["office"="government"]{area};
+        nwr["amenity"="ferry_terminal"]{area};
+        nwr["man_made"="pier"]{area};
+        nwr["harbour"="yes"]{area};
+        );"""
+
     @classmethod
     def query_facilities(cls, lat: float, lng: float, radius: int = 3000) -> List[Dict]:
         """
@@ -62,17 +77,7 @@ class OverpassClient:
         # COMPREHENSIVE QUERY: Include all facility types
         query = f"""
         [out:json][timeout:20];
-        (
-        nwr["amenity"~"^(hospital|clinic|doctors|pharmacy|fire_station|police)$"](around:{radius},{lat},{lng});
-        nwr["amenity"~"^(school|kindergarten|college|university|community_centre)$"](around:{radius},{lat},{lng});
-        nwr["amenity"~"^(marketplace|bank|atm|fuel|townhall|public_building|post_office)$"](around:{radius},{lat},{lng});
-        nwr["amenity"~"^(restaurant|fast_food|cafe|ferry_terminal)$"](around:{radius},{lat},{lng});
-        nwr["shop"~"^(supermarket|convenience|mall|department_store)$"](around:{radius},{lat},{lng});
-        nwr["office"="government"](around:{radius},{lat},{lng});
-        nwr["amenity"="ferry_terminal"](around:{radius},{lat},{lng});
-        nwr["man_made"="pier"](around:{radius},{lat},{lng});
-        nwr["harbour"="yes"](around:{radius},{lat},{lng});
-        );
+        {cls._facility_filters(f"(around:{radius},{lat},{lng})")}
         out center;
         """
         
@@ -174,6 +179,66 @@ class OverpassClient:
             traceback.print_exc()
             return []
     
+    @classmethod
+    def query_facilities_bbox(cls, south: float, west: float, north: float, east: float) -> List[Dict]:
+        """
+        Get every mapped facility inside a bounding box (no filtering or limits)
+        Used to populate the local Facility table for batch analysis
+        """
+        query = f"""
+        [out:json][timeout:180];
+        {cls._facility_filters(f"({south},{west},{north},{east})")}
+        out center;
+        """
+
+        print(f"🏥 Downloading facilities for bbox ({south}, {west}, {north}, {east})...")
+        response = requests.post(
+            cls.BASE_URL,
+            data={'data': query},
+            timeout=240
+        )
+        response.raise_for_status()
+
+        facilities = []
+        seen_ids = set()
+        for element in response.json().get('elements', []):
+            osm_id = element.get('id')
+            if osm_id in seen_ids:
+                continue
+            facility = cls._parse_element(element)
+            if facility:
+                facilities.append(facility)
+                seen_ids.add(osm_id)
+
+        print(f"✅ Overpass returned {len(facilities)} facilities")
+        return facilities
+
+    @classmethod
+    def query_road_network(cls, south: float, west: float, north: float, east: float) -> Dict:
+        """
+        Download the routable road network inside a bounding box
+        Returns raw Overpass JSON (ways with node refs plus their nodes)
+        """
+        query = f"""
+        [out:json][timeout:300];
+        (
+        way["highway"]({south},{west},{north},{east});
+        );
+        (._;>;);
+        out body qt;
+        """
+
+        print(f"🛣️ Downloading road network for bbox ({south}, {west}, {north}, {east})...")
+        response = requests.post(
+            cls.BASE_URL,
+            data={'data': query},
+            timeout=360
+        )
+        response.raise_for_status()
+        data = response.json()
+        print(f"✅ Overpass returned {len(data.get('elements', []))} road elements")
+        return data
+
     @classmethod
     def _parse_element(cls, element: Dict) -> Dict:
         """Parse OSM element into facility dict with proper subcategorization"""
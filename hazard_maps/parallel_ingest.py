@@ -0,0 +1,91 @@
+"""
+Parallel geometry transformation for the shapefile and GDB loaders.
+
+Features are read with fiona in chunks. Each chunk's geometries are parsed,
+reprojected, validated and repaired in a process pool and come back as
+EWKB with their repair outcome, while the properties stay in the loading
+process. Chunks are yielded in file order
+with at most ``2 * workers`` in flight, so memory is bounded by the chunk
+size and the single writer still inserts features in their original order.
+
+This module (like ``spatial``) must not import models: pool workers are
+spawned processes that never set up Django apps.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.gis.geos import GEOSGeometry
+
+from .spatial import ingest_geometry
+
+CHUNK_SIZE = 1000
+MIN_PARALLEL_FEATURES = 20000  # smaller layers reproject faster than the pool starts
+
+
+def _transform_chunk(geometries, srid):
+    """
+    Worker: (EWKB bytes or error message, repair outcome) per geometry,
+    None where there is none
+    """
+    results = []
+    for geom_data in geometries:
+        if geom_data is None:
+            results.append(None)
+            continue
+        geometry, outcome = ingest_geometry(geom_data, srid)
+        if isinstance(geometry, Exception):
+            results.append((str(geometry), outcome))
+        else:
+            results.append((bytes(geometry.ewkb), outcome))
+    return results
+
+
+def _geo_data(feature):
+    geom = feature['geometry']
+    if geom is None:
+        return None
+    return geom.__geo_interface__ if hasattr(geom, '__geo_interface__') else geom
+
+
+def _results(chunk, future):
+    for (idx, feature), result in zip(chunk, future.result()):
+        if result is None:
+            yield idx, feature, None, None
+            continue
+        payload, outcome = result
+        if isinstance(payload, bytes):
+            yield idx, feature, GEOSGeometry(memoryview(payload)), outcome
+        else:
+            yield idx, feature, ValueError(payload), outcome
+
+
+def transformed_features(features, srid, workers, chunk_size=CHUNK_SIZE):
+    """
+    Yield (index, feature, geometry, outcome) in file order, preparing
+    geometries from ``srid`` (None: already WGS84) with
+    spatial.ingest_geometry in a pool of ``workers`` processes
+
+    geometry is the valid WGS84 GEOS geometry, None if the feature has none
+    (outcome None too), or a ValueError if it was dropped or could not be
+    transformed.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        in_flight = deque()
+        chunk = []
+        for item in enumerate(features):
+            chunk.append(item)
+            if len(chunk) < chunk_size:
+                continue
+            geometries = [_geo_data(feature) for _, feature in chunk]
+            in_flight.append((chunk, pool.submit(_transform_chunk, geometries, srid)))
+            chunk = []
+            if len(in_flight) >= 2 * workers:
+                yield from _results(*in_flight.popleft())
+
+        if chunk:
+            geometries = [_geo_data(feature) for _, feature in chunk]
+            in_flight.append((chunk, pool.submit(_transform_chunk, geometries, srid)))
+        while in_flight:
+            yield from _results(*in_flight.popleft())
@@ -0,0 +1,130 @@
+"""
+Area-weighted hazard assessment of a parcel or project footprint.
+
+Each hazard layer is clipped against the parcel in PostGIS and the area of
+every susceptibility class is summed in UTM 51N. Pieces that lie wholly
+inside the parcel skip ``ST_Intersection`` and use their own area.
+"""
+import time
+
+from django.db import connection
+
+from .models import BarangayBoundaryNew
+from .spatial import UTM_SRID
+from .subdivided import HAZARD_SOURCES, overlay_source
+
+MAX_PARCEL_AREA_SQKM = 25
+
+# Susceptibility classes from least to most severe
+LEVEL_ORDER = ['LS', 'MS', 'HS', 'VHS', 'DF']
+
+
+def _class_areas(cursor, hazard_type, parcel_ewkt):
+    """{susceptibility: square metres} of one hazard layer inside the parcel"""
+    source = overlay_source(hazard_type)
+    cursor.execute(f"""
+        WITH parcel AS (SELECT ST_GeomFromEWKT(%s) AS geom)
+        SELECT h.{source['column']},
+               SUM(CASE
+                   WHEN ST_CoveredBy(h.geometry, parcel.geom)
+                       THEN ST_Area(ST_Transform(h.geometry, {UTM_SRID}))
+                   ELSE ST_Area(ST_Transform(ST_Intersection(h.geometry, parcel.geom), {UTM_SRID}))
+               END)
+        FROM {source['table']} h, parcel
+        WHERE h.geometry && parcel.geom
+          AND ST_Intersects(h.geometry, parcel.geom)
+          {source['where']}
+        GROUP BY h.{source['column']}
+    """, [parcel_ewkt] + source['params'])
+    return {level: float(area or 0) for level, area in cursor.fetchall()}, source['subdivided']
+
+
+def _barangays(cursor, parcel_ewkt):
+    qn = connection.ops.quote_name
+    cursor.execute(f"""
+        WITH parcel AS (SELECT ST_GeomFromEWKT(%s) AS geom)
+        SELECT b.adm4_en, b.adm4_pcode, b.adm3_en, b.adm3_pcode,
+               ST_Area(ST_Transform(ST_Intersection(b.geometry, parcel.geom), {UTM_SRID}))
+        FROM {qn(BarangayBoundaryNew._meta.db_table)} b, parcel
+        WHERE b.geometry && parcel.geom
+          AND ST_Intersects(b.geometry, parcel.geom)
+          AND b.active
+        ORDER BY 5 DESC
+    """, [parcel_ewkt])
+    return cursor.fetchall()
+
+
+def parcel_area_sqm(parcel):
+    return parcel.transform(UTM_SRID, clone=True).area
+
+
+def assess_parcel(parcel):
+    """
+    Hazard class areas and barangays for a WGS84 polygon
+
+    Returns:
+        {'area_sqm', 'hazards': {layer: {...}}, 'barangays': [...], ...}
+    """
+    from .views import calculate_risk_score, get_user_friendly_label
+
+    start = time.time()
+    total = parcel_area_sqm(parcel)
+    parcel_ewkt = parcel.ewkt
+
+    def percentage(area):
+        return round(area / total * 100, 2) if total else 0
+
+    hazards = {}
+    worst = {}
+    with connection.cursor() as cursor:
+        for hazard_type, (model, field) in HAZARD_SOURCES.items():
+            areas, subdivided = _class_areas(cursor, hazard_type, parcel_ewkt)
+            labels = dict(model._meta.get_field(field).choices)
+            levels = sorted(areas, key=lambda level: LEVEL_ORDER.index(level) if level in LEVEL_ORDER else -1)
+
+            classes = [
+                {
+                    'level': level,
+                    'label': labels.get(level, level),
+                    'area_sqm': round(areas[level], 1),
+                    'percentage': percentage(areas[level]),
+                }
+                for level in levels if areas[level] > 0
+            ]
+            # Overlapping source polygons can push the mapped total past the parcel area
+            mapped = min(total, sum(areas.values()))
+            worst[hazard_type] = classes[-1]['level'] if classes else None
+
+            hazards[hazard_type] = {
+                'classes': classes,
+                'unmapped_area_sqm': round(total - mapped, 1),
+                'unmapped_percentage': percentage(total - mapped),
+                'dominant_level': max(classes, key=lambda c: c['area_sqm'])['level'] if classes else None,
+                'worst_level': worst[hazard_type],
+                'worst_risk_label': get_user_friendly_label(worst[hazard_type], hazard_type),
+                'source': 'subdivided' if subdivided else 'original',
+            }
+
+        barangays = [
+            {
+                'name': name,
+                'code': code,
+                'municipality': municipality,
+                'municipality_code': municipality_code,
+                'area_sqm': round(float(area or 0), 1),
+                'percentage': percentage(float(area or 0)),
+            }
+            for name, code, municipality, municipality_code, area in _barangays(cursor, parcel_ewkt)
+        ]
+
+    # Worst class of every layer somewhere on the parcel
+    risk = calculate_risk_score(worst['flood'], worst['landslide'], worst['liquefaction'])
+
+    return {
+        'area_sqm': round(total, 1),
+        'area_hectares': round(total / 10000, 4),
+        'hazards': hazards,
+        'worst_case_risk': {key: risk[key] for key in ('score', 'category', 'color', 'safety_level')},
+        'barangays': barangays,
+        'elapsed_ms': round((time.time() - start) * 1000),
+    }
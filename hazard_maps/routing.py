@@ -0,0 +1,506 @@
+"""
+Local road-network routing for facility travel times.
+
+The road graph is built once from an OSM road extract (see the
+``build_road_graph`` management command) and stored as a compact CSR
+structure in a single ``.npz`` file. Queries snap the origin and every
+target to the network and run ONE bounded Dijkstra search per travel
+mode, so all candidate facilities are timed together without an
+external OSRM service.
+"""
+import os
+import re
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from scipy import ndimage
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from .spatial import UTM_SRID, WGS84_SRID, to_utm
+from .utils import format_duration
+
+# Typical free-flow driving speeds (km/h) per OSM highway class.
+# Classes missing from this table are not drivable.
+DRIVE_SPEEDS_KPH = {
+    'motorway': 80, 'motorway_link': 50,
+    'trunk': 60, 'trunk_link': 40,
+    'primary': 50, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 25,
+    'residential': 20,
+    'living_street': 10,
+    'service': 15,
+    'road': 20,
+    'track': 10,
+}
+
+# Classes pedestrians cannot use; everything else is walkable
+NON_WALKABLE = {'motorway', 'motorway_link', 'construction', 'proposed', 'raceway'}
+
+WALK_SPEED_KPH = 5.0
+
+# Speed assumed for the off-network leg between a point and its snapped node
+CONNECTOR_SPEED_KPH = {
+    'drive': 15.0,
+    'walk': WALK_SPEED_KPH,
+}
+
+# Points further than this from the network are treated as unreachable
+MAX_SNAP_DISTANCE_M = 2000
+
+# Searches stop once every node within this travel time is settled
+DEFAULT_SEARCH_LIMIT_S = 2 * 60 * 60
+
+MODES = ('drive', 'walk')
+
+# Isochrones are rasterised on a grid of this cell size (metres)
+ISOCHRONE_CELL_M = 100
+
+
+def _parse_maxspeed(value):
+    """Return a numeric maxspeed tag in km/h, or None"""
+    if not value:
+        return None
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*(mph)?', str(value))
+    if not match:
+        return None
+    speed = float(match.group(1))
+    if match.group(2):
+        speed *= 1.609
+    return speed if speed > 0 else None
+
+
+def _way_attributes(tags):
+    """Return (drive_kph, walkable, oneway) for a highway way's tags"""
+    highway = tags.get('highway', '')
+    drive_kph = DRIVE_SPEEDS_KPH.get(highway, 0)
+
+    if drive_kph:
+        maxspeed = _parse_maxspeed(tags.get('maxspeed'))
+        if maxspeed:
+            # Posted limits are rarely achieved on provincial roads
+            drive_kph = min(drive_kph, maxspeed)
+        if tags.get('access') in ('no', 'private') or tags.get('motor_vehicle') == 'no':
+            drive_kph = 0
+
+    walkable = highway not in NON_WALKABLE and tags.get('foot') != 'no'
+
+    oneway = str(tags.get('oneway', 'no')).lower()
+    if oneway in ('yes', 'true', '1'):
+        direction = 1
+    elif oneway == '-1':
+        direction = -1
+    else:
+        direction = 0
+
+    return drive_kph, walkable, direction
+
+
+class RoadGraph:
+    """
+    Road network stored as a CSR adjacency structure
+
+    Arrays:
+        node_lng, node_lat: node coordinates (WGS84)
+        indptr, indices:    CSR adjacency (edges sorted by source node)
+        length_m:           edge length in metres
+        drive_kph:          driving speed per edge, 0 when not drivable
+        walkable:           whether pedestrians may use the edge
+    """
+
+    def __init__(self, node_lng, node_lat, indptr, indices, length_m, drive_kph, walkable):
+        self.node_lng = np.asarray(node_lng, dtype=np.float64)
+        self.node_lat = np.asarray(node_lat, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.length_m = np.asarray(length_m, dtype=np.float32)
+        self.drive_kph = np.asarray(drive_kph, dtype=np.float32)
+        self.walkable = np.asarray(walkable, dtype=bool)
+
+        x, y = to_utm(self.node_lng, self.node_lat)
+        self.node_xy = np.column_stack([x, y])
+
+        self._csgraphs = {}
+        self._trees = {}
+
+    @property
+    def node_count(self):
+        return len(self.node_lng)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_edges(cls, node_lng, node_lat, u, v, drive_kph, walkable):
+        """Build a graph from directed edge lists (node index arrays)"""
+        node_lng = np.asarray(node_lng, dtype=np.float64)
+        node_lat = np.asarray(node_lat, dtype=np.float64)
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        drive_kph = np.asarray(drive_kph, dtype=np.float32)
+        walkable = np.asarray(walkable, dtype=bool)
+
+        # Drop self-loops and edges usable by nobody
+        keep = (u != v) & ((drive_kph > 0) | walkable)
+        u, v, drive_kph, walkable = u[keep], v[keep], drive_kph[keep], walkable[keep]
+
+        # Drop nodes that no edge touches and renumber the rest
+        used = np.zeros(len(node_lng), dtype=bool)
+        used[u] = True
+        used[v] = True
+        remap = np.full(len(node_lng), -1, dtype=np.int64)
+        remap[used] = np.arange(used.sum())
+        node_lng, node_lat = node_lng[used], node_lat[used]
+        u, v = remap[u], remap[v]
+
+        x, y = to_utm(node_lng, node_lat)
+        length_m = np.hypot(x[u] - x[v], y[u] - y[v]).astype(np.float32)
+
+        # Sort by source then target, fastest duplicate first, and keep
+        # one edge per (u, v) pair
+        order = np.lexsort((-drive_kph, v, u))
+        u, v, drive_kph, walkable, length_m = u[order], v[order], drive_kph[order], walkable[order], length_m[order]
+        first = np.ones(len(u), dtype=bool)
+        first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        u, v, drive_kph, walkable, length_m = u[first], v[first], drive_kph[first], walkable[first], length_m[first]
+
+        indptr = np.zeros(len(node_lng) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=len(node_lng)), out=indptr[1:])
+
+        return cls(node_lng, node_lat, indptr, v, length_m, drive_kph, walkable)
+
+    @classmethod
+    def from_overpass(cls, data):
+        """Build a graph from Overpass JSON (``out body`` ways plus their nodes)"""
+        node_index = {}
+        node_lng = []
+        node_lat = []
+        for element in data.get('elements', []):
+            if element.get('type') == 'node':
+                node_index[element['id']] = len(node_lng)
+                node_lng.append(element['lon'])
+                node_lat.append(element['lat'])
+
+        u, v, speeds, walk = [], [], [], []
+        for element in data.get('elements', []):
+            if element.get('type') != 'way':
+                continue
+            refs = [node_index[n] for n in element.get('nodes', []) if n in node_index]
+            if len(refs) < 2:
+                continue
+            cls._add_way(refs, element.get('tags', {}), u, v, speeds, walk)
+
+        return cls.from_edges(node_lng, node_lat, u, v, speeds, walk)
+
+    @classmethod
+    def from_geojson(cls, data):
+        """
+        Build a graph from a GeoJSON FeatureCollection of (Multi)LineStrings
+        carrying OSM ``highway``/``oneway``/``maxspeed`` properties.
+        Shared vertices are matched on their coordinates.
+        """
+        node_index = {}
+        node_lng = []
+        node_lat = []
+
+        def node_for(coord):
+            key = (round(coord[0], 7), round(coord[1], 7))
+            idx = node_index.get(key)
+            if idx is None:
+                idx = node_index[key] = len(node_lng)
+                node_lng.append(key[0])
+                node_lat.append(key[1])
+            return idx
+
+        u, v, speeds, walk = [], [], [], []
+        for feature in data.get('features', []):
+            geom = feature.get('geometry') or {}
+            tags = feature.get('properties') or {}
+            if geom.get('type') == 'LineString':
+                lines = [geom['coordinates']]
+            elif geom.get('type') == 'MultiLineString':
+                lines = geom['coordinates']
+            else:
+                continue
+            for line in lines:
+                refs = [node_for(c) for c in line]
+                if len(refs) >= 2:
+                    cls._add_way(refs, tags, u, v, speeds, walk)
+
+        return cls.from_edges(node_lng, node_lat, u, v, speeds, walk)
+
+    @staticmethod
+    def _add_way(refs, tags, u, v, speeds, walk):
+        """Append both directions of every segment of one way"""
+        drive_kph, walkable, direction = _way_attributes(tags)
+        if not drive_kph and not walkable:
+            return
+
+        forward_kph = drive_kph if direction >= 0 else 0
+        backward_kph = drive_kph if direction <= 0 else 0
+
+        for a, b in zip(refs[:-1], refs[1:]):
+            u.append(a)
+            v.append(b)
+            speeds.append(forward_kph)
+            walk.append(walkable)
+
+            u.append(b)
+            v.append(a)
+            speeds.append(backward_kph)
+            walk.append(walkable)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+        np.savez_compressed(
+            path,
+            node_lng=self.node_lng,
+            node_lat=self.node_lat,
+            indptr=self.indptr,
+            indices=self.indices,
+            length_m=self.length_m,
+            drive_kph=self.drive_kph,
+            walkable=self.walkable,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['node_lng'], data['node_lat'],
+                data['indptr'], data['indices'],
+                data['length_m'], data['drive_kph'], data['walkable'],
+            )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def edge_seconds(self, mode):
+        """Travel time per edge in seconds (inf where the mode is not allowed)"""
+        if mode == 'drive':
+            speed = self.drive_kph
+        elif mode == 'walk':
+            speed = np.where(self.walkable, WALK_SPEED_KPH, 0).astype(np.float32)
+        else:
+            raise ValueError(f"Unknown travel mode: {mode}")
+
+        with np.errstate(divide='ignore'):
+            return np.where(speed > 0, self.length_m / (speed / 3.6), np.inf)
+
+    def csgraph(self, mode):
+        """Sparse adjacency matrix weighted by travel time for one mode"""
+        if mode not in self._csgraphs:
+            seconds = self.edge_seconds(mode)
+            allowed = np.isfinite(seconds)
+            sources = np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+            indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources[allowed], minlength=self.node_count), out=indptr[1:])
+
+            # csgraph treats explicit zeros as edges but keep weights positive anyway
+            weights = np.maximum(seconds[allowed], 1e-3)
+            self._csgraphs[mode] = csr_matrix(
+                (weights, self.indices[allowed], indptr),
+                shape=(self.node_count, self.node_count),
+            )
+        return self._csgraphs[mode]
+
+    def _snap_tree(self, mode):
+        """KD-tree over the nodes that have at least one edge usable by mode"""
+        if mode not in self._trees:
+            graph = self.csgraph(mode)
+            out_degree = np.diff(graph.indptr)
+            in_degree = np.bincount(graph.indices, minlength=self.node_count)
+            nodes = np.flatnonzero((out_degree > 0) | (in_degree > 0))
+            self._trees[mode] = (cKDTree(self.node_xy[nodes]), nodes)
+        return self._trees[mode]
+
+    def snap(self, lng, lat, mode):
+        """Return (node ids, snap distances in metres) for coordinate arrays"""
+        tree, nodes = self._snap_tree(mode)
+        x, y = to_utm(lng, lat)
+        distance, idx = tree.query(np.column_stack([np.atleast_1d(x), np.atleast_1d(y)]))
+        return nodes[idx], distance
+
+    def shortest_times(self, lat, lng, mode='drive', limit=DEFAULT_SEARCH_LIMIT_S):
+        """
+        One-to-all search from a point
+
+        Returns:
+            (seconds to every node, seconds spent reaching the network);
+            unreached nodes are inf
+        """
+        origin, snap_m = self.snap([lng], [lat], mode)
+        if snap_m[0] > MAX_SNAP_DISTANCE_M:
+            return np.full(self.node_count, np.inf), np.inf
+
+        access_s = snap_m[0] / (CONNECTOR_SPEED_KPH[mode] / 3.6)
+        seconds = dijkstra(self.csgraph(mode), directed=True, indices=int(origin[0]), limit=limit)
+        return seconds, access_s
+
+    def travel_times(self, lat, lng, targets, mode='drive', limit=DEFAULT_SEARCH_LIMIT_S):
+        """
+        Travel times in seconds from one point to many (lat, lng) targets
+        using a single bounded search. Unreachable targets are inf.
+        """
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        if len(targets) == 0:
+            return np.empty(0)
+
+        seconds, access_s = self.shortest_times(lat, lng, mode, limit)
+        if not np.isfinite(access_s):
+            return np.full(len(targets), np.inf)
+
+        target_nodes, target_snap_m = self.snap(targets[:, 1], targets[:, 0], mode)
+        egress_s = target_snap_m / (CONNECTOR_SPEED_KPH[mode] / 3.6)
+
+        times = seconds[target_nodes] + access_s + egress_s
+        times[target_snap_m > MAX_SNAP_DISTANCE_M] = np.inf
+        return times
+
+
+_graph_cache = {'path': None, 'mtime': None, 'graph': None}
+
+
+def get_road_graph():
+    """
+    Return the road graph loaded from settings.ROAD_GRAPH_PATH, or None
+    when no graph has been built. Reloads if the file changes on disk.
+    """
+    path = str(settings.ROAD_GRAPH_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _graph_cache['graph'] is None or _graph_cache['path'] != path or _graph_cache['mtime'] != mtime:
+        try:
+            graph = RoadGraph.load(path)
+        except Exception as e:
+            print(f"⚠️ Could not load road graph from {path}: {e}")
+            return None
+        print(f"✅ Loaded road graph: {graph.node_count} nodes, {graph.edge_count} edges")
+        _graph_cache.update(path=path, mtime=mtime, graph=graph)
+
+    return _graph_cache['graph']
+
+
+def road_graph_version():
+    """Identifier of the loaded graph file, for use in cache keys"""
+    if get_road_graph() is None:
+        return None
+    return int(_graph_cache['mtime'])
+
+
+def _cells_to_polygon(mask, x0, y0, cell):
+    """
+    Turn a boolean cell grid into a WGS84 MultiPolygon
+
+    Runs of filled cells in each row are merged into rectangles before
+    the union so GEOS only sees a few hundred parts.
+    """
+    rectangles = []
+    for row in range(mask.shape[0]):
+        line = np.concatenate([[False], mask[row], [False]])
+        edges = np.flatnonzero(line[1:] != line[:-1])
+        for start, stop in zip(edges[::2], edges[1::2]):
+            xmin, xmax = x0 + start * cell, x0 + stop * cell
+            ymin, ymax = y0 + row * cell, y0 + (row + 1) * cell
+            rectangles.append(Polygon.from_bbox((xmin, ymin, xmax, ymax)))
+
+    if not rectangles:
+        return None
+
+    merged = MultiPolygon(rectangles, srid=UTM_SRID).unary_union
+    merged.transform(WGS84_SRID)
+    if merged.geom_type == 'Polygon':
+        merged = MultiPolygon(merged, srid=WGS84_SRID)
+    return merged
+
+
+def compute_isochrones(graph, lat, lng, minutes, mode='drive', cell=ISOCHRONE_CELL_M):
+    """
+    Grid-based isochrones from one origin
+
+    One bounded one-to-all search covers every band; reached nodes are
+    binned into ``cell``-metre squares and small gaps between roads are
+    closed so each band reads as a contiguous area.
+
+    Returns:
+        {band_minutes: {'geometry': MultiPolygon | None, 'area_sqkm': float}}
+    """
+    bands = sorted(set(minutes))
+    seconds, access_s = graph.shortest_times(lat, lng, mode, limit=max(bands) * 60)
+    results = {band: {'geometry': None, 'area_sqkm': 0.0} for band in bands}
+    if not np.isfinite(access_s):
+        return results
+
+    seconds = seconds + access_s
+    reached = np.flatnonzero(seconds <= max(bands) * 60)
+    if len(reached) == 0:
+        return results
+
+    xy = graph.node_xy[reached]
+    x0 = np.floor(xy[:, 0].min() / cell) * cell - cell
+    y0 = np.floor(xy[:, 1].min() / cell) * cell - cell
+    cols = ((xy[:, 0] - x0) // cell).astype(np.int64)
+    rows = ((xy[:, 1] - y0) // cell).astype(np.int64)
+    shape = (rows.max() + 2, cols.max() + 2)
+
+    # Fastest arrival per cell
+    arrival = np.full(shape, np.inf)
+    np.minimum.at(arrival, (rows, cols), seconds[reached])
+
+    structure = np.ones((3, 3), dtype=bool)
+    for band in bands:
+        mask = arrival <= band * 60
+        mask = ndimage.binary_closing(mask, structure=structure, border_value=0)
+        mask = ndimage.binary_fill_holes(mask)
+        geometry = _cells_to_polygon(mask, x0, y0, cell)
+        results[band] = {
+            'geometry': geometry,
+            'area_sqkm': round(float(mask.sum()) * cell * cell / 1e6, 2),
+        }
+
+    return results
+
+
+def annotate_travel_times(lat, lng, facilities):
+    """
+    Replace straight-line duration estimates on facility dicts with
+    road-network drive and walk times
+
+    Returns True when the road graph was used.
+    """
+    graph = get_road_graph()
+    if graph is None or not facilities:
+        return False
+
+    targets = [(f['lat'], f['lng']) for f in facilities]
+    drive_s = graph.travel_times(lat, lng, targets, 'drive')
+    walk_s = graph.travel_times(lat, lng, targets, 'walk')
+
+    for facility, drive, walk in zip(facilities, drive_s, walk_s):
+        if np.isfinite(drive):
+            facility['duration_minutes'] = round(float(drive) / 60, 1)
+            facility['duration_display'] = format_duration(float(drive))
+            facility['method'] = 'road_network'
+        if np.isfinite(walk):
+            facility['walk_minutes'] = round(float(walk) / 60, 1)
+            facility['walk_display'] = format_duration(float(walk))
+
+    return True
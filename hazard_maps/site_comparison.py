@@ -0,0 +1,230 @@
+"""
+Side-by-side comparison of candidate development sites.
+
+Every site needs three hazard lookups, a barangay lookup, zonal values and
+a facility summary for the suitability score. The database work for each
+site runs on a bounded thread pool, and facility data is resolved in this
+order so Overpass is only hit when nothing local can answer:
+
+1. precomputed accessibility rasters,
+2. the short-lived per-point facility cache,
+3. the synced Facility table,
+4. one Overpass bounding-box fetch per cluster of sites whose 3 km
+   search circles overlap.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+
+from .spatial import to_utm
+
+MAX_SITES = 20
+MAX_WORKERS = 6
+FACILITY_RADIUS_M = 3000
+
+# Degrees of latitude per metre, for padding cluster bounding boxes
+DEGREES_PER_METRE = 1 / 111320
+
+
+def cluster_sites(sites, radius=FACILITY_RADIUS_M):
+    """
+    Group sites whose facility search circles overlap a cluster seed
+
+    Each cluster stays within 2 * radius of its seed, so its bounding box
+    fetch is never much larger than a handful of single-point queries.
+
+    Returns:
+        List of lists of site indices
+    """
+    x, y = to_utm([s['lng'] for s in sites], [s['lat'] for s in sites])
+    clusters = []
+    seeds = []
+    for i in range(len(sites)):
+        for cluster, seed in zip(clusters, seeds):
+            if np.hypot(x[i] - x[seed], y[i] - y[seed]) <= 2 * radius:
+                cluster.append(i)
+                break
+        else:
+            clusters.append([i])
+            seeds.append(i)
+    return clusters
+
+
+def _fetch_cluster_facilities(sites, radius=FACILITY_RADIUS_M):
+    """One Overpass bounding-box query covering every site's search circle"""
+    from .overpass_client import OverpassClient
+
+    lats = [s['lat'] for s in sites]
+    lngs = [s['lng'] for s in sites]
+    pad_lat = radius * DEGREES_PER_METRE
+    pad_lng = pad_lat / np.cos(np.radians(np.mean(lats)))
+    try:
+        return OverpassClient.query_facilities_bbox(
+            min(lats) - pad_lat, min(lngs) - pad_lng, max(lats) + pad_lat, max(lngs) + pad_lng
+        )
+    except Exception as e:
+        print(f"⚠️ Overpass fetch for {len(sites)} sites failed: {e}")
+        return []
+
+
+def _local_facility_summary(site):
+    """Facility summary without any network access, or None"""
+    from .accessibility import get_accessibility_rasters
+    from .facility_engine import facility_summary, get_local_engine
+
+    rasters = get_accessibility_rasters()
+    summary = rasters.nearby_facilities(site['lat'], site['lng']) if rasters else None
+    if summary is not None:
+        return summary
+
+    summary = cache.get(f"facilities_{round(site['lat'], 4)}_{round(site['lng'], 4)}")
+    if summary is not None:
+        return {**summary, 'source': summary.get('source', 'cached')}
+
+    engine = get_local_engine()
+    if engine is not None:
+        categorized = engine.categorize(site['lat'], site['lng'], radius=FACILITY_RADIUS_M, travel_times=False)
+        return {**facility_summary(categorized), 'source': 'facility_table'}
+
+    return None
+
+
+def _site_context(site):
+    """Hazard levels, barangay and zonal value statistics for one site"""
+    from django.contrib.gis.geos import Point
+    from django.db.models import Avg, Count, Max, Min
+    from .models import (
+        BarangayBoundaryNew, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility, ZonalValue,
+    )
+
+    try:
+        point = Point(site['lng'], site['lat'], srid=4326)
+        levels = {
+            'flood': FloodSusceptibility.objects.active().filter(geometry__contains=point)
+            .values_list('flood_susc', flat=True).first(),
+            'landslide': LandslideSusceptibility.objects.active().filter(geometry__contains=point)
+            .values_list('landslide_susc', flat=True).first(),
+            'liquefaction': LiquefactionSusceptibility.objects.active().filter(geometry__contains=point)
+            .values_list('liquefaction_susc', flat=True).first(),
+        }
+
+        barangay = BarangayBoundaryNew.objects.active().filter(geometry__contains=point).values(
+            'adm4_en', 'adm4_pcode', 'adm3_en', 'adm3_pcode'
+        ).first()
+
+        zonal = None
+        if barangay:
+            stats = ZonalValue.objects.filter(barangay_code=barangay['adm4_pcode']).aggregate(
+                count=Count('id'), average=Avg('price_per_sqm'), low=Min('price_per_sqm'), high=Max('price_per_sqm')
+            )
+            if stats['count']:
+                zonal = {
+                    'count': stats['count'],
+                    'average_price': round(float(stats['average']), 2),
+                    'average_price_display': f"₱{float(stats['average']):,.2f}",
+                    'min_price': round(float(stats['low']), 2),
+                    'max_price': round(float(stats['high']), 2),
+                }
+
+        return {
+            'levels': levels,
+            'barangay': {
+                'name': barangay['adm4_en'],
+                'code': barangay['adm4_pcode'],
+                'municipality': barangay['adm3_en'],
+                'municipality_code': barangay['adm3_pcode'],
+            } if barangay else None,
+            'zonal_values': zonal,
+        }
+    finally:
+        # Worker threads each get their own connection
+        connection.close()
+
+
+def _site_row(site, context, nearby_facilities):
+    from .views import calculate_risk_score, calculate_suitability_score, get_user_friendly_label
+
+    levels = context['levels']
+    risk = calculate_risk_score(levels['flood'], levels['landslide'], levels['liquefaction'])
+    suitability = calculate_suitability_score(
+        site['lat'], site['lng'], {'overall_risk': risk}, nearby_facilities
+    )
+    summary = nearby_facilities.get('summary', {})
+
+    def distance(key):
+        facility = summary.get(key)
+        return round(facility['distance_meters']) if facility else None
+
+    return {
+        'index': site['index'],
+        'label': site.get('label') or f"Site {site['index'] + 1}",
+        'lat': site['lat'],
+        'lng': site['lng'],
+        'barangay': context['barangay'],
+        'hazards': {
+            hazard: {'level': level, 'risk_label': get_user_friendly_label(level, hazard)}
+            for hazard, level in levels.items()
+        },
+        'overall_risk': {key: risk[key] for key in ('score', 'category', 'color', 'safety_level')},
+        'suitability': suitability,
+        'nearest_evacuation_m': distance('nearest_evacuation'),
+        'nearest_hospital_m': distance('nearest_hospital'),
+        'nearest_fire_station_m': distance('nearest_fire_station'),
+        'facility_counts': nearby_facilities.get('counts', {}),
+        'facility_source': nearby_facilities.get('source', 'overpass'),
+        'zonal_values': context['zonal_values'],
+    }
+
+
+def compare_sites(sites):
+    """
+    Evaluate and rank candidate sites (dicts with lat, lng and optional label)
+
+    Returns:
+        {'sites': [...best first], 'overpass_queries': n, 'elapsed_ms': ms}
+    """
+    from .facility_engine import FacilityEngine, facility_summary
+
+    start = time.time()
+    sites = [{**site, 'index': i} for i, site in enumerate(sites)]
+
+    facilities = {i: _local_facility_summary(site) for i, site in enumerate(sites)}
+    remote = [i for i, summary in facilities.items() if summary is None]
+    clusters = cluster_sites([sites[i] for i in remote]) if remote else []
+    clusters = [[remote[i] for i in cluster] for cluster in clusters]
+
+    workers = max(1, min(MAX_WORKERS, len(sites) + len(clusters)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetches = [
+            (cluster, pool.submit(_fetch_cluster_facilities, [sites[i] for i in cluster]))
+            for cluster in clusters
+        ]
+        contexts = [pool.submit(_site_context, site) for site in sites]
+
+        for cluster, future in fetches:
+            engine = FacilityEngine(future.result())
+            for i in cluster:
+                site = sites[i]
+                categorized = engine.categorize(site['lat'], site['lng'], radius=FACILITY_RADIUS_M, travel_times=False)
+                facilities[i] = facility_summary(categorized)
+                if len(engine):
+                    cache.set(f"facilities_{round(site['lat'], 4)}_{round(site['lng'], 4)}", facilities[i], 300)
+                facilities[i]['source'] = 'overpass' if len(engine) else 'unavailable'
+
+        rows = [
+            _site_row(site, context.result(), facilities[i])
+            for i, (site, context) in enumerate(zip(sites, contexts))
+        ]
+
+    rows.sort(key=lambda row: (-row['suitability']['score'], row['overall_risk']['score']))
+    for rank, row in enumerate(rows, 1):
+        row['rank'] = rank
+
+    return {
+        'sites': rows,
+        'overpass_queries': len(clusters),
+        'elapsed_ms': round((time.time() - start) * 1000),
+    }
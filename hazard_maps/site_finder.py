@@ -0,0 +1,196 @@
+"""
+Top-K development site finder.
+
+Scores a UTM grid over a municipality or user polygon with the vectorized
+risk and suitability formulas from suitability.py and returns the best
+cells, optionally at least ``min_spacing`` metres apart.
+
+Cells inside debris flow or very high flood/landslide zones can never rank
+well, so they are dropped right after the hazard layers are rasterized,
+before any accessibility lookups.
+"""
+import json
+
+import numpy as np
+
+from .facility_engine import get_local_engine
+from .spatial import UTM_SRID, from_utm
+from .suitability import (
+    HAZARD_CODES, HAZARD_LAYERS, SUITABILITY_CLASSES, rasterize_layer, risk_scores, suitability_scores,
+)
+
+DEFAULT_CELL_M = 100
+MIN_CELL_M = 30
+MAX_GRID_CELLS = 250000  # cells are coarsened past this to stay interactive
+MAX_SITES = 50
+
+# Hazard classes that exclude a cell before scoring: layer -> class codes
+EXCLUDED_CLASSES = {
+    'flood': [HAZARD_CODES['VHS']],
+    'landslide': [HAZARD_CODES['VHS'], HAZARD_CODES['DF']],
+}
+
+HAZARD_LABELS = {code: level for level, code in HAZARD_CODES.items()}
+
+COUNT_GROUPS = ('evacuation', 'medical', 'emergency_services', 'essential')
+
+
+def _accessibility(lats, lngs):
+    """
+    Nearest evacuation/medical distances and 3 km group counts for candidate
+    cells, from the precomputed rasters or else the local facility engine
+    """
+    from .accessibility import COUNT_RADIUS_M, get_accessibility_rasters
+
+    rasters = get_accessibility_rasters()
+    if rasters is not None:
+        return {
+            'dist_evacuation': rasters.sample('dist_evacuation', lats, lngs),
+            'dist_medical': rasters.sample('dist_medical', lats, lngs),
+            'counts': {
+                group: np.nan_to_num(rasters.sample(f'count_{group}', lats, lngs))
+                for group in COUNT_GROUPS
+            },
+            'source': 'accessibility_raster',
+        }
+
+    engine = get_local_engine()
+    if engine is None:
+        raise ValueError(
+            "No facility data. Run 'python manage.py sync_facilities' "
+            "or 'python manage.py build_accessibility_rasters' first."
+        )
+    return {
+        'dist_evacuation': engine.nearest(lats, lngs, 'evacuation')[1][:, 0],
+        'dist_medical': engine.nearest(lats, lngs, 'medical')[1][:, 0],
+        'counts': {
+            group: engine.counts_within(lats, lngs, COUNT_RADIUS_M, group)
+            for group in COUNT_GROUPS
+        },
+        'source': 'facility_table',
+    }
+
+
+def _select(order, x, y, k, min_spacing):
+    """Greedy pick of the first k candidates (in ``order``) at least min_spacing apart"""
+    if not min_spacing:
+        return order[:k]
+
+    picked = []
+    for i in order:
+        if picked and np.min(np.hypot(x[picked] - x[i], y[picked] - y[i])) < min_spacing:
+            continue
+        picked.append(i)
+        if len(picked) == k:
+            break
+    return np.asarray(picked, dtype=np.int64)
+
+
+def _category(score):
+    for min_score, category, _ in SUITABILITY_CLASSES:
+        if score >= min_score:
+            return category
+    return SUITABILITY_CLASSES[-1][1]
+
+
+def find_top_sites(area, k=10, min_spacing=0, cell=DEFAULT_CELL_M):
+    """
+    K highest-suitability grid cells inside ``area``
+
+    Args:
+        area: GEOS polygon/multipolygon (any SRID)
+        k: number of sites to return
+        min_spacing: minimum distance between returned sites in metres
+        cell: requested grid cell size in metres (coarsened for large areas)
+    """
+    from rasterio import features
+    from rasterio.transform import from_origin
+    from .models import FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility
+
+    area = area.transform(UTM_SRID, clone=True)
+    xmin, ymin, xmax, ymax = area.extent
+
+    cell = max(cell, MIN_CELL_M, np.sqrt((xmax - xmin) * (ymax - ymin) / MAX_GRID_CELLS))
+    xmin = np.floor(xmin / cell) * cell
+    ymax = np.ceil(ymax / cell) * cell
+    width = max(1, int(np.ceil((xmax - xmin) / cell)))
+    height = max(1, int(np.ceil((ymax - ymin) / cell)))
+    bounds = (xmin, ymax - height * cell, xmin + width * cell, ymax)
+
+    inside = features.rasterize(
+        [(json.loads(area.json), 1)],
+        out_shape=(height, width),
+        transform=from_origin(xmin, ymax, cell, cell),
+        fill=0,
+        dtype='uint8',
+    ).astype(bool)
+    total_cells = int(inside.sum())
+
+    models = {
+        'flood': FloodSusceptibility,
+        'landslide': LandslideSusceptibility,
+        'liquefaction': LiquefactionSusceptibility,
+    }
+    hazards = {
+        layer: rasterize_layer(models[layer], field, bounds, (height, width), cell, srid=UTM_SRID)
+        for layer, _, field in HAZARD_LAYERS
+    }
+
+    # Early pruning: never score cells that are excluded outright
+    candidates = inside.copy()
+    for layer, codes in EXCLUDED_CLASSES.items():
+        candidates &= ~np.isin(hazards[layer], codes)
+
+    rows, cols = np.nonzero(candidates)
+    result = {
+        'cell_size_m': round(float(cell), 1),
+        'cells_in_area': total_cells,
+        'cells_excluded': total_cells - len(rows),
+        'cells_scored': len(rows),
+        'sites': [],
+    }
+    if not len(rows):
+        return result
+
+    flood, landslide, liquefaction = (hazards[layer][rows, cols] for layer, _, _ in HAZARD_LAYERS)
+    risk, debris_flow = risk_scores(flood, landslide, liquefaction)
+
+    x = xmin + (cols + 0.5) * cell
+    y = ymax - (rows + 0.5) * cell
+    lngs, lats = from_utm(x, y)
+
+    access = _accessibility(lats, lngs)
+    scores = suitability_scores(
+        risk, debris_flow, access['dist_evacuation'], access['dist_medical'], access['counts']
+    )
+
+    # Best score first; ties go to lower risk, then to the closer hospital
+    dist_medical = np.nan_to_num(access['dist_medical'], nan=np.inf)
+    order = np.lexsort((dist_medical, risk, -scores))
+    picked = _select(order, x, y, k, min_spacing)
+
+    def distance(values, i):
+        value = float(values[i])
+        return round(value) if np.isfinite(value) else None
+
+    result['accessibility_source'] = access['source']
+    result['sites'] = [
+        {
+            'rank': rank,
+            'lat': round(float(lats[i]), 6),
+            'lng': round(float(lngs[i]), 6),
+            'suitability_score': round(float(scores[i]), 1),
+            'category': _category(float(scores[i])),
+            'risk_score': round(float(risk[i]), 1),
+            'hazards': {
+                'flood': HAZARD_LABELS.get(int(flood[i])),
+                'landslide': HAZARD_LABELS.get(int(landslide[i])),
+                'liquefaction': HAZARD_LABELS.get(int(liquefaction[i])),
+            },
+            'nearest_evacuation_m': distance(access['dist_evacuation'], i),
+            'nearest_hospital_m': distance(access['dist_medical'], i),
+            'counts': {group: int(access['counts'][group][i]) for group in COUNT_GROUPS},
+        }
+        for rank, i in enumerate(picked, 1)
+    ]
+    return result
@@ -0,0 +1,217 @@
+"""
+Shared projection helpers for the array-based analysis modules and ingest.
+
+Distances and grids are computed in UTM zone 51N (EPSG:32651), which
+covers Negros Oriental and keeps scale error well below 0.1%.
+"""
+import json
+import struct
+from functools import lru_cache
+
+import numpy as np
+from django.contrib.gis.geos import GEOSGeometry, MultiPolygon
+from pyproj import Transformer
+
+WGS84_SRID = 4326
+UTM_SRID = 32651  # WGS 84 / UTM zone 51N
+PRS92_SRID = 4253  # PRS92 / Luzon 1911 datum, used by older hazard shapefiles
+
+# Approximate extent of Negros Oriental (south, west, north, east), used
+# when no barangay boundaries have been loaded yet
+NEGROS_ORIENTAL_BBOX = (8.95, 122.55, 10.55, 123.65)
+
+# What ingest_geometry did to a feature's geometry
+REPAIR_OUTCOMES = ('valid', 'repaired', 'parts_dropped', 'dropped', 'failed')
+
+_TO_UTM = Transformer.from_crs(WGS84_SRID, UTM_SRID, always_xy=True)
+_FROM_UTM = Transformer.from_crs(UTM_SRID, WGS84_SRID, always_xy=True)
+
+
+def to_utm(lng, lat):
+    """Project WGS84 longitude/latitude (scalars or arrays) to UTM 51N metres"""
+    x, y = _TO_UTM.transform(np.asarray(lng, dtype=float), np.asarray(lat, dtype=float))
+    return x, y
+
+
+def from_utm(x, y):
+    """Unproject UTM 51N metres back to WGS84 longitude/latitude"""
+    lng, lat = _FROM_UTM.transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    return lng, lat
+
+
+def layer_srid(source_crs):
+    """
+    SRID an uploaded layer must be reprojected from, or None when it is
+    already WGS84 (or its CRS is unknown); checked once per layer
+    """
+    crs_string = str(source_crs).upper() if source_crs else ''
+    if str(PRS92_SRID) in crs_string or 'LUZON' in crs_string or 'PRS92' in crs_string:
+        return PRS92_SRID
+    return None
+
+
+@lru_cache(maxsize=None)
+def _to_wgs84(srid):
+    return Transformer.from_crs(srid, WGS84_SRID, always_xy=True)
+
+
+def _ring_array(ring):
+    if not len(ring):
+        return np.empty((0, 2))
+    return np.asarray(ring, dtype=float)[:, :2]
+
+
+def _close_rings(polygons):
+    """
+    Close open rings and drop degenerate ones (fewer than 4 points); a
+    polygon whose shell is degenerate is dropped with its holes. Returns
+    (polygons as lists of ring arrays, rings closed, rings dropped).
+    """
+    cleaned = []
+    closed = dropped = 0
+    for polygon in polygons:
+        kept = []
+        for ring in polygon:
+            if len(ring) and (ring[0, 0] != ring[-1, 0] or ring[0, 1] != ring[-1, 1]):
+                ring = np.vstack([ring, ring[:1]])
+                closed += 1
+            if len(ring) >= 4:
+                kept.append(ring)
+            elif not kept:
+                dropped += len(polygon)
+                break
+            else:
+                dropped += 1
+        else:
+            if kept:
+                cleaned.append(kept)
+    return cleaned, closed, dropped
+
+
+def _wgs84_multipolygon(geom_data, srid):
+    """MultiPolygon from polygon(s) in ``srid``, with the rings closed and dropped (see _close_rings)"""
+    polygons = [geom_data['coordinates']] if geom_data['type'] == 'Polygon' else geom_data['coordinates']
+    rings = [_ring_array(ring) for polygon in polygons for ring in polygon]
+    coords = np.concatenate(rings) if rings else np.empty((0, 2))
+    if srid and len(coords):
+        x, y = _to_wgs84(srid).transform(coords[:, 0], coords[:, 1])
+        coords = np.column_stack([x, y])
+    coords = np.ascontiguousarray(coords, dtype='<f8')
+
+    # Slice the transformed points back into rings
+    projected, start = [], 0
+    for polygon in polygons:
+        projected.append([])
+        for ring in polygon:
+            end = start + len(ring)
+            projected[-1].append(coords[start:end])
+            start = end
+    polygons, closed, dropped = _close_rings(projected)
+
+    # EWKB: little-endian MultiPolygon with SRID, then Polygon > ring > points
+    parts = [struct.pack('<BII', 1, 6 | 0x20000000, WGS84_SRID), struct.pack('<I', len(polygons))]
+    for polygon in polygons:
+        parts.append(struct.pack('<BII', 1, 3, len(polygon)))
+        for ring in polygon:
+            parts.append(struct.pack('<I', len(ring)))
+            parts.append(ring.tobytes())
+    return GEOSGeometry(memoryview(b''.join(parts))), closed, dropped
+
+
+def to_wgs84_geometry(geom_data, srid=None):
+    """
+    GEOS geometry in EPSG:4326 from a GeoJSON-like mapping in ``srid``
+    (None: already WGS84). Polygons and multipolygons come back as a
+    MultiPolygon written straight to EWKB: all rings go through the cached
+    transformer in one array call and no GeoJSON text is built. Open rings
+    are closed and degenerate ones dropped.
+    """
+    if hasattr(geom_data, '__geo_interface__'):
+        geom_data = geom_data.__geo_interface__
+
+    if geom_data['type'] in ('Polygon', 'MultiPolygon'):
+        return _wgs84_multipolygon(geom_data, srid)[0]
+
+    geometry = GEOSGeometry(json.dumps(geom_data))
+    geometry.srid = srid or WGS84_SRID
+    if srid:
+        geometry.transform(WGS84_SRID)
+    return geometry
+
+
+def _polygonal_parts(geometry):
+    if geometry.geom_type == 'Polygon':
+        return [geometry]
+    if geometry.geom_type in ('MultiPolygon', 'GeometryCollection'):
+        return [part for child in geometry for part in _polygonal_parts(child)]
+    return []
+
+
+def repair_geometry(geometry):
+    """
+    Valid polygonal version of a geometry: invalid ones (self-intersections,
+    bow-ties, bad ring order) are fixed with MakeValid, falling back to
+    buffer(0), and the lines, points and zero-area parts this leaves behind
+    are dropped. Returns (MultiPolygon or None if nothing is left, repaired).
+    """
+    if geometry.valid:
+        return geometry, False
+
+    try:
+        fixed = geometry.make_valid()
+    except Exception:
+        fixed = None
+    if fixed is None or not fixed.valid:
+        fixed = geometry.buffer(0)
+
+    polygons = [polygon for polygon in _polygonal_parts(fixed) if not polygon.empty and polygon.area > 0]
+    if not polygons:
+        return None, True
+    return MultiPolygon(polygons, srid=geometry.srid), True
+
+
+def ingest_geometry(geom_data, srid=None):
+    """
+    Project, validate and repair one feature's geometry for loading; never
+    raises. Returns (geometry, outcome), where outcome is one of
+    REPAIR_OUTCOMES and geometry is an exception when it is 'dropped'
+    (nothing areal left) or 'failed'.
+    """
+    try:
+        if hasattr(geom_data, '__geo_interface__'):
+            geom_data = geom_data.__geo_interface__
+        if geom_data['type'] not in ('Polygon', 'MultiPolygon'):
+            return to_wgs84_geometry(geom_data, srid), 'valid'
+
+        geometry, rings_closed, rings_dropped = _wgs84_multipolygon(geom_data, srid)
+        if geometry.empty:
+            return ValueError("Empty geometry"), 'dropped'
+        geometry, repaired = repair_geometry(geometry)
+        if geometry is None:
+            return ValueError("Geometry has no area left after repair"), 'dropped'
+        if repaired or rings_closed:
+            return geometry, 'repaired'
+        return geometry, 'parts_dropped' if rings_dropped else 'valid'
+    except Exception as e:
+        return ValueError(f"Geometry transformation error: {e}"), 'failed'
+
+
+def province_bbox():
+    """
+    Return the (south, west, north, east) extent of the loaded barangay
+    boundaries, falling back to the fixed Negros Oriental extent
+    """
+    from django.db.models import Extent
+    from .models import BarangayBoundaryNew
+
+    try:
+        extent = BarangayBoundaryNew.objects.active().aggregate(extent=Extent('geometry'))['extent']
+    except Exception as e:
+        print(f"⚠️ Could not compute barangay extent: {e}")
+        extent = None
+
+    if not extent:
+        return NEGROS_ORIENTAL_BBOX
+
+    west, south, east, north = extent
+    return (south, west, north, east)
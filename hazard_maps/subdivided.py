@@ -0,0 +1,109 @@
+"""
+Subdivided copies of the hazard layers for fast polygon overlays.
+
+Susceptibility polygons are often huge (a single flood class can wrap a
+whole river basin), so clipping them against a parcel means walking tens
+of thousands of vertices. ``ST_Subdivide`` cuts each polygon into pieces
+of at most ``MAX_VERTICES`` vertices, stored in SubdividedHazard with a
+GiST index, so the ``&&`` prefilter returns only the few small pieces
+that actually touch the query geometry.
+"""
+from django.db import connection, transaction
+
+from .models import (
+    FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility, SubdividedHazard,
+)
+
+MAX_VERTICES = 256
+
+# hazard type -> (source model, susceptibility field)
+HAZARD_SOURCES = {
+    'flood': (FloodSusceptibility, 'flood_susc'),
+    'landslide': (LandslideSusceptibility, 'landslide_susc'),
+    'liquefaction': (LiquefactionSusceptibility, 'liquefaction_susc'),
+}
+
+
+def _insert_pieces(hazard_type, dataset_id=None):
+    model, field = HAZARD_SOURCES[hazard_type]
+    qn = connection.ops.quote_name
+    where = "WHERE dataset_id = %s" if dataset_id is not None else ""
+    params = [hazard_type, MAX_VERTICES] + ([dataset_id] if dataset_id is not None else [])
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {qn(SubdividedHazard._meta.db_table)}
+                (dataset_id, hazard_type, susceptibility, source_id, active, geometry)
+            SELECT s.dataset_id, %s, s.level, s.id, s.active, ST_Subdivide(s.geom, %s)
+            FROM (
+                SELECT dataset_id, id, {qn(field)} AS level, active,
+                       (ST_Dump(ST_CollectionExtract(ST_MakeValid(geometry), 3))).geom AS geom
+                FROM {qn(model._meta.db_table)}
+                {where}
+            ) s
+        """, params)
+        return cursor.rowcount
+
+
+def subdivide_dataset(dataset):
+    """(Re)build the subdivided pieces of one uploaded hazard dataset"""
+    if dataset.dataset_type not in HAZARD_SOURCES:
+        return 0
+
+    with transaction.atomic():
+        SubdividedHazard.objects.filter(dataset=dataset).delete()
+        pieces = _insert_pieces(dataset.dataset_type, dataset.id)
+
+    print(f"✂️ Subdivided {dataset.dataset_type} dataset #{dataset.id} into {pieces} pieces")
+    return pieces
+
+
+def discard_pieces(hazard_type, source_ids, batch_size=5000):
+    """Delete the pieces of source polygons updated or removed by an upsert"""
+    source_ids = list(source_ids)
+    deleted = 0
+    for start in range(0, len(source_ids), batch_size):
+        deleted += SubdividedHazard.objects.filter(
+            hazard_type=hazard_type, source_id__in=source_ids[start:start + batch_size],
+        ).delete()[0]
+    return deleted
+
+
+def rebuild_subdivided_hazards(hazard_types=None):
+    """Rebuild the pieces for whole hazard layers; returns {hazard_type: pieces}"""
+    counts = {}
+    for hazard_type in hazard_types or HAZARD_SOURCES:
+        with transaction.atomic():
+            SubdividedHazard.objects.filter(hazard_type=hazard_type).delete()
+            counts[hazard_type] = _insert_pieces(hazard_type)
+        print(f"✂️ Subdivided {hazard_type} into {counts[hazard_type]} pieces")
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(SubdividedHazard._meta.db_table)}")
+    return counts
+
+
+def overlay_source(hazard_type):
+    """
+    Table to overlay a hazard layer against, as a dict of table, class
+    column, extra WHERE clause and params. Falls back to the original
+    polygons until the layer has been subdivided. Only the active version
+    is overlaid (the clause matches the partial indexes).
+    """
+    qn = connection.ops.quote_name
+    if SubdividedHazard.objects.active().filter(hazard_type=hazard_type).exists():
+        return {
+            'table': qn(SubdividedHazard._meta.db_table),
+            'column': 'susceptibility',
+            'where': "AND h.active AND h.hazard_type = %s",
+            'params': [hazard_type],
+            'subdivided': True,
+        }
+    model, field = HAZARD_SOURCES[hazard_type]
+    return {
+        'table': qn(model._meta.db_table),
+        'column': qn(field),
+        'where': "AND h.active",
+        'params': [],
+        'subdivided': False,
+    }
@@ -0,0 +1,503 @@
+"""
+Province-wide development-suitability heatmap.
+
+``build_suitability_heatmap`` evaluates the point formulas from views.py
+(``calculate_risk_score`` and ``calculate_suitability_score``) on a
+regular Web Mercator grid aligned to slippy-map tiles:
+
+- hazard classes come from rasterizing the susceptibility polygons,
+- accessibility and infrastructure come from the precomputed facility
+  distance/count rasters (see accessibility.py).
+
+The grid is processed in square blocks on a thread pool and written as a
+two-band Cloud-Optimized GeoTIFF (suitability, risk) plus a PNG tile
+pyramid under ``tiles/{z}/{x}/{y}.png``.
+"""
+import json
+import os
+import shutil
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+
+DEFAULT_ZOOM = 12  # ~38 m cells at the province's latitude
+DEFAULT_MIN_ZOOM = 8
+TILE_SIZE = 256
+BLOCK_SIZE = 1024  # cells per block side, a whole number of tiles
+
+WEB_MERCATOR_SRID = 3857
+EARTH_RADIUS_M = 6378137.0
+ORIGIN_SHIFT = np.pi * EARTH_RADIUS_M
+
+COG_FILE = 'suitability.tif'
+TILE_DIR = 'tiles'
+METADATA_FILE = 'metadata.json'
+
+# Hazard class codes used in the rasterized layers (0 = no hazard polygon)
+HAZARD_CODES = {'LS': 1, 'MS': 2, 'HS': 3, 'VHS': 4, 'DF': 5}
+DF_CODE = HAZARD_CODES['DF']
+
+# Same severities and weights as calculate_risk_score, indexed by class code
+SEVERITY_BY_CODE = np.array([0, 20, 40, 70, 100, 100], dtype=np.float32)
+HAZARD_WEIGHTS = {'flood': 0.6, 'landslide': 0.25, 'liquefaction': 0.15}
+
+# (layer, model, class field)
+HAZARD_LAYERS = [
+    ('flood', 'FloodSusceptibility', 'flood_susc'),
+    ('landslide', 'LandslideSusceptibility', 'landslide_susc'),
+    ('liquefaction', 'LiquefactionSusceptibility', 'liquefaction_susc'),
+]
+
+# Suitability categories from calculate_suitability_score: (min score, category, RGB)
+SUITABILITY_CLASSES = [
+    (70, 'HIGHLY SUITABLE', (0x10, 0xb9, 0x81)),
+    (50, 'MODERATELY SUITABLE', (0xf5, 0x9e, 0x0b)),
+    (30, 'MARGINALLY SUITABLE', (0xf9, 0x73, 0x16)),
+    (0, 'NOT SUITABLE', (0xef, 0x44, 0x44)),
+]
+DEBRIS_FLOW_RGB = (0x7f, 0x1d, 0x1d)
+
+
+def risk_scores(flood, landslide, liquefaction):
+    """
+    Vectorized calculate_risk_score over hazard class code arrays
+
+    Returns:
+        (score, debris_flow) arrays; score is rounded like the API's 'score'
+    """
+    weighted = np.zeros(flood.shape, dtype=np.float32)
+    total_weight = np.zeros(flood.shape, dtype=np.float32)
+    for codes, weight in zip((flood, landslide, liquefaction), HAZARD_WEIGHTS.values()):
+        present = codes > 0
+        weighted += np.where(present, SEVERITY_BY_CODE[codes] * weight, 0)
+        total_weight += np.where(present, weight, 0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = np.where(total_weight > 0, weighted / total_weight, 0)
+
+    high_hazards = (
+        np.isin(flood, (3, 4)).astype(np.int8)
+        + np.isin(landslide, (3, 4))
+        + (liquefaction == 3)
+    )
+    score = np.where(high_hazards >= 2, np.minimum(100, score * 1.25), score)
+
+    debris_flow = landslide == DF_CODE
+    score = np.where(debris_flow, 100, np.round(np.minimum(score, 100), 1))
+    return score.astype(np.float32), debris_flow
+
+
+def _tiered(values, full, partial):
+    """25 points at or above ``full``, 15 at or above ``partial``, else 0"""
+    return np.where(values >= full, 25, np.where(values >= partial, 15, 0))
+
+
+def suitability_scores(risk, debris_flow, dist_evacuation, dist_medical, counts):
+    """
+    Vectorized calculate_suitability_score
+
+    Args:
+        risk, debris_flow: output of risk_scores
+        dist_evacuation, dist_medical: metres to the nearest site (inf/NaN = none)
+        counts: dict of evacuation/medical/emergency_services/essential count arrays
+    """
+    safety = (100 - risk) * 0.6
+
+    evac_km = np.nan_to_num(dist_evacuation, nan=np.inf) / 1000
+    hosp_km = np.nan_to_num(dist_medical, nan=np.inf) / 1000
+    evac_score = np.clip(100 - ((evac_km - 0.5) / 4.5) * 100, 0, 100)
+    hosp_score = np.clip(100 - ((hosp_km - 1) / 9) * 100, 0, 100)
+    accessibility = (evac_score * 0.5 + hosp_score * 0.5) * 0.2
+
+    infrastructure = (
+        _tiered(counts['evacuation'], 3, 1)
+        + _tiered(counts['medical'], 2, 1)
+        + _tiered(counts['emergency_services'], 2, 1)
+        + _tiered(counts['essential'], 5, 2)
+    )
+    infrastructure = np.minimum(100, infrastructure) * 0.2
+
+    total = safety + accessibility + infrastructure
+    total = np.where(risk >= 75, total * 0.8, total)
+    total = np.where(debris_flow, 0, np.round(total, 1))
+    return total.astype(np.float32)
+
+
+def lnglat_to_mercator(lng, lat):
+    lng = np.asarray(lng, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    x = np.radians(lng) * EARTH_RADIUS_M
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * EARTH_RADIUS_M
+    return x, y
+
+
+def mercator_to_lnglat(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    lng = np.degrees(x / EARTH_RADIUS_M)
+    lat = np.degrees(2 * np.arctan(np.exp(y / EARTH_RADIUS_M)) - np.pi / 2)
+    return lng, lat
+
+
+def pixel_size(zoom):
+    """Web Mercator metres per pixel of a 256 px tile at ``zoom``"""
+    return 2 * ORIGIN_SHIFT / (TILE_SIZE * 2 ** zoom)
+
+
+class HeatmapGrid:
+    """Tile-aligned Web Mercator grid covering a lat/lng bounding box"""
+
+    def __init__(self, bbox, zoom=DEFAULT_ZOOM):
+        south, west, north, east = bbox
+        self.zoom = zoom
+        self.res = pixel_size(zoom)
+
+        x, y = lnglat_to_mercator([west, east], [south, north])
+        tile_m = self.res * TILE_SIZE
+        tx0 = int(np.floor((x[0] + ORIGIN_SHIFT) / tile_m))
+        tx1 = int(np.ceil((x[1] + ORIGIN_SHIFT) / tile_m))
+        ty0 = int(np.floor((ORIGIN_SHIFT - y[1]) / tile_m))
+        ty1 = int(np.ceil((ORIGIN_SHIFT - y[0]) / tile_m))
+
+        # Global pixel offset of the grid origin at this zoom
+        self.px0 = tx0 * TILE_SIZE
+        self.py0 = ty0 * TILE_SIZE
+        self.width = (tx1 - tx0) * TILE_SIZE
+        self.height = (ty1 - ty0) * TILE_SIZE
+        self.x0 = self.px0 * self.res - ORIGIN_SHIFT
+        self.y0 = ORIGIN_SHIFT - self.py0 * self.res
+
+    @property
+    def transform(self):
+        from rasterio.transform import from_origin
+        return from_origin(self.x0, self.y0, self.res, self.res)
+
+    def blocks(self, size=BLOCK_SIZE):
+        """Yield (row0, row1, col0, col1) windows covering the grid"""
+        for r0 in range(0, self.height, size):
+            for c0 in range(0, self.width, size):
+                yield r0, min(r0 + size, self.height), c0, min(c0 + size, self.width)
+
+    def block_bounds(self, r0, r1, c0, c1):
+        """Mercator (xmin, ymin, xmax, ymax) of a window"""
+        return (
+            self.x0 + c0 * self.res,
+            self.y0 - r1 * self.res,
+            self.x0 + c1 * self.res,
+            self.y0 - r0 * self.res,
+        )
+
+    def cell_centers(self, r0, r1, c0, c1):
+        """WGS84 (lats, lngs) of every cell centre in a window, shaped (rows, cols)"""
+        xs = self.x0 + (np.arange(c0, c1) + 0.5) * self.res
+        ys = self.y0 - (np.arange(r0, r1) + 0.5) * self.res
+        lngs, _ = mercator_to_lnglat(xs, np.zeros_like(xs))
+        _, lats = mercator_to_lnglat(np.zeros_like(ys), ys)
+        lngs, lats = np.meshgrid(lngs, lats)
+        return lats, lngs
+
+    def latlng_bounds(self):
+        (west, east), (south, north) = mercator_to_lnglat(
+            [self.x0, self.x0 + self.width * self.res],
+            [self.y0 - self.height * self.res, self.y0],
+        )
+        return [[float(south), float(west)], [float(north), float(east)]]
+
+
+def _block_shapes(model, field, bounds, srid=WEB_MERCATOR_SRID):
+    """(GeoJSON geometry, value) pairs in ``srid`` for polygons touching a bounding box"""
+    from django.contrib.gis.db.models.functions import Transform
+    from django.contrib.gis.geos import Polygon
+
+    area = Polygon.from_bbox(bounds)
+    area.srid = srid
+    queryset = (
+        model.objects.active()
+        .filter(geometry__bboxoverlaps=area)
+        .annotate(projected=Transform('geometry', srid))
+    )
+    if field is None:
+        return [(json.loads(geom.json), 1) for geom in queryset.values_list('projected', flat=True)]
+
+    rows = queryset.values_list('projected', field)
+    # Highest class drawn last so it wins where polygons overlap
+    shapes = [
+        (json.loads(geom.json), HAZARD_CODES[level])
+        for geom, level in rows if level in HAZARD_CODES
+    ]
+    shapes.sort(key=lambda shape: shape[1])
+    return shapes
+
+
+def rasterize_layer(model, field, bounds, shape, res, srid=WEB_MERCATOR_SRID):
+    """
+    Burn a hazard model's class codes (or 1 for every polygon when ``field``
+    is None) into a uint8 grid whose north-west corner is (bounds[0], bounds[3])
+    """
+    from rasterio import features
+    from rasterio.transform import from_origin
+
+    shapes = _block_shapes(model, field, bounds, srid)
+    if not shapes:
+        return np.zeros(shape, dtype=np.uint8)
+    return features.rasterize(
+        shapes,
+        out_shape=shape,
+        transform=from_origin(bounds[0], bounds[3], res, res),
+        fill=0,
+        dtype='uint8',
+    )
+
+
+def _rasterize_block(model, field, grid, window):
+    r0, r1, c0, c1 = window
+    return rasterize_layer(model, field, grid.block_bounds(*window), (r1 - r0, c1 - c0), grid.res)
+
+
+def _score_block(grid, window, rasters, models):
+    """Rasterize hazards and score one block; returns (suitability, risk, debris_flow)"""
+    from django.db import connection
+
+    try:
+        r0, r1, c0, c1 = window
+        land = _rasterize_block(models['boundary'], None, grid, window).astype(bool)
+        shape = land.shape
+        nodata = np.full(shape, np.nan, dtype=np.float32)
+        if not land.any():
+            return nodata, nodata, np.zeros(shape, dtype=bool)
+
+        hazards = {
+            layer: _rasterize_block(models[layer], field, grid, window)
+            for layer, _, field in HAZARD_LAYERS
+        }
+        risk, debris_flow = risk_scores(hazards['flood'], hazards['landslide'], hazards['liquefaction'])
+
+        lats, lngs = grid.cell_centers(*window)
+        lats, lngs = lats[land], lngs[land]
+        counts = {
+            group: np.nan_to_num(rasters.sample(f'count_{group}', lats, lngs))
+            for group in ('evacuation', 'medical', 'emergency_services', 'essential')
+        }
+        suitability = suitability_scores(
+            risk[land],
+            debris_flow[land],
+            rasters.sample('dist_evacuation', lats, lngs),
+            rasters.sample('dist_medical', lats, lngs),
+            counts,
+        )
+
+        suitability_block = nodata.copy()
+        suitability_block[land] = suitability
+        risk_block = nodata.copy()
+        risk_block[land] = risk[land]
+        return suitability_block, risk_block, debris_flow & land
+    finally:
+        # Worker threads each get their own connection
+        connection.close()
+
+
+def colorize(suitability, debris_flow):
+    """RGBA uint8 image of suitability categories; transparent where NaN"""
+    rgba = np.zeros(suitability.shape + (4,), dtype=np.uint8)
+    valid = ~np.isnan(suitability)
+    filled = np.where(valid, suitability, -1)
+
+    assigned = ~valid
+    for min_score, _, rgb in SUITABILITY_CLASSES:
+        selected = ~assigned & (filled >= min_score)
+        rgba[selected, :3] = rgb
+        assigned |= selected
+    rgba[debris_flow & valid, :3] = DEBRIS_FLOW_RGB
+    rgba[valid, 3] = 255
+    return rgba
+
+
+def _downsample(array, factor):
+    """Block mean (ignoring NaN) by an integer factor"""
+    if factor == 1:
+        return array
+    h, w = array.shape
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN blocks
+        return np.nanmean(array.reshape(h // factor, factor, w // factor, factor), axis=(1, 3))
+
+
+def _write_png(path, rgba):
+    import rasterio
+    from rasterio.errors import NotGeoreferencedWarning
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        with rasterio.open(path, 'w', driver='PNG', width=rgba.shape[1], height=rgba.shape[0],
+                           count=4, dtype='uint8') as dst:
+            dst.write(np.moveaxis(rgba, -1, 0))
+
+
+def _write_tiles(tile_dir, grid, suitability, debris_flow, min_zoom, workers):
+    """Write the PNG pyramid from grid.zoom down to min_zoom; returns the tile count"""
+    jobs = []
+    for zoom in range(grid.zoom, min_zoom - 1, -1):
+        factor = 2 ** (grid.zoom - zoom)
+        scores = _downsample(suitability, factor)
+        df = _downsample(debris_flow.astype(np.float32), factor) >= 0.5
+
+        # Pad so the array starts and ends on tile boundaries at this zoom
+        px0, py0 = grid.px0 // factor, grid.py0 // factor
+        left, top = px0 % TILE_SIZE, py0 % TILE_SIZE
+        right = -(left + scores.shape[1]) % TILE_SIZE
+        bottom = -(top + scores.shape[0]) % TILE_SIZE
+        scores = np.pad(scores, ((top, bottom), (left, right)), constant_values=np.nan)
+        df = np.pad(df, ((top, bottom), (left, right)), constant_values=False)
+
+        tx0, ty0 = (px0 - left) // TILE_SIZE, (py0 - top) // TILE_SIZE
+        for row in range(0, scores.shape[0], TILE_SIZE):
+            for col in range(0, scores.shape[1], TILE_SIZE):
+                tile = scores[row:row + TILE_SIZE, col:col + TILE_SIZE]
+                if np.isnan(tile).all():
+                    continue
+                path = os.path.join(
+                    tile_dir, str(zoom), str(tx0 + col // TILE_SIZE), f"{ty0 + row // TILE_SIZE}.png"
+                )
+                jobs.append((path, tile, df[row:row + TILE_SIZE, col:col + TILE_SIZE]))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda job: _write_png(job[0], colorize(job[1], job[2])), jobs))
+    return len(jobs)
+
+
+def build_suitability_heatmap(output_dir=None, zoom=DEFAULT_ZOOM, min_zoom=DEFAULT_MIN_ZOOM, bbox=None,
+                              workers=None):
+    """
+    Score the whole province and write the COG, PNG tiles and metadata
+
+    Returns:
+        The metadata dict written next to the outputs
+    """
+    import rasterio
+    from .accessibility import get_accessibility_rasters
+    from .models import (
+        BarangayBoundaryNew, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility,
+    )
+    from .spatial import province_bbox
+
+    start = time.time()
+    output_dir = str(output_dir or settings.SUITABILITY_HEATMAP_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 4
+
+    rasters = get_accessibility_rasters()
+    if rasters is None:
+        raise ValueError("Accessibility rasters not found. Run 'python manage.py build_accessibility_rasters' first.")
+    if not BarangayBoundaryNew.objects.active().exists():
+        raise ValueError("No barangay boundaries loaded; they define the land area to score.")
+
+    models = {
+        'boundary': BarangayBoundaryNew,
+        'flood': FloodSusceptibility,
+        'landslide': LandslideSusceptibility,
+        'liquefaction': LiquefactionSusceptibility,
+    }
+
+    grid = HeatmapGrid(bbox or province_bbox(), zoom)
+    suitability = np.full((grid.height, grid.width), np.nan, dtype=np.float32)
+    risk = np.full((grid.height, grid.width), np.nan, dtype=np.float32)
+    debris_flow = np.zeros((grid.height, grid.width), dtype=bool)
+
+    windows = list(grid.blocks())
+    print(f"🗺️ Suitability grid: {grid.width} x {grid.height} cells at {grid.res:.1f} m (zoom {zoom}), "
+          f"{len(windows)} blocks on {workers} threads")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_score_block, grid, window, rasters, models): window for window in windows}
+        for done, future in enumerate(as_completed(futures), 1):
+            r0, r1, c0, c1 = futures[future]
+            suitability[r0:r1, c0:c1], risk[r0:r1, c0:c1], debris_flow[r0:r1, c0:c1] = future.result()
+            if done % 10 == 0 or done == len(windows):
+                print(f"⏳ Scored {done}/{len(windows)} blocks ({time.time() - start:.0f}s)")
+
+    # Write to temporary names first so readers never see a half-written set
+    cog_tmp = os.path.join(output_dir, COG_FILE + '.tmp')
+    with rasterio.open(
+        cog_tmp, 'w', driver='COG',
+        width=grid.width, height=grid.height, count=2, dtype='float32',
+        crs=f'EPSG:{WEB_MERCATOR_SRID}', transform=grid.transform, nodata=np.nan,
+        compress='deflate', predictor=3, blocksize=512, overview_resampling='average',
+    ) as dst:
+        dst.write(suitability, 1)
+        dst.write(risk, 2)
+        dst.set_band_description(1, 'suitability')
+        dst.set_band_description(2, 'risk')
+    os.replace(cog_tmp, os.path.join(output_dir, COG_FILE))
+
+    tile_dir = os.path.join(output_dir, TILE_DIR)
+    tile_tmp = tile_dir + '.tmp'
+    shutil.rmtree(tile_tmp, ignore_errors=True)
+    tile_count = _write_tiles(tile_tmp, grid, suitability, debris_flow, min_zoom, workers)
+    shutil.rmtree(tile_dir, ignore_errors=True)
+    os.replace(tile_tmp, tile_dir)
+
+    valid = ~np.isnan(suitability)
+    category_cells = {}
+    upper = np.inf
+    for min_score, category, _ in SUITABILITY_CLASSES:
+        category_cells[category] = int((valid & (suitability >= min_score) & (suitability < upper)).sum())
+        upper = min_score
+
+    metadata = {
+        'srid': WEB_MERCATOR_SRID,
+        'x0': grid.x0,
+        'y0': grid.y0,
+        'cell': grid.res,
+        'width': grid.width,
+        'height': grid.height,
+        'zoom': zoom,
+        'min_zoom': min_zoom,
+        'bounds': grid.latlng_bounds(),
+        'tile_count': tile_count,
+        'scored_cells': int(valid.sum()),
+        'debris_flow_cells': int(debris_flow.sum()),
+        'category_cells': category_cells,
+        'accessibility_version': rasters.version,
+        'version': int(time.time()),
+    }
+    tmp_path = os.path.join(output_dir, METADATA_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, METADATA_FILE))
+
+    print(f"✅ Suitability heatmap written to {output_dir} ({time.time() - start:.1f}s)")
+    return metadata
+
+
+def load_heatmap_metadata():
+    """Metadata of the built heatmap, or None if it has not been built"""
+    path = os.path.join(str(settings.SUITABILITY_HEATMAP_DIR), METADATA_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def sample_heatmap(lat, lng):
+    """(suitability, risk) at a point from the COG, or None outside the scored area"""
+    import rasterio
+
+    path = os.path.join(str(settings.SUITABILITY_HEATMAP_DIR), COG_FILE)
+    if not os.path.exists(path):
+        return None
+
+    x, y = lnglat_to_mercator(lng, lat)
+    with rasterio.open(path) as src:
+        row, col = src.index(float(x), float(y))
+        if not (0 <= row < src.height and 0 <= col < src.width):
+            return None
+        suitability, risk = src.read(window=((row, row + 1), (col, col + 1)))[:, 0, 0]
+
+    if np.isnan(suitability):
+        return None
+    return float(suitability), float(risk)
@@ -1,3 +1,74 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.test import SimpleTestCase
+
+from .models import FloodSusceptibility, LiquefactionSusceptibility, ZonalValue
+from .upsert import Upserter
+from .utils import CSVProcessor, ShapefileProcessor
+
+
+def _square(i):
+    x = 123 + i * 0.01
+    return MultiPolygon(Polygon(((x, 9), (x + 0.01, 9), (x + 0.01, 9.01), (x, 9.01), (x, 9))), srid=4326)
+
+
+def _stored(model, rows, key_field):
+    """Queryset stand-in holding rows saved by a normal load"""
+    queryset = mock.MagicMock()
+    queryset.order_by.return_value.values_list.return_value.iterator.return_value = [
+        (pk, getattr(obj, key_field) if key_field else obj.feature_hash, obj.feature_hash)
+        for pk, obj in enumerate(rows, 1)
+    ]
+    return queryset
+
+
+class UpsertAfterNormalLoadTests(SimpleTestCase):
+    """An upsert of the file a normal load read must leave every row alone"""
+
+    def assert_unchanged(self, model, make, key_field, loaded):
+        upserter = Upserter(model, mock.Mock(return_value=0), _stored(model, loaded, key_field))
+        with mock.patch.object(model.objects, 'bulk_update') as bulk_update, \
+                mock.patch.object(model.objects, 'filter') as delete_filter:
+            upserter.flush([(i, make(i)) for i in range(len(loaded))], [])
+            stats = upserter.finish([])
+
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'unchanged': len(loaded), 'removed': 0})
+        bulk_update.assert_not_called()
+        delete_filter.assert_not_called()
+        upserter.insert.assert_not_called()
+
+    def shapefile_load(self, model, make, count):
+        processor = ShapefileProcessor(mock.Mock(), 'flood')
+        batch = [(i, make(i)) for i in range(count)]
+        with mock.patch.object(processor, 'insert_batch', return_value=count):
+            processor.flush_batch(model, batch, [])
+        return [obj for _, obj in batch]
+
+    def test_natural_key_layer(self):
+        def make(i):
+            return FloodSusceptibility(
+                flood_susc='HS', original_code='HF', shape_area=1.5, orig_fid=i, geometry=_square(i),
+            )
+        self.assert_unchanged(FloodSusceptibility, make, 'orig_fid', self.shapefile_load(FloodSusceptibility, make, 5))
+
+    def test_hash_keyed_layer(self):
+        def make(i):
+            return LiquefactionSusceptibility(liquefaction_susc='MS', original_code='Moderate', geometry=_square(i))
+        loaded = self.shapefile_load(LiquefactionSusceptibility, make, 5)
+        self.assertEqual(len({obj.feature_hash for obj in loaded}), 5)
+        self.assert_unchanged(LiquefactionSusceptibility, make, None, loaded)
+
+    def test_csv_rows(self):
+        def make(i):
+            return ZonalValue(
+                barangay_name='Poblacion', barangay_code=f'PH07461100{i}', municipality='Dumaguete',
+                street=f'Street {i}', land_class='Residential', price_per_sqm=Decimal('1500.00'),
+            )
+        processor = CSVProcessor(mock.Mock(), 'zonal_values')
+        loaded = [make(i) for i in range(5)]
+        with mock.patch.object(ZonalValue, 'save'):
+            for obj in loaded:
+                processor.save_record(obj)
+        self.assert_unchanged(ZonalValue, make, None, loaded)
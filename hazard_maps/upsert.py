@@ -0,0 +1,183 @@
+"""
+Upsert re-ingest: bring a stored layer in line with a new upload of it.
+
+Every row of the upsertable models carries ``feature_hash``: a SHA-1 of
+its content fields (geometry as EWKB, for the spatial layers), set by
+normal loads as well as upserts. Each incoming feature is matched to the
+stored row with the same natural ID; layers without one (liquefaction,
+zonal values) are matched on the hash itself. Unchanged features are
+skipped, changed ones updated with ``bulk_update``, new ones go through
+the processor's usual bulk insert, and stored rows missing from the
+upload are deleted in bulk at the end.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import transaction
+
+from .models import (
+    BarangayBoundaryNew, BarangayCharacteristic, FloodSusceptibility, LandslideSusceptibility,
+    MunicipalityCharacteristic,
+)
+
+# model -> natural ID field; other models are matched on feature_hash
+NATURAL_KEYS = {
+    FloodSusceptibility: 'orig_fid',
+    LandslideSusceptibility: 'orig_fid',
+    BarangayBoundaryNew: 'adm4_pcode',
+    MunicipalityCharacteristic: 'correspondence_code',
+    BarangayCharacteristic: 'barangay_code',
+}
+
+# Bookkeeping fields that are not part of a feature's content
+NON_CONTENT_FIELDS = {'dataset', 'feature_hash', 'active', 'created_at'}
+
+UPDATE_BATCH_SIZE = 500
+DELETE_BATCH_SIZE = 5000
+
+
+@lru_cache(maxsize=None)
+def content_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in NON_CONTENT_FIELDS
+    ]
+
+
+def feature_hash(instance, fields):
+    """SHA-1 hex digest of an unsaved instance's content fields"""
+    digest = hashlib.sha1()
+    for field in fields:
+        value = getattr(instance, field.attname)
+        digest.update(bytes(value.ewkb) if isinstance(value, GEOSGeometry) else repr(value).encode())
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def stamp_feature_hash(instance):
+    """Set feature_hash on an instance loaded outside upsert mode, so a later upsert can match it"""
+    instance.feature_hash = feature_hash(instance, content_fields(type(instance)))
+    return instance
+
+
+class Upserter:
+    """
+    Matches batches of new instances of one model against the stored rows
+    of ``queryset`` (default: the whole table).
+
+    Args:
+        model: model of the layer being re-ingested
+        insert: callable(batch, errors) -> rows inserted, given (index, instance) pairs
+        queryset: stored rows the upload replaces
+    """
+
+    def __init__(self, model, insert, queryset=None):
+        self.model = model
+        self.insert = insert
+        self.key_field = NATURAL_KEYS.get(model)
+        self.fields = content_fields(model)
+        self.update_fields = [field.name for field in self.fields] + ['dataset', 'feature_hash']
+
+        self.stored = {}  # key -> (pk, feature_hash)
+        self.duplicates = []  # stored rows sharing a key with an earlier one
+        self.seen = set()
+        self.pending = []
+        self.stale_ids = []  # pks of rows updated or removed
+        self.stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+
+        queryset = queryset if queryset is not None else model.objects.all()
+        # Newest first, so older copies of a key left by append uploads are the duplicates
+        rows = queryset.order_by('-pk').values_list('pk', self.key_field or 'feature_hash', 'feature_hash')
+        for pk, natural_id, digest in rows.iterator(chunk_size=5000):
+            key = self._key(natural_id, digest)
+            if key in self.stored:
+                self.duplicates.append(pk)
+            else:
+                self.stored[key] = (pk, digest)
+        print(f"🔁 Upsert into {model.__name__}: {len(self.stored)} stored rows keyed by {self.key_field or 'feature hash'}")
+
+    def _key(self, natural_id, digest):
+        if self.key_field is None or natural_id is None:
+            return ('hash', digest)
+        return natural_id
+
+    def flush(self, batch, errors):
+        """Upsert a batch of (index, instance) pairs; returns rows inserted or updated"""
+        inserts = []
+        updates = []
+        for idx, obj in batch:
+            obj.feature_hash = feature_hash(obj, self.fields)
+            key = self._key(getattr(obj, self.key_field) if self.key_field else None, obj.feature_hash)
+            # A repeated ID in the upload is a new feature, not a second update
+            stored = self.stored.get(key) if key not in self.seen else None
+            self.seen.add(key)
+
+            if stored is None:
+                inserts.append((idx, obj))
+            elif stored[1] == obj.feature_hash:
+                self.stats['unchanged'] += 1
+            else:
+                obj.pk = stored[0]
+                updates.append((idx, obj))
+
+        updated = self.update(updates, errors) if updates else 0
+        inserted = self.insert(inserts, errors) if inserts else 0
+        self.stats['inserted'] += inserted
+        return updated + inserted
+
+    def update(self, updates, errors):
+        """
+        bulk_update (index, instance) pairs in a savepoint; if that fails,
+        retry row by row so one bad feature is reported on its own and the
+        rest of the upsert's transaction stays usable. Returns rows updated.
+        """
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_update(
+                    [obj for _, obj in updates], self.update_fields, batch_size=UPDATE_BATCH_SIZE,
+                )
+            done = [obj for _, obj in updates]
+        except Exception as batch_error:
+            print(f"⚠️ Batch update failed ({batch_error}), retrying {len(updates)} features one by one")
+            done = []
+            for idx, obj in updates:
+                try:
+                    with transaction.atomic():
+                        obj.save(update_fields=self.update_fields)
+                    done.append(obj)
+                except Exception as feature_error:
+                    error_msg = f"Error updating feature {idx}: {feature_error}"
+                    print(error_msg)
+                    errors.append(error_msg)
+
+        self.stale_ids.extend(obj.pk for obj in done)
+        self.stats['updated'] += len(done)
+        return len(done)
+
+    def add(self, instance, errors):
+        """Queue one instance (tabular loaders); flushed in batches"""
+        self.pending.append((len(self.pending), instance))
+        if len(self.pending) >= UPDATE_BATCH_SIZE:
+            self.flush(self.pending, errors)
+            self.pending = []
+
+    def finish(self, errors):
+        """Flush queued instances and delete stored rows missing from the upload; returns stats"""
+        if self.pending:
+            self.flush(self.pending, errors)
+            self.pending = []
+
+        missing = [pk for key, (pk, _) in self.stored.items() if key not in self.seen] + self.duplicates
+        for start in range(0, len(missing), DELETE_BATCH_SIZE):
+            self.model.objects.filter(pk__in=missing[start:start + DELETE_BATCH_SIZE]).delete()
+        self.stale_ids.extend(missing)
+        self.stats['removed'] = len(missing)
+
+        print(f"🔁 Upsert into {self.model.__name__}: {self.stats['inserted']} new, {self.stats['updated']} changed, "
+              f"{self.stats['unchanged']} unchanged, {self.stats['removed']} removed")
+        return self.stats
+
+    def message(self):
+        return (f"✅ Upserted: {self.stats['inserted']} new, {self.stats['updated']} changed, "
+                f"{self.stats['unchanged']} unchanged, {self.stats['removed']} removed")
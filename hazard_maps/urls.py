@@ -16,4 +16,23 @@ urlpatterns = [
     path('api/location-hazards/', views.get_location_hazards, name='location_hazards'),
     path('api/nearby-facilities/', views.get_nearby_facilities, name='nearby_facilities'),
     path('api/location-info/', views.get_location_info, name='location_info'),
+    path('api/isochrones/', views.get_isochrones, name='isochrones'),
+    path('api/suitability-heatmap/', views.get_suitability_heatmap, name='suitability_heatmap'),
+    path('api/suitability-tiles/<int:z>/<int:x>/<int:y>.png', views.get_suitability_tile, name='suitability_tile'),
+    path('api/top-sites/', views.get_top_sites, name='top_sites'),
+    path('api/compare-sites/', views.compare_sites, name='compare_sites'),
+    path('api/parcel-assessment/', views.assess_parcel, name='parcel_assessment'),
+    path('api/corridor-exposure/', views.get_corridor_exposure, name='corridor_exposure'),
+    path('api/barangay-exposure/', views.get_barangay_exposure, name='barangay_exposure'),
+    path('api/exposure-choropleth/', views.get_exposure_choropleth, name='exposure_choropleth'),
+    path('api/facility-exposure/', views.get_facility_exposure, name='facility_exposure'),
+    path('api/barangay-valuation/', views.get_barangay_valuation, name='barangay_valuation'),
+    path('api/valuation-export.csv', views.export_valuation, name='valuation_export'),
+    path('api/hazard-diffs/', views.create_hazard_diff, name='create_hazard_diff'),
+    path('api/hazard-diffs/<int:diff_id>/', views.get_hazard_diff, name='hazard_diff'),
+    path('api/hazard-diffs/<int:diff_id>/changes/', views.get_hazard_diff_changes, name='hazard_diff_changes'),
+    path('api/evacuation-coverage/', views.get_evacuation_coverage, name='evacuation_coverage'),
+    path('api/barangay-neighbors/', views.get_barangay_neighbors, name='barangay_neighbors'),
+    path('api/jobs/<int:job_id>/', views.get_job, name='job'),
+    path('api/data-version/', views.get_data_version, name='data_version'),
 ]
\ No newline at end of file
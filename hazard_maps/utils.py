@@ -1,24 +1,36 @@
 import fiona
+import io
 import zipfile
 import os
-import tempfile
 import requests
 import time
 from typing import Dict, Optional, List, Tuple
 import time
 from django.core.cache import cache
+from django.db import transaction
 from math import radians, cos, sin, asin, sqrt
 import hashlib
-from django.contrib.gis.geos import GEOSGeometry, Point
+from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from fiona.io import ZipMemoryFile
+from fiona.io import MemoryFile
 from .models import HazardDataset, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility
-import json
 import csv
+from collections import Counter
 from decimal import Decimal
 
 
-class ShapefileProcessor:
+class IngestProgressMixin:
+    """Structured progress reporting for processors run as an IngestJob"""
+    
+    # Callable taking (stage=, processed=, total=) keyword arguments; set by jobs.run_job
+    progress = None
+    
+    def report_progress(self, stage=None, processed=None, total=None):
+        if self.progress is not None:
+            self.progress(stage=stage, processed=processed, total=total)
+
+
+class ShapefileProcessor(IngestProgressMixin):
     """Process and standardize shapefile data"""
     
     FLOOD_MAPPING = {
@@ -46,11 +58,127 @@ class ShapefileProcessor:
         'High susceptibility': 'HS'
     }
     
-    def __init__(self, uploaded_file, dataset_type):
+    # Features are inserted with bulk_create in batches of this size, or
+    # streamed with COPY in batches of COPY_BATCH_SIZE on PostgreSQL
+    BULK_BATCH_SIZE = 1000
+    COPY_BATCH_SIZE = 20000
+    
+    # Province kept from the national barangay GDB
+    DEFAULT_PROVINCE = 'Negros Oriental'
+    
+    def __init__(self, uploaded_file, dataset_type, province=None, upsert=False):
         self.uploaded_file = uploaded_file
         self.dataset_type = dataset_type
-        self.temp_dir = None
+        self.province = province or self.DEFAULT_PROVINCE
+        self.upsert = upsert
+        self.upserter = None
+        self.memfile = None
+        self.errors = []
+        self.geometry_repairs = Counter()  # spatial.REPAIR_OUTCOMES -> features
+        
+    @property
+    def batch_size(self):
+        from .copy_loader import copy_supported
+        return self.COPY_BATCH_SIZE if copy_supported() else self.BULK_BATCH_SIZE
+    
+    def flush_batch(self, model, batch, errors):
+        """Insert a batch of (feature index, instance) pairs, or upsert it in upsert mode"""
+        if self.upserter is not None:
+            return self.upserter.flush(batch, errors)
+        # Staged rows stay invisible to readers until the dataset is activated;
+        # hashed so a later upsert can tell which features are unchanged
+        from .upsert import stamp_feature_hash
+        for _, obj in batch:
+            obj.active = False
+            stamp_feature_hash(obj)
+        return self.insert_batch(model, batch, errors)
+    
+    def insert_batch(self, model, batch, errors):
+        """
+        Insert a batch of (feature index, instance) pairs with COPY, or one
+        bulk_create where COPY is unavailable or fails. If the batch still
+        fails, retry it row by row so one bad feature is reported on its own
+        instead of dropping the whole batch. Returns rows inserted.
+        """
+        from .copy_loader import copy_instances, copy_supported
+        
+        if not batch:
+            return 0
         
+        if copy_supported():
+            try:
+                with transaction.atomic():
+                    return copy_instances(model, [obj for _, obj in batch])
+            except Exception as copy_error:
+                print(f"⚠️ COPY failed ({copy_error}), falling back to bulk_create")
+        
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([obj for _, obj in batch], batch_size=self.BULK_BATCH_SIZE)
+            return len(batch)
+        except Exception as batch_error:
+            print(f"⚠️ Batch insert failed ({batch_error}), retrying {len(batch)} features one by one")
+        
+        inserted = 0
+        for idx, obj in batch:
+            try:
+                obj.pk = None
+                with transaction.atomic():
+                    obj.save()
+                inserted += 1
+            except Exception as feature_error:
+                error_msg = f"Error processing feature {idx}: {feature_error}"
+                print(error_msg)
+                errors.append(error_msg)
+        return inserted
+    
+    
+    def run_loader(self, loader, path, dataset, model, queryset=None):
+        """
+        Run a loader; in upsert mode its batches are matched against the
+        stored rows of ``queryset`` and rows missing from the upload are
+        removed and the dataset published in the same transaction, so a
+        failed upsert leaves only its staged dataset behind. Returns (rows
+        written, upsert stats).
+        """
+        if not self.upsert:
+            return loader(path, dataset), None
+        
+        from .subdivided import HAZARD_SOURCES, discard_pieces, subdivide_dataset
+        from .upsert import Upserter
+        from .versioning import absorb_layer, publish_dataset
+        self.upserter = Upserter(model, lambda batch, errors: self.insert_batch(model, batch, errors), queryset)
+        with transaction.atomic():
+            loader(path, dataset)
+            stats = self.upserter.finish(self.errors)
+            
+            # Replace the pieces of updated and removed polygons before committing,
+            # so overlays never read stale or missing pieces
+            if dataset.dataset_type in HAZARD_SOURCES:
+                self.report_progress('subdividing')
+                discard_pieces(dataset.dataset_type, self.upserter.stale_ids)
+                subdivide_dataset(dataset)
+            # Published before absorbing, so the absorbed datasets' version numbers
+            # are never handed out again; absorbed after subdividing, which only
+            # has to cut the inserted and updated polygons
+            publish_dataset(dataset)
+            absorb_layer(dataset)
+        return stats['inserted'] + stats['updated'], stats
+    
+    def activate(self, dataset, records_created, upsert_stats):
+        """
+        Make a loaded dataset visible: swap a staged version in for the
+        active one (an upsert was written in place and published by
+        run_loader). Returns the new data version.
+        """
+        from .versioning import activate_dataset
+        
+        if upsert_stats is not None:
+            return dataset.version
+        if not records_created:
+            raise ValueError("No features were loaded; the current version stays active")
+        self.report_progress('activating')
+        return activate_dataset(dataset)
     
     def standardize_code(self, original_code, dataset_type):
         """Standardize susceptibility codes based on dataset type"""
@@ -68,51 +196,80 @@ class ShapefileProcessor:
         
         return original_code
     
-    def transform_geometry(self, geom_dict, source_crs):
-        """Transform geometry from PRS92/Luzon 1911 to WGS84"""
-        try:
-            if hasattr(geom_dict, '__geo_interface__'):
-                geom_data = geom_dict.__geo_interface__
-            else:
-                geom_data = geom_dict
-            
-            geometry = GEOSGeometry(json.dumps(geom_data))
-            
-            # Check CRS - EPSG:4253 is PRS92 (Philippine Reference System 1992)
-            # which is based on Luzon 1911 datum and needs transformation
-            crs_string = str(source_crs).upper() if source_crs else ''
-            
-            # Check if CRS is 4253 or mentions Luzon
-            if '4253' in crs_string or 'LUZON' in crs_string or 'PRS92' in crs_string:
-                print(f"Transforming from EPSG:4253 (PRS92/Luzon 1911) to WGS84")
-                geometry.srid = 4253
-                geometry.transform(4326)
-            else:
-                print(f"Data already in WGS84 or unknown CRS")
-                geometry.srid = 4326
-            
-            if geometry.geom_type == 'Polygon':
-                from django.contrib.gis.geos import MultiPolygon
-                geometry = MultiPolygon(geometry)
-            
-            return geometry
-            
-        except Exception as e:
-            print(f"Geometry transformation error: {e}")
-            print(f"Source CRS: {source_crs}")
-            raise
+    def transform_geometry(self, geom_dict, srid=None):
+        """Transform geometry to WGS84 from ``srid`` (see spatial.layer_srid)"""
+        from .spatial import to_wgs84_geometry
+        return to_wgs84_geometry(geom_dict, srid)
+    
+    def iter_features(self, shapefile, where=None):
+        """
+        Yield (index, feature, geometry) for the features of an open fiona
+        collection, optionally restricted by an OGR SQL ``where`` clause
+        evaluated by the driver, so rejected features are never decoded.
+        geometry is the valid WGS84 GEOS geometry (repaired if needed), None
+        when the feature has none, or the exception explaining why it was
+        dropped. Large files are transformed and repaired in a process pool
+        when INGEST_PROCESS_WORKERS is more than 1; repair outcomes are
+        counted in ``geometry_repairs`` either way.
+        """
+        from django.conf import settings
+        from .parallel_ingest import MIN_PARALLEL_FEATURES, transformed_features
+        from .spatial import ingest_geometry, layer_srid
+        
+        # EPSG:4253 is PRS92 (Philippine Reference System 1992), based on the
+        # Luzon 1911 datum, and needs transformation; the CRS is checked once
+        srid = layer_srid(shapefile.crs)
+        if srid:
+            print(f"Transforming from EPSG:{srid} (PRS92/Luzon 1911) to WGS84")
+        else:
+            print(f"Data already in WGS84 or unknown CRS")
+        
+        features = shapefile.filter(where=where) if where else shapefile
+        
+        workers = getattr(settings, 'INGEST_PROCESS_WORKERS', 1)
+        if workers > 1 and not where and len(shapefile) >= MIN_PARALLEL_FEATURES:
+            print(f"⚙️ Transforming geometries in {workers} processes")
+            prepared = transformed_features(features, srid, workers)
+        else:
+            prepared = (
+                (idx, feature, *ingest_geometry(feature['geometry'], srid))
+                if feature['geometry'] is not None else (idx, feature, None, None)
+                for idx, feature in enumerate(features)
+            )
+        
+        for idx, feature, geometry, outcome in prepared:
+            if outcome is not None:
+                self.geometry_repairs[outcome] += 1
+            if isinstance(geometry, Exception):
+                print(f"Geometry {outcome} in feature {idx}: {geometry}")
+            yield idx, feature, geometry
+        self.print_repair_summary()
+    
+    def print_repair_summary(self):
+        repairs = self.geometry_repairs
+        if not repairs:
+            return
+        print(
+            f"🩹 Geometries: {repairs['valid']} valid, {repairs['repaired']} repaired, "
+            f"{repairs['parts_dropped']} with degenerate rings dropped, "
+            f"{repairs['dropped']} dropped, {repairs['failed']} failed"
+        )
         
     def process_flood_data(self, shp_file, dataset):
         """Process flood susceptibility shapefile"""
         records_created = 0
-        errors = []
+        errors = self.errors
+        
+        batch = []
         
         try:
-            with fiona.open(shp_file) as shapefile:
+            with fiona.open(shp_file) as shapefile, transaction.atomic():
                 print(f"Shapefile CRS: {shapefile.crs}")
                 print(f"Total features: {len(shapefile)}")
+                self.report_progress('loading', 0, len(shapefile))
                 
-                for idx, feature in enumerate(shapefile):
+                for idx, feature, geometry in self.iter_features(shapefile):
+                    self.report_progress(processed=idx)
                     try:
                         props = feature['properties']
                         geom = feature['geometry']
@@ -122,9 +279,10 @@ class ShapefileProcessor:
                         
                         original_code = props.get('FloodSusc', '')
                         standardized_code = self.standardize_code(original_code, 'flood')
-                        geometry = self.transform_geometry(geom, shapefile.crs)
+                        if isinstance(geometry, Exception):
+                            raise geometry
                         
-                        FloodSusceptibility.objects.create(
+                        batch.append((idx, FloodSusceptibility(
                             dataset=dataset,
                             flood_susc=standardized_code,
                             original_code=original_code,
@@ -132,17 +290,20 @@ class ShapefileProcessor:
                             shape_area=props.get('SHAPE_Area'),
                             orig_fid=props.get('ORIG_FID'),
                             geometry=geometry
-                        )
-                        records_created += 1
+                        )))
                         
-                        if records_created % 100 == 0:
-                            print(f"Processed {records_created} features...")
+                        if len(batch) >= self.batch_size:
+                            records_created += self.flush_batch(FloodSusceptibility, batch, errors)
+                            batch = []
                         
                     except Exception as feature_error:
                         error_msg = f"Error processing feature {idx}: {feature_error}"
                         print(error_msg)
                         errors.append(error_msg)
                         continue
+                
+                records_created += self.flush_batch(FloodSusceptibility, batch, errors)
+                self.report_progress(processed=len(shapefile))
                         
         except Exception as file_error:
             print(f"Error opening shapefile: {file_error}")
@@ -153,11 +314,15 @@ class ShapefileProcessor:
     def process_landslide_data(self, shp_file, dataset):
         """Process landslide susceptibility shapefile"""
         records_created = 0
+        errors = self.errors
+        batch = []
         
-        with fiona.open(shp_file) as shapefile:
+        with fiona.open(shp_file) as shapefile, transaction.atomic():
             print(f"Processing landslide - CRS: {shapefile.crs}")
+            self.report_progress('loading', 0, len(shapefile))
             
-            for idx, feature in enumerate(shapefile):
+            for idx, feature, geometry in self.iter_features(shapefile):
+                self.report_progress(processed=idx)
                 try:
                     props = feature['properties']
                     geom = feature['geometry']
@@ -167,9 +332,10 @@ class ShapefileProcessor:
                     
                     original_code = props.get('LndslideSu') or props.get('LndSu', '')
                     standardized_code = self.standardize_code(original_code, 'landslide')
-                    geometry = self.transform_geometry(geom, shapefile.crs)
+                    if isinstance(geometry, Exception):
+                        raise geometry
                     
-                    LandslideSusceptibility.objects.create(
+                    batch.append((idx, LandslideSusceptibility(
                         dataset=dataset,
                         landslide_susc=standardized_code,
                         original_code=original_code,
@@ -177,23 +343,34 @@ class ShapefileProcessor:
                         shape_area=props.get('SHAPE_Area'),
                         orig_fid=props.get('ORIG_FID'),
                         geometry=geometry
-                    )
-                    records_created += 1
+                    )))
+                    
+                    if len(batch) >= self.batch_size:
+                        records_created += self.flush_batch(LandslideSusceptibility, batch, errors)
+                        batch = []
                     
                 except Exception as e:
                     print(f"Error processing landslide feature {idx}: {e}")
+                    errors.append(f"Error processing landslide feature {idx}: {e}")
                     continue
+            
+            records_created += self.flush_batch(LandslideSusceptibility, batch, errors)
+            self.report_progress(processed=len(shapefile))
                 
         return records_created
     
     def process_liquefaction_data(self, shp_file, dataset):
         """Process liquefaction susceptibility shapefile"""
         records_created = 0
+        errors = self.errors
+        batch = []
         
-        with fiona.open(shp_file) as shapefile:
+        with fiona.open(shp_file) as shapefile, transaction.atomic():
             print(f"Processing liquefaction - CRS: {shapefile.crs}")
+            self.report_progress('loading', 0, len(shapefile))
             
-            for idx, feature in enumerate(shapefile):
+            for idx, feature, geometry in self.iter_features(shapefile):
+                self.report_progress(processed=idx)
                 try:
                     props = feature['properties']
                     geom = feature['geometry']
@@ -203,19 +380,27 @@ class ShapefileProcessor:
                     
                     original_code = props.get('Susceptibi', '').strip()
                     standardized_code = self.standardize_code(original_code, 'liquefaction')
-                    geometry = self.transform_geometry(geom, shapefile.crs)
+                    if isinstance(geometry, Exception):
+                        raise geometry
                     
-                    LiquefactionSusceptibility.objects.create(
+                    batch.append((idx, LiquefactionSusceptibility(
                         dataset=dataset,
                         liquefaction_susc=standardized_code,
                         original_code=original_code,
                         geometry=geometry
-                    )
-                    records_created += 1
+                    )))
+                    
+                    if len(batch) >= self.batch_size:
+                        records_created += self.flush_batch(LiquefactionSusceptibility, batch, errors)
+                        batch = []
                     
                 except Exception as e:
                     print(f"Error processing liquefaction feature {idx}: {e}")
+                    errors.append(f"Error processing liquefaction feature {idx}: {e}")
                     continue
+            
+            records_created += self.flush_batch(LiquefactionSusceptibility, batch, errors)
+            self.report_progress(processed=len(shapefile))
                 
         return records_created
 
@@ -223,7 +408,8 @@ class ShapefileProcessor:
     def process_barangay_gdb(self, gdb_path, dataset):
         """
         Process File Geodatabase (.gdb) containing barangay boundaries
-        Filters for Negros Oriental only
+        Keeps only self.province; the filter runs in OGR, so features of
+        other provinces are never decoded
         
         Args:
             gdb_path: Path to the .gdb directory
@@ -236,32 +422,26 @@ class ShapefileProcessor:
         from datetime import datetime
         
         records_created = 0
-        skipped_records = 0
+        errors = self.errors
+        batch = []
         
         # CRITICAL: The exact layer name for barangay boundaries (ADM4)
         # If this doesn't work, we'll need to list all layers
         layer_name = "phl_admbnda_adm4_psa_namria_20231106"
         
-        print(f"\n{'='*60}")
-        print(f"🔍 PROCESSING FILE GEODATABASE")
-        print(f"{'='*60}")
         print(f"📂 GDB Path: {gdb_path}")
         
         try:
             # First, list all available layers
-            print(f"\n📋 Listing all layers in GDB...")
             import fiona
             layers = fiona.listlayers(gdb_path)
-            print(f"✅ Found {len(layers)} layers:")
-            for i, layer in enumerate(layers, 1):
-                print(f"   {i}. {layer}")
             
             # Find the barangay layer (ADM4)
             target_layer = None
             for layer in layers:
                 if 'adm4' in layer.lower():
                     target_layer = layer
-                    print(f"\n🎯 Target layer identified: {target_layer}")
+                    print(f"🎯 Target layer identified: {target_layer}")
                     break
             
             if not target_layer:
@@ -271,23 +451,17 @@ class ShapefileProcessor:
                 )
             
             # Open and process the layer
-            print(f"\n📖 Opening layer: {target_layer}")
-            
-            with fiona.open(gdb_path, layer=target_layer) as shapefile:
-                print(f"✅ Successfully opened layer!")
+            with fiona.open(gdb_path, layer=target_layer) as shapefile, transaction.atomic():
                 print(f"📊 CRS: {shapefile.crs}")
                 print(f"📈 Total features: {len(shapefile)}")
+                # The filtered count is unknown until the layer has been read
+                self.report_progress('loading', 0)
                 
-                # Print sample feature to understand structure
-                print(f"\n🔍 Inspecting first feature...")
-                first_feature = next(iter(shapefile))
-                print(f"📝 Sample properties: {list(first_feature['properties'].keys())}")
+                province_filter = "ADM2_EN = '{}'".format(self.province.replace("'", "''"))
+                print(f"🔎 OGR filter: {province_filter}")
                 
-                print(f"\n{'='*60}")
-                print(f"🚀 STARTING IMPORT (Filtering for Negros Oriental)")
-                print(f"{'='*60}\n")
-                
-                for idx, feature in enumerate(shapefile):
+                for idx, feature, geometry in self.iter_features(shapefile, where=province_filter):
+                    self.report_progress(processed=idx)
                     try:
                         props = feature['properties']
                         geom = feature['geometry']
@@ -296,15 +470,8 @@ class ShapefileProcessor:
                             print(f"⚠️ Feature {idx}: No geometry, skipping")
                             continue
                         
-                        # 🔥 FILTER: Only process Negros Oriental barangays
                         province = str(props.get('ADM2_EN', '')).strip()
                         
-                        if province != 'Negros Oriental':
-                            skipped_records += 1
-                            if skipped_records % 5000 == 0:
-                                print(f"⏭️ Skipped {skipped_records} non-Negros Oriental records...")
-                            continue
-                        
                         # Extract and clean data
                         barangay_name = str(props.get('ADM4_EN', '')).strip()
                         municipality = str(props.get('ADM3_EN', '')).strip()
@@ -324,11 +491,12 @@ class ShapefileProcessor:
                                 print(f"⚠️ Date parse error: {date_error}")
                                 return None
                         
-                        # Transform geometry
-                        geometry = self.transform_geometry(geom, shapefile.crs)
+                        # Transformed by iter_features
+                        if isinstance(geometry, Exception):
+                            raise geometry
                         
-                        # Create barangay boundary record
-                        BarangayBoundaryNew.objects.create(
+                        # Queue barangay boundary record
+                        batch.append((idx, BarangayBoundaryNew(
                             dataset=dataset,
                             objectid=props.get('OBJECTID'),
                             
@@ -364,93 +532,91 @@ class ShapefileProcessor:
                             
                             # Geometry
                             geometry=geometry
-                        )
-                        
-                        records_created += 1
-                        
-                        # Progress updates
-                        if records_created == 1:
-                            print(f"✅ First record: {barangay_name}, {municipality}")
+                        )))
                         
-                        if records_created % 50 == 0:
-                            print(f"✅ Progress: {records_created} Negros Oriental barangays imported...")
+                        if len(batch) >= self.batch_size:
+                            records_created += self.flush_batch(BarangayBoundaryNew, batch, errors)
+                            batch = []
                     
                     except Exception as feature_error:
                         print(f"❌ Error processing feature {idx}: {feature_error}")
+                        errors.append(f"Error processing feature {idx}: {feature_error}")
                         import traceback
                         traceback.print_exc()
                         continue
-            
-            # Final summary
-            print(f"\n{'='*60}")
-            print(f"🎉 IMPORT COMPLETE!")
-            print(f"{'='*60}")
-            print(f"✅ Successfully imported: {records_created} barangays")
-            print(f"⏭️ Skipped (other provinces): {skipped_records} barangays")
-            print(f"📍 Province: Negros Oriental")
-            print(f"{'='*60}\n")
+                
+                records_created += self.flush_batch(BarangayBoundaryNew, batch, errors)
             
             return records_created
             
         except Exception as file_error:
-            print(f"\n{'='*60}")
-            print(f"❌ ERROR PROCESSING GDB")
-            print(f"{'='*60}")
-            print(f"Error: {file_error}")
+            print(f"❌ Error processing GDB: {file_error}")
             import traceback
             traceback.print_exc()
             raise    
     
+    def open_archive(self):
+        """
+        (GDAL /vsizip/ root, zip source for listing) of the upload. The
+        upload's own file is used when it is on disk (saved ingest job
+        uploads, Django temporary uploads); otherwise the bytes go to a
+        /vsimem/ MemoryFile held until processing ends.
+        """
+        path = None
+        if hasattr(self.uploaded_file, 'temporary_file_path'):
+            path = self.uploaded_file.temporary_file_path()
+        else:
+            name = getattr(getattr(self.uploaded_file, 'file', None), 'name', None)
+            if isinstance(name, str) and os.path.isfile(name):
+                path = name
+        
+        if path:
+            print(f"📦 Reading archive in place: {path}")
+            return f"/vsizip/{path}", path
+        
+        data = self.uploaded_file.read()
+        self.memfile = MemoryFile(data, ext='.zip')
+        print(f"📦 Reading archive from memory: {self.memfile.name}")
+        return f"/vsizip/{self.memfile.name}", io.BytesIO(data)
+    
+    def find_datasets(self, archive_root, zip_source):
+        """
+        (gdb_path, shp_path) as /vsizip/ paths from the zip directory; a File
+        Geodatabase wins over shapefiles, either may be None
+        """
+        with zipfile.ZipFile(zip_source) as archive:
+            names = [name for name in archive.namelist() if not name.startswith('__MACOSX/')]
+        
+        shp_file = None
+        for name in names:
+            parts = name.split('/')
+            for depth, part in enumerate(parts[:-1], 1):
+                if part.lower().endswith('.gdb'):
+                    gdb_path = f"{archive_root}/{'/'.join(parts[:depth])}"
+                    print(f"✅ Found GDB: {gdb_path}")
+                    return gdb_path, None
+            if shp_file is None and name.lower().endswith('.shp'):
+                shp_file = f"{archive_root}/{name}"
+        
+        if shp_file:
+            print(f"✅ Found Shapefile: {shp_file}")
+        return None, shp_file
+    
     def process(self):
         """
         UPDATED: Main processing method with GDB support
         Automatically detects file type (Shapefile vs GDB)
         """
+        dataset = None
         try:
             file_name = self.uploaded_file.name.lower()
             
             print(f"📦 Processing file: {file_name}")
             print(f"📋 Dataset type: {self.dataset_type}")
             
-            # Extract the uploaded ZIP file first
-            self.temp_dir = tempfile.mkdtemp()
-            temp_zip_path = os.path.join(self.temp_dir, 'upload.zip')
-            
-            # Save uploaded file to temp location
-            with open(temp_zip_path, 'wb') as temp_file:
-                for chunk in self.uploaded_file.chunks():
-                    temp_file.write(chunk)
-            
-            print(f"💾 Saved to temp: {temp_zip_path}")
-            
-            # Extract ZIP contents
-            with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                zip_ref.extractall(self.temp_dir)
-            
-            print(f"📂 Extracted to: {self.temp_dir}")
-            
-            # 🔍 DETECT FILE TYPE: Look for .gdb directory OR .shp file
-            gdb_path = None
-            shp_file = None
-            
-            for root, dirs, files in os.walk(self.temp_dir):
-                # Check for .gdb directory (File Geodatabase)
-                for dir_name in dirs:
-                    if dir_name.endswith('.gdb'):
-                        gdb_path = os.path.join(root, dir_name)
-                        print(f"✅ Found GDB: {gdb_path}")
-                        break
-                
-                # Check for .shp file (Shapefile)
-                if not gdb_path:
-                    for file in files:
-                        if file.endswith('.shp'):
-                            shp_file = os.path.join(root, file)
-                            print(f"✅ Found Shapefile: {shp_file}")
-                            break
-                
-                if gdb_path or shp_file:
-                    break
+            # Read the archive in place through GDAL's /vsizip/, nothing is extracted
+            self.report_progress('opening')
+            gdb_path, shp_file = self.find_datasets(*self.open_archive())
             
             # 🚀 PROCESS BASED ON FILE TYPE
             if gdb_path:
@@ -461,20 +627,44 @@ class ShapefileProcessor:
                 
                 # Create dataset record
                 dataset = HazardDataset.objects.create(
-                    name=f"Barangay Boundaries - Negros Oriental (PSA-NAMRIA)",
+                    name=f"Barangay Boundaries - {self.province} (PSA-NAMRIA)",
                     dataset_type='barangay',
                     file_name=self.uploaded_file.name,
-                    description="Accurate barangay boundaries from PSA-NAMRIA, filtered for Negros Oriental only"
+                    description=f"Accurate barangay boundaries from PSA-NAMRIA, filtered for {self.province} only",
+                    status='staging',
+                    scope=self.province,
                 )
                 
-                # Process the GDB
-                records_created = self.process_barangay_gdb(gdb_path, dataset)
+                # Process the GDB; an upsert or a new version replaces this province's boundaries only
+                from .models import BarangayBoundaryNew
+                records_created, upsert_stats = self.run_loader(
+                    self.process_barangay_gdb, gdb_path, dataset, BarangayBoundaryNew,
+                    BarangayBoundaryNew.objects.active().filter(adm2_en=self.province),
+                )
+                version = self.activate(dataset, records_created, upsert_stats)
+                
+                self.report_progress('refreshing')
+                from .adjacency import refresh_barangay_adjacency
+                try:
+                    refresh_barangay_adjacency()
+                except Exception as e:
+                    print(f"⚠️ Could not refresh barangay adjacency: {e}")
+                
+                from .exposure import refresh_after_ingest
+                refresh_after_ingest('barangay')
                 
                 return {
                     'success': True,
                     'dataset_id': dataset.id,
+                    'data_version': version,
                     'records_created': records_created,
-                    'message': f'✅ Successfully processed {records_created} barangays for Negros Oriental'
+                    'error_count': len(self.errors),
+                    'geometry_repairs': dict(self.geometry_repairs),
+                    'upsert': upsert_stats,
+                    'message': (
+                        self.upserter.message() if upsert_stats else
+                        f'✅ Successfully processed {records_created} barangays for {self.province}'
+                    )
                 }
             
             elif shp_file:
@@ -487,24 +677,52 @@ class ShapefileProcessor:
                 dataset = HazardDataset.objects.create(
                     name=f"Uploaded {self.dataset_type.title()} Data",
                     dataset_type=self.dataset_type,
-                    file_name=self.uploaded_file.name
+                    file_name=self.uploaded_file.name,
+                    status='staging',
                 )
                 
                 # Route to appropriate shapefile processor
                 if self.dataset_type == 'flood':
-                    records_created = self.process_flood_data(shp_file, dataset)
+                    loader = self.process_flood_data
                 elif self.dataset_type == 'landslide':
-                    records_created = self.process_landslide_data(shp_file, dataset)
+                    loader = self.process_landslide_data
                 elif self.dataset_type == 'liquefaction':
-                    records_created = self.process_liquefaction_data(shp_file, dataset)
+                    loader = self.process_liquefaction_data
                 else:
                     raise ValueError(f"Unsupported dataset type: {self.dataset_type}")
                 
+                from .subdivided import HAZARD_SOURCES, subdivide_dataset
+                model = HAZARD_SOURCES[self.dataset_type][0]
+                records_created, upsert_stats = self.run_loader(
+                    loader, shp_file, dataset, model, model.objects.active(),
+                )
+                
+                # Small pieces for fast parcel/corridor overlays (an upsert replaced its own)
+                if upsert_stats is None:
+                    self.report_progress('subdividing')
+                    try:
+                        subdivide_dataset(dataset)
+                    except Exception as e:
+                        print(f"⚠️ Could not subdivide dataset: {e}")
+                
+                version = self.activate(dataset, records_created, upsert_stats)
+                
+                self.report_progress('refreshing')
+                from .exposure import refresh_after_ingest
+                refresh_after_ingest(self.dataset_type)
+                
                 return {
                     'success': True,
                     'dataset_id': dataset.id,
+                    'data_version': version,
                     'records_created': records_created,
-                    'message': f'✅ Successfully processed {records_created} records'
+                    'error_count': len(self.errors),
+                    'geometry_repairs': dict(self.geometry_repairs),
+                    'upsert': upsert_stats,
+                    'message': (
+                        self.upserter.message() if upsert_stats else
+                        f'✅ Successfully processed {records_created} records'
+                    )
                 }
             
             else:
@@ -523,30 +741,47 @@ class ShapefileProcessor:
             import traceback
             traceback.print_exc()
             
+            # A failed load never becomes visible; drop its staged rows
+            if dataset is not None:
+                from .versioning import discard_staging
+                discard_staging(dataset)
+            
             return {
                 'success': False,
                 'error': str(e)
             }
             
         finally:
-            # Cleanup temp directory
-            if self.temp_dir and os.path.exists(self.temp_dir):
-                import shutil
-                try:
-                    shutil.rmtree(self.temp_dir)
-                    print(f"🧹 Cleaned up temp directory")
-                except Exception as cleanup_error:
-                    print(f"⚠️ Could not clean up temp directory: {cleanup_error}")
+            if self.memfile is not None:
+                self.memfile.close()
+                self.memfile = None
 
 
 
     
-class CSVProcessor:
+class CSVProcessor(IngestProgressMixin):
     """Process CSV files for tabular data"""
     
-    def __init__(self, uploaded_file, dataset_type):
+    def __init__(self, uploaded_file, dataset_type, upsert=False):
         self.uploaded_file = uploaded_file
         self.dataset_type = dataset_type
+        self.upsert = upsert
+        self.upserter = None
+        self.errors = []
+    
+    def save_record(self, instance):
+        """Save one parsed row, or queue it for the upserter in upsert mode"""
+        if self.upserter is not None:
+            self.upserter.add(instance, self.errors)
+        else:
+            from .upsert import stamp_feature_hash
+            stamp_feature_hash(instance).save()
+    
+    def insert_records(self, model, batch, errors):
+        """Bulk insert for the upserter's new rows"""
+        with transaction.atomic():
+            model.objects.bulk_create([obj for _, obj in batch], batch_size=1000)
+        return len(batch)
 
     def process_municipality_characteristics(self, dataset):
         """
@@ -555,7 +790,7 @@ class CSVProcessor:
         from .models import MunicipalityCharacteristic
         
         records_created = 0
-        errors = []
+        errors = self.errors
         
         try:
             # Read CSV file with UTF-8-BOM encoding to handle Excel exports
@@ -566,6 +801,7 @@ class CSVProcessor:
             delimiter = ';' if ';' in first_line else ','
             
             csv_reader = csv.DictReader(decoded_file, delimiter=delimiter)
+            self.report_progress('loading', 0, max(len(decoded_file) - 1, 0))
             
             print(f"\n{'='*60}")
             print(f"📊 PROCESSING MUNICIPALITY CHARACTERISTICS CSV")
@@ -578,6 +814,7 @@ class CSVProcessor:
             csv_reader.fieldnames = [name.strip() if name else name for name in csv_reader.fieldnames]
             
             for row_num, row in enumerate(csv_reader, start=2):
+                self.report_progress(processed=row_num - 2)
                 try:
                     # DEBUG: Print first row to see what's being read
                     if row_num == 2:
@@ -650,7 +887,7 @@ class CSVProcessor:
                         return Decimal(default)
                     
                     # Create municipality record
-                    MunicipalityCharacteristic.objects.create(
+                    self.save_record(MunicipalityCharacteristic(
                         dataset=dataset,
                         lgu_name=lgu_name,
                         correspondence_code=correspondence_code,
@@ -663,7 +900,7 @@ class CSVProcessor:
                         total_percentage=parse_float(['Total Percentage', 'Total', 'total_percentage']),
                         provincial_score=parse_float(['Provincial Score', 'provincial_score', 'DTI Score']),
                         poverty_incidence_rate=parse_float(['Poverty Incidence Rate', 'Poverty Rate', 'poverty_incidence'])
-                    )
+                    ))
                     
                     records_created += 1
                     
@@ -713,7 +950,7 @@ class CSVProcessor:
         from .models import BarangayCharacteristic
         
         records_created = 0
-        errors = []
+        errors = self.errors
         
         try:
             # Read CSV file with UTF-8-BOM encoding
@@ -724,6 +961,7 @@ class CSVProcessor:
             delimiter = ';' if ';' in first_line else ','
             
             csv_reader = csv.DictReader(decoded_file, delimiter=delimiter)
+            self.report_progress('loading', 0, max(len(decoded_file) - 1, 0))
             
             print(f"\n{'='*60}")
             print(f"🏘️ PROCESSING BARANGAY CHARACTERISTICS CSV")
@@ -736,6 +974,7 @@ class CSVProcessor:
             csv_reader.fieldnames = [name.strip() if name else name for name in csv_reader.fieldnames]
             
             for row_num, row in enumerate(csv_reader, start=2):
+                self.report_progress(processed=row_num - 2)
                 try:
                     # DEBUG: Print first row
                     if row_num == 2:
@@ -815,7 +1054,7 @@ class CSVProcessor:
                     ).strip()
                     
                     # Create barangay characteristic record
-                    BarangayCharacteristic.objects.create(
+                    self.save_record(BarangayCharacteristic(
                         dataset=dataset,
                         barangay_name=barangay_name,
                         barangay_code=barangay_code,
@@ -824,7 +1063,7 @@ class CSVProcessor:
                         urbanization=urbanization if urbanization else None,
                         cellular_signal=cellular_signal if cellular_signal else None,
                         public_street_sweeper=public_street_sweeper if public_street_sweeper else None
-                    )
+                    ))
                     
                     records_created += 1
                     
@@ -875,7 +1114,7 @@ class CSVProcessor:
         import decimal
         
         records_created = 0
-        errors = []
+        errors = self.errors
         
         try:
             # Read CSV file with UTF-8-BOM encoding
@@ -886,6 +1125,7 @@ class CSVProcessor:
             delimiter = ';' if ';' in first_line else ','
             
             csv_reader = csv.DictReader(decoded_file, delimiter=delimiter)
+            self.report_progress('loading', 0, max(len(decoded_file) - 1, 0))
             
             print(f"\n{'='*60}")
             print(f"💰 PROCESSING ZONAL VALUES CSV")
@@ -898,6 +1138,7 @@ class CSVProcessor:
             csv_reader.fieldnames = [name.strip() if name else name for name in csv_reader.fieldnames]
             
             for row_num, row in enumerate(csv_reader, start=2):
+                self.report_progress(processed=row_num - 2)
                 try:
                     # DEBUG: Print first row
                     if row_num == 2:
@@ -980,7 +1221,7 @@ class CSVProcessor:
                         continue
                     
                     # Create zonal value record
-                    ZonalValue.objects.create(
+                    self.save_record(ZonalValue(
                         dataset=dataset,
                         barangay_name=barangay_name,
                         barangay_code=barangay_code,
@@ -989,7 +1230,7 @@ class CSVProcessor:
                         vicinity=vicinity if vicinity else None,
                         land_class=land_class if land_class else None,
                         price_per_sqm=price_per_sqm
-                    )
+                    ))
                     
                     records_created += 1
                     
@@ -1048,20 +1289,47 @@ class CSVProcessor:
             )
             
             # Route to appropriate processor
+            from .models import BarangayCharacteristic, MunicipalityCharacteristic, ZonalValue
             if self.dataset_type == 'municipality_characteristics':
-                records_created = self.process_municipality_characteristics(dataset)
+                loader, model = self.process_municipality_characteristics, MunicipalityCharacteristic
             elif self.dataset_type == 'barangay_characteristics':
-                records_created = self.process_barangay_characteristics(dataset)
+                loader, model = self.process_barangay_characteristics, BarangayCharacteristic
             elif self.dataset_type == 'zonal_values':
-                records_created = self.process_zonal_values(dataset)
+                loader, model = self.process_zonal_values, ZonalValue
             else:
                 raise ValueError(f"Unsupported CSV dataset type: {self.dataset_type}")
             
+            upsert_stats = None
+            if self.upsert:
+                from .upsert import Upserter
+                self.upserter = Upserter(model, lambda batch, errors: self.insert_records(model, batch, errors))
+                with transaction.atomic():
+                    loader(dataset)
+                    upsert_stats = self.upserter.finish(self.errors)
+                records_created = upsert_stats['inserted'] + upsert_stats['updated']
+            else:
+                records_created = loader(dataset)
+            
+            # Tabular rows are written in place; publishing still bumps the data version caches key on
+            from .versioning import publish_dataset
+            version = publish_dataset(dataset)
+            
+            # Population feeds the exposed-population estimates, zonal values the valuation
+            self.report_progress('refreshing')
+            from .exposure import refresh_after_ingest
+            refresh_after_ingest(self.dataset_type)
+            
             return {
                 'success': True,
                 'dataset_id': dataset.id,
+                'data_version': version,
                 'records_created': records_created,
-                'message': f'✅ Successfully processed {records_created} records'
+                'error_count': len(self.errors),
+                'upsert': upsert_stats,
+                'message': (
+                    self.upserter.message() if upsert_stats else
+                    f'✅ Successfully processed {records_created} records'
+                )
             }
             
         except Exception as e:
@@ -1102,6 +1370,32 @@ def calculate_haversine_distance(lat1: float, lng1: float, lat2: float, lng2: fl
     return c * r
 
 
+# Facility groups used by the facility views and the suitability score
+# Evacuation sites combine government buildings and schools
+EVACUATION_TYPES = ['community_centre', 'townhall', 'public_building',
+                    'school', 'kindergarten', 'college', 'university']
+MEDICAL_TYPES = ['hospital', 'clinic', 'doctors']
+EMERGENCY_SERVICE_TYPES = ['fire_station', 'police']
+ESSENTIAL_TYPES = ['marketplace', 'supermarket', 'convenience', 'bank', 'fuel',
+                   'restaurant', 'fast_food', 'cafe', 'mall', 'atm',
+                   'department_store', 'pharmacy', 'post_office', 'ferry_terminal']
+
+FACILITY_GROUPS = {
+    'evacuation': EVACUATION_TYPES,
+    'medical': MEDICAL_TYPES,
+    'emergency_services': EMERGENCY_SERVICE_TYPES,
+    'essential': ESSENTIAL_TYPES,
+}
+
+
+def facility_group(facility_type: str) -> str:
+    """Return the facility group for an OSM facility type ('other' if unmapped)"""
+    for group, types in FACILITY_GROUPS.items():
+        if facility_type in types:
+            return group
+    return 'other'
+
+
 def format_duration(seconds: float) -> str:
     """Format duration for display"""
     minutes = seconds / 60
@@ -1112,4 +1406,13 @@ def format_duration(seconds: float) -> str:
     else:
         hours = int(minutes / 60)
         mins = int(minutes % 60)
-        return f"{hours}h {mins}min"
\ No newline at end of file
+        return f"{hours}h {mins}min"
+
+
+def format_distance(meters: float) -> str:
+    """Format distance for display"""
+    if meters < 1000:
+        return f"{int(meters)} m"
+    else:
+        km = meters / 1000
+        return f"{km:.1f} km"
@@ -0,0 +1,143 @@
+"""
+Per-barangay zonal value statistics and hazard value at risk.
+
+``refresh_barangay_valuation`` aggregates ZonalValue in PostGIS (GROUPING
+SETS give one row per land class plus an 'ALL' row per barangay) and joins
+the exposed area from BarangayHazardExposure, so views answer with a single
+indexed lookup instead of loading and summarising every zonal value row.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .exposure import DEFAULT_EXPOSED_LEVELS
+from .models import BarangayHazardExposure, BarangayValuation, ZonalValue
+
+ALL_CLASSES = 'ALL'
+UNCLASSIFIED = 'N/A'
+
+VALUATION_VERSION_KEY = 'barangay_valuation_version'
+
+EXPORT_FIELDS = [
+    'barangay_code', 'barangay_name', 'municipality', 'land_class', 'entry_count',
+    'avg_price', 'median_price', 'min_price', 'max_price', 'barangay_area_sqm',
+    'flood_exposed_pct', 'landslide_exposed_pct', 'liquefaction_exposed_pct',
+    'flood_value_at_risk', 'landslide_value_at_risk', 'liquefaction_value_at_risk',
+]
+
+
+def refresh_barangay_valuation():
+    """Rebuild the whole valuation table; returns the number of rows written"""
+    qn = connection.ops.quote_name
+    start = time.time()
+
+    exposed = []
+    columns = []
+    values = []
+    params = [ALL_CLASSES, UNCLASSIFIED]
+    for hazard_type, levels in DEFAULT_EXPOSED_LEVELS.items():
+        exposed.append(
+            f"SUM(area_sqm) FILTER (WHERE hazard_type = %s AND susceptibility = ANY(%s)) AS {hazard_type}"
+        )
+        params += [hazard_type, levels]
+        columns += [f"{hazard_type}_exposed_pct", f"{hazard_type}_value_at_risk"]
+        values += [
+            f"CASE WHEN e.area > 0 THEN 100 * COALESCE(e.{hazard_type}, 0) / e.area END",
+            f"s.avg_price * COALESCE(e.{hazard_type}, 0)",
+        ]
+    params.append(ALL_CLASSES)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        BarangayValuation.objects.all().delete()
+        cursor.execute(f"""
+            WITH stats AS (
+                SELECT barangay_code,
+                       MAX(barangay_name) AS barangay_name,
+                       MAX(municipality) AS municipality,
+                       CASE WHEN GROUPING(land_class) = 1 THEN %s ELSE COALESCE(land_class, %s) END AS land_class,
+                       COUNT(*) AS entry_count,
+                       AVG(price_per_sqm)::float AS avg_price,
+                       PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY price_per_sqm) AS median_price,
+                       MIN(price_per_sqm)::float AS min_price,
+                       MAX(price_per_sqm)::float AS max_price
+                FROM {qn(ZonalValue._meta.db_table)}
+                GROUP BY GROUPING SETS ((barangay_code, land_class), (barangay_code))
+            ),
+            exposure AS (
+                SELECT adm4_pcode, MAX(barangay_area_sqm) AS area, {', '.join(exposed)}
+                FROM {qn(BarangayHazardExposure._meta.db_table)}
+                GROUP BY adm4_pcode
+            )
+            INSERT INTO {qn(BarangayValuation._meta.db_table)}
+                (barangay_code, barangay_name, municipality, land_class, entry_count,
+                 avg_price, median_price, min_price, max_price,
+                 barangay_area_sqm, {', '.join(columns)}, refreshed_at)
+            SELECT s.barangay_code, s.barangay_name, s.municipality, s.land_class, s.entry_count,
+                   s.avg_price, s.median_price, s.min_price, s.max_price,
+                   e.area, {', '.join(values)}, NOW()
+            FROM stats s
+            LEFT JOIN exposure e ON e.adm4_pcode = s.barangay_code AND s.land_class = %s
+        """, params)
+        rows = cursor.rowcount
+
+    cache.set(VALUATION_VERSION_KEY, int(time.time()), None)
+    print(f"💰 Refreshed barangay valuation: {rows} rows ({time.time() - start:.1f}s)")
+    return rows
+
+
+def _price(value):
+    return {'value': round(value, 2), 'display': f"₱{value:,.2f}"}
+
+
+def barangay_valuation(barangay_code):
+    """Price statistics by land class and value at risk, or None if not computed"""
+    rows = list(BarangayValuation.objects.filter(barangay_code=barangay_code).values(*EXPORT_FIELDS, 'refreshed_at'))
+    summary = next((row for row in rows if row['land_class'] == ALL_CLASSES), None)
+    if summary is None:
+        return None
+
+    hazards = {}
+    for hazard_type in DEFAULT_EXPOSED_LEVELS:
+        pct = summary[f"{hazard_type}_exposed_pct"]
+        value_at_risk = summary[f"{hazard_type}_value_at_risk"]
+        hazards[hazard_type] = {
+            'levels': DEFAULT_EXPOSED_LEVELS[hazard_type],
+            'exposed_percentage': round(pct, 2) if pct is not None else None,
+            'value_at_risk': _price(value_at_risk) if value_at_risk is not None else None,
+        }
+
+    return {
+        'barangay_name': summary['barangay_name'],
+        'barangay_code': barangay_code,
+        'municipality': summary['municipality'],
+        'entry_count': summary['entry_count'],
+        'average_price': _price(summary['avg_price']),
+        'median_price': _price(summary['median_price']),
+        'min_price': _price(summary['min_price']),
+        'max_price': _price(summary['max_price']),
+        'land_classes': [
+            {
+                'land_class': row['land_class'],
+                'entry_count': row['entry_count'],
+                'average_price': round(row['avg_price'], 2),
+                'median_price': round(row['median_price'], 2),
+                'min_price': round(row['min_price'], 2),
+                'max_price': round(row['max_price'], 2),
+            }
+            for row in rows if row['land_class'] != ALL_CLASSES
+        ],
+        'area_sqm': round(summary['barangay_area_sqm'], 1) if summary['barangay_area_sqm'] is not None else None,
+        'hazards': hazards,
+        # Average price over the exposed area; zonal values are not area-weighted
+        'value_at_risk_method': 'average price per sqm x area in exposed hazard classes',
+        'refreshed_at': summary['refreshed_at'],
+    }
+
+
+def valuation_rows(all_classes_only=False):
+    """Rows of the province-wide export, as tuples in EXPORT_FIELDS order"""
+    queryset = BarangayValuation.objects.all()
+    if all_classes_only:
+        queryset = queryset.filter(land_class=ALL_CLASSES)
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
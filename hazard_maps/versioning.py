@@ -0,0 +1,172 @@
+"""
+Versioned hazard and boundary layers.
+
+An upload is loaded as a *staging* dataset whose rows have ``active=False``:
+the partial GiST indexes and every read path only see active rows, so
+readers keep using the current version while the new one is loaded,
+validated and subdivided. ``activate_dataset`` then swaps the two versions
+in one transaction and publishes a new data version number, which caches
+key on through ``data_version()``. The version it replaced is kept
+(retired) so it can be restored with ``rollback_layer``; older ones are
+deleted. An upsert takes over the rows it left unchanged
+(``absorb_layer``), so each version is always one dataset.
+"""
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import BarangayBoundaryNew, HazardDataset, HazardDatasetDiff, IngestJob, SubdividedHazard
+from .subdivided import HAZARD_SOURCES
+
+# Retired versions kept per layer for rollback
+RETAINED_VERSIONS = 1
+
+# Serialises activations so version numbers are handed out in order
+_ACTIVATION_LOCK_ID = 0x48415a44
+
+# Datasets from before versioning have no activation time
+NEWEST_FIRST = (F('activated_at').desc(nulls_last=True), '-id')
+
+
+def layer_models(dataset_type):
+    """Tables holding the rows of one version of a layer; empty if the layer is not versioned"""
+    if dataset_type in HAZARD_SOURCES:
+        return [HAZARD_SOURCES[dataset_type][0], SubdividedHazard]
+    if dataset_type == 'barangay':
+        return [BarangayBoundaryNew]
+    return []
+
+
+def data_version():
+    """Latest published data version (0 before the first activation)"""
+    return HazardDataset.objects.aggregate(version=Max('version'))['version'] or 0
+
+
+def _publish(dataset):
+    """Mark a dataset active under the next data version; call with the activation lock held"""
+    dataset.status = 'active'
+    dataset.version = data_version() + 1
+    dataset.activated_at = timezone.now()
+    dataset.save(update_fields=['status', 'version', 'activated_at'])
+    return dataset.version
+
+
+def _lock():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [_ACTIVATION_LOCK_ID])
+
+
+def _swap(dataset_type, retire, activate):
+    """Flip the rows of the ``retire`` datasets off and those of ``activate`` on"""
+    for model in layer_models(dataset_type):
+        model.objects.filter(dataset__in=retire, active=True).update(active=False)
+        model.objects.filter(dataset__in=activate, active=False).update(active=True)
+    HazardDataset.objects.filter(pk__in=[d.pk for d in retire]).update(status='retired')
+
+
+def _prune(dataset_type, scope):
+    expired = list(
+        HazardDataset.objects.filter(dataset_type=dataset_type, scope=scope, status='retired')
+        .order_by(*NEWEST_FIRST).values_list('pk', flat=True)[RETAINED_VERSIONS:]
+    )
+    if expired:
+        HazardDataset.objects.filter(pk__in=expired).delete()
+    return len(expired)
+
+
+def publish_dataset(dataset):
+    """
+    Publish a dataset that was written in place (tabular data, upserts)
+    without retiring anything; returns the new data version
+    """
+    with transaction.atomic():
+        _lock()
+        version = _publish(dataset)
+    print(f"🏷️ Published {dataset.dataset_type} dataset #{dataset.id} as data version {version}")
+    return version
+
+
+def absorb_layer(dataset):
+    """
+    Move the rows an upsert left unchanged onto the upsert's dataset and
+    delete the emptied datasets they came from, so the live layer stays a
+    single dataset that is retired, pruned and rolled back as a whole.
+    Stored diffs and jobs of the absorbed datasets are repointed first, so
+    the delete does not cascade to them. Returns the number absorbed.
+    """
+    models = layer_models(dataset.dataset_type)
+    if not models:
+        return 0
+
+    previous = list(
+        HazardDataset.objects.filter(dataset_type=dataset.dataset_type, scope=dataset.scope, status='active')
+        .exclude(pk=dataset.pk).values_list('pk', flat=True)
+    )
+    if previous:
+        for model in models:
+            model.objects.filter(dataset__in=previous).update(dataset=dataset)
+        HazardDatasetDiff.objects.filter(old_dataset__in=previous).update(old_dataset=dataset)
+        HazardDatasetDiff.objects.filter(new_dataset__in=previous).update(new_dataset=dataset)
+        IngestJob.objects.filter(dataset__in=previous).update(dataset=dataset)
+        HazardDataset.objects.filter(pk__in=previous).delete()
+    return len(previous)
+
+
+def activate_dataset(dataset):
+    """
+    Atomically replace the active version of the dataset's layer (within
+    its scope) with this staged dataset; returns the new data version
+    """
+    with transaction.atomic():
+        _lock()
+        previous = list(
+            HazardDataset.objects.filter(dataset_type=dataset.dataset_type, scope=dataset.scope, status='active')
+            .exclude(pk=dataset.pk).order_by(*NEWEST_FIRST)
+        )
+        # Layers split across datasets by upserts from before absorb_layer are retired as one
+        if len(previous) > 1:
+            absorb_layer(previous[0])
+            previous = previous[:1]
+        _swap(dataset.dataset_type, previous, [dataset])
+        version = _publish(dataset)
+        pruned = _prune(dataset.dataset_type, dataset.scope)
+
+    for model in layer_models(dataset.dataset_type):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    print(
+        f"🏷️ Activated {dataset.dataset_type} dataset #{dataset.id} as data version {version} "
+        f"(retired {len(previous)}, pruned {pruned})"
+    )
+    return version
+
+
+def discard_staging(dataset):
+    """Drop a staged dataset that failed to load or validate (an upsert's rolled back publish included)"""
+    if HazardDataset.objects.filter(pk=dataset.pk, status='staging').delete()[0]:
+        print(f"🗑️ Discarded staged {dataset.dataset_type} dataset")
+
+
+def rollback_layer(dataset_type, scope=''):
+    """
+    Reactivate the most recent retired version of a layer in place of the
+    active one; returns the restored dataset
+    """
+    if not layer_models(dataset_type):
+        raise ValueError(f"{dataset_type} is not a versioned layer")
+
+    with transaction.atomic():
+        _lock()
+        current = list(HazardDataset.objects.filter(dataset_type=dataset_type, scope=scope, status='active'))
+        restored = (
+            HazardDataset.objects.filter(dataset_type=dataset_type, scope=scope, status='retired')
+            .order_by(*NEWEST_FIRST).first()
+        )
+        if restored is None:
+            raise ValueError(f"No retired {dataset_type} version to roll back to")
+        _swap(dataset_type, current, [restored])
+        version = _publish(restored)
+
+    print(f"↩️ Rolled {dataset_type} back to dataset #{restored.id} as data version {version}")
+    return restored
@@ -6,8 +6,6 @@ from rest_framework.response import Response
 from django.contrib.gis.geos import Point
 from django.core.cache import cache
 from .models import HazardDataset, FloodSusceptibility, LandslideSusceptibility, LiquefactionSusceptibility, BarangayBoundaryNew
-from .utils import ShapefileProcessor
-from .utils import calculate_haversine_distance
 from .overpass_client import OverpassClient
 from math import radians, cos, sin, asin, sqrt
 import json
@@ -19,7 +17,7 @@ def index(request):
 @csrf_exempt
 @api_view(['POST'])
 def upload_shapefile(request):
-    """Handle shapefile/CSV upload and processing"""
+    """Queue a shapefile/CSV upload; returns the ingest job to poll"""
     if request.method == 'POST':
         if 'shapefile' not in request.FILES:
             return JsonResponse({'error': 'No file provided'}, status=400)
@@ -49,27 +47,35 @@ def upload_shapefile(request):
                 return JsonResponse({
                     'error': 'Please upload a .csv file for this dataset type'
                 }, status=400)
-            
-            # Use CSV processor
-            from .utils import CSVProcessor
-            processor = CSVProcessor(uploaded_file, dataset_type)
         
         # Shapefile datasets - require .zip files
-        else:
-            if not file_name.endswith('.zip'):
-                return JsonResponse({
-                    'error': 'Please upload a .zip file containing shapefile data'
-                }, status=400)
-            
-            # Use Shapefile processor
-            processor = ShapefileProcessor(uploaded_file, dataset_type)
+        elif not file_name.endswith('.zip'):
+            return JsonResponse({
+                'error': 'Please upload a .zip file containing shapefile data'
+            }, status=400)
         
-        result = processor.process()
+        # Processing runs in the ingest worker; poll the job for progress
+        from django.conf import settings
+        from .jobs import enqueue_upload, start_worker_thread
         
-        if result['success']:
-            return JsonResponse(result)
-        else:
-            return JsonResponse({'error': result['error']}, status=500)
+        # mode=upsert updates the stored layer in place instead of appending a new copy
+        upsert = request.POST.get('mode') == 'upsert'
+        
+        # Province kept from a national barangay GDB (ADM2_EN); blank keeps the default
+        province = request.POST.get('province', '').strip()
+        if len(province) > 100:
+            return JsonResponse({'error': 'Province name is too long'}, status=400)
+        
+        job = enqueue_upload(uploaded_file, dataset_type, upsert=upsert, province=province)
+        if settings.INGEST_THREAD_WORKER:
+            start_worker_thread()
+        
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}/',
+        }, status=202)
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
@@ -78,7 +84,7 @@ def get_flood_data(request):
     """Get flood susceptibility data as GeoJSON"""
     try:
         flood_features = []
-        flood_records = FloodSusceptibility.objects.all()
+        flood_records = FloodSusceptibility.objects.active()
         
         for record in flood_records:
             feature = {
@@ -108,7 +114,7 @@ def get_landslide_data(request):
     """Get landslide susceptibility data as GeoJSON"""
     try:
         landslide_features = []
-        landslide_records = LandslideSusceptibility.objects.all()
+        landslide_records = LandslideSusceptibility.objects.active()
         
         for record in landslide_records:
             feature = {
@@ -138,7 +144,7 @@ def get_liquefaction_data(request):
     """Get liquefaction susceptibility data as GeoJSON"""
     try:
         liquefaction_features = []
-        liquefaction_records = LiquefactionSusceptibility.objects.all()
+        liquefaction_records = LiquefactionSusceptibility.objects.active()
         
         for record in liquefaction_records:
             feature = {
@@ -171,15 +177,15 @@ def get_location_hazards(request):
         
         point = Point(lng, lat, srid=4326)
         
-        flood_result = FloodSusceptibility.objects.filter(
+        flood_result = FloodSusceptibility.objects.active().filter(
             geometry__contains=point
         ).first()
         
-        landslide_result = LandslideSusceptibility.objects.filter(
+        landslide_result = LandslideSusceptibility.objects.active().filter(
             geometry__contains=point
         ).first()
         
-        liquefaction_result = LiquefactionSusceptibility.objects.filter(
+        liquefaction_result = LiquefactionSusceptibility.objects.active().filter(
             geometry__contains=point
         ).first()
         
@@ -197,82 +203,29 @@ def get_location_hazards(request):
             cache_key = f"facilities_{round(lat, 4)}_{round(lng, 4)}"
             from django.core.cache import cache
             
-            nearby_facilities = cache.get(cache_key)
+            # Precomputed rasters answer without any network access
+            from .accessibility import get_accessibility_rasters
+            rasters = get_accessibility_rasters()
+            nearby_facilities = rasters.nearby_facilities(lat, lng) if rasters else None
+            
+            if nearby_facilities is None:
+                nearby_facilities = cache.get(cache_key)
             
             if nearby_facilities is None:
                 # If not cached, query facilities directly
                 from .overpass_client import OverpassClient
-                from .utils import calculate_haversine_distance
+                from .facility_engine import FacilityEngine, facility_summary
                 
                 facilities = OverpassClient.query_facilities(lat, lng, radius=3000)
                 
-                # Calculate distances
-                for facility in facilities:
-                    distance_meters = calculate_haversine_distance(
-                        lat, lng, facility['lat'], facility['lng']
-                    )
-                    facility['distance_meters'] = distance_meters
-                    facility['distance_km'] = round(distance_meters / 1000, 2)
-                
-                # Sort by distance
-                facilities.sort(key=lambda x: x.get('distance_meters', 999999))
-                
-                # Categorize facilities
-                evacuation_centers = []
-                medical = []
-                emergency_services = []
-                essential_services = []
-                
-                for f in facilities:
-                    ftype = f.get('facility_type', '')
-                    
-                    if ftype in ['community_centre', 'townhall', 'public_building', 
-                                'school', 'kindergarten', 'college', 'university']:
-                        evacuation_centers.append(f)
-                    elif ftype in ['hospital', 'clinic', 'doctors']:
-                        medical.append(f)
-                    elif ftype in ['fire_station', 'police']:
-                        emergency_services.append(f)
-                    elif ftype in ['marketplace', 'supermarket', 'convenience', 'bank', 'fuel', 
-                                'restaurant', 'fast_food', 'cafe', 'mall', 'atm', 
-                                'department_store', 'pharmacy', 'post_office', 'ferry_terminal']:
-                        essential_services.append(f)
-                
-                # Find nearest facilities
-                nearest_evacuation = evacuation_centers[0] if evacuation_centers else None
-                nearest_hospital = medical[0] if medical else None
-                nearest_fire = next((f for f in emergency_services if f.get('facility_type') == 'fire_station'), None)
-                
-                def build_facility_summary(facility):
-                    if not facility:
-                        return None
-                    return {
-                        'name': facility.get('name', 'Unknown'),
-                        'distance': f"{facility.get('distance_km', 0)} km",
-                        'distance_meters': facility.get('distance_meters', 999999),
-                        'duration': 'N/A',
-                        'is_walkable': facility.get('distance_meters', 999999) <= 500,
-                    }
-                
-                nearby_facilities = {
-                    'summary': {
-                        'nearest_evacuation': build_facility_summary(nearest_evacuation),
-                        'nearest_hospital': build_facility_summary(nearest_hospital),
-                        'nearest_fire_station': build_facility_summary(nearest_fire),
-                    },
-                    'counts': {
-                        'evacuation': len(evacuation_centers),
-                        'medical': len(medical),
-                        'emergency_services': len(emergency_services),
-                        'essential': len(essential_services),
-                        'total': len(facilities)
-                    }
-                }
+                # Only distances and groups feed the score, so skip travel times
+                categorized = FacilityEngine(facilities).categorize(lat, lng, travel_times=False)
+                nearby_facilities = facility_summary(categorized)
                 
                 cache.set(cache_key, nearby_facilities, 300)  # Cache for 5 minutes
                 print(f"✅ Cached facility data for suitability calculation")
             else:
-                print(f"✅ Using cached facility data")
+                print(f"✅ Using {nearby_facilities.get('source', 'cached')} facility data")
                 
         except Exception as e:
             print(f"Error getting facilities for suitability: {e}")
@@ -356,97 +309,10 @@ def get_nearby_facilities(request):
                 }
             })
         
-        # Calculate straight-line distances (fast and reliable)
-        from .utils import calculate_haversine_distance
-        for facility in facilities:
-            distance_meters = calculate_haversine_distance(
-                lat, lng,
-                facility['lat'], facility['lng']
-            )
-            
-            facility['distance_meters'] = distance_meters
-            facility['distance_km'] = round(distance_meters / 1000, 2)
-            facility['distance_display'] = format_distance(distance_meters)
-            facility['is_walkable'] = distance_meters <= 500
-            
-            # Estimate travel time (assuming 40 km/h average speed)
-            duration_minutes = (distance_meters / 1000) / 40 * 60
-            facility['duration_minutes'] = round(duration_minutes, 1)
-            facility['duration_display'] = format_duration(duration_minutes * 60)
-            facility['method'] = 'straight_line'
-        
-        # Sort by distance
-        facilities.sort(key=lambda x: x.get('distance_meters', 999999))
-        
-        # ✅ CATEGORIZATION - Combine government buildings AND schools as evacuation centers
-        evacuation_centers = []  # Government buildings + Schools
-        medical = []
-        emergency_services = []
-        essential_services = []
-        other_facilities = []
-
-        for f in facilities:
-            ftype = f.get('facility_type', '')
-            
-            # EVACUATION CENTERS: Government buildings + Schools (combined)
-            if ftype in ['community_centre', 'townhall', 'public_building', 
-                        'school', 'kindergarten', 'college', 'university']:
-                f['subcategory'] = 'evacuation'  # Mark for later separation
-                evacuation_centers.append(f)
-            
-            # MEDICAL: Only hospitals and clinics (NOT pharmacies)
-            elif ftype in ['hospital', 'clinic', 'doctors']:
-                medical.append(f)
-            
-            # EMERGENCY: Fire and police only
-            elif ftype in ['fire_station', 'police']:
-                emergency_services.append(f)
-            
-            # ESSENTIAL: Everything else including pharmacies, restaurants, etc.
-            elif ftype in ['marketplace', 'supermarket', 'convenience', 'bank', 'fuel', 
-                        'restaurant', 'fast_food', 'cafe', 'mall', 'atm', 
-                        'department_store', 'pharmacy', 'post_office', 'ferry_terminal']:
-                essential_services.append(f)
-            
-            else:
-                other_facilities.append(f)
-
-        # ✅ FIXED: Find nearest evacuation center (no separate schools variable)
-        nearest_evacuation = evacuation_centers[0] if evacuation_centers else None
-        nearest_hospital = medical[0] if medical else None
-        nearest_fire = next((f for f in emergency_services if f.get('facility_type') == 'fire_station'), None)
-        
-        def build_facility_summary(facility):
-            if not facility:
-                return None
-            return {
-                'name': facility.get('name', 'Unknown'),
-                'distance': facility.get('distance_display', 'N/A'),
-                'distance_meters': facility.get('distance_meters', 999999),
-                'duration': facility.get('duration_display', 'N/A'),
-                'is_walkable': facility.get('is_walkable', False),
-            }
-
-        result = {
-            'summary': {
-                'nearest_evacuation': build_facility_summary(nearest_evacuation),
-                'nearest_hospital': build_facility_summary(nearest_hospital),
-                'nearest_fire_station': build_facility_summary(nearest_fire),
-            },
-            'evacuation_centers': evacuation_centers[:50],
-            'medical': medical[:50],
-            'emergency_services': emergency_services[:50],
-            'essential_services': essential_services[:50],
-            'other': other_facilities[:10],
-            'counts': {
-                'evacuation': len(evacuation_centers),  # Total evacuation sites (gov't + schools)
-                'medical': len(medical),
-                'emergency_services': len(emergency_services),
-                'essential': len(essential_services),
-                'other': len(other_facilities),
-                'total': len(facilities)
-            }
-        }
+        # Distances, travel times and grouping in one vectorized pass
+        from .facility_engine import FacilityEngine, nearby_facilities_response
+        categorized = FacilityEngine(facilities).categorize(lat, lng)
+        result = nearby_facilities_response(categorized)
                 
         # ✅ CACHE THE RESULT for 5 minutes
         cache.set(cache_key + "_full", result, 300)
@@ -1131,7 +997,8 @@ def get_datasets(request):
     """Get list of uploaded datasets"""
     try:
         datasets = HazardDataset.objects.all().values(
-            'id', 'name', 'dataset_type', 'upload_date', 'file_name'
+            'id', 'name', 'dataset_type', 'upload_date', 'file_name',
+            'status', 'scope', 'version', 'activated_at',
         )
         return Response(list(datasets))
     
@@ -1158,26 +1025,6 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return c * r
 
 
-def format_distance(meters):
-    """Format distance for display"""
-    if meters < 1000:
-        return f"{int(meters)} m"
-    else:
-        km = meters / 1000
-        return f"{km:.1f} km"
-
-def format_duration(seconds):
-    """Format duration for display"""
-    minutes = seconds / 60
-    if minutes < 1:
-        return "< 1 min"
-    elif minutes < 60:
-        return f"{int(minutes)} min"
-    else:
-        hours = int(minutes / 60)
-        mins = int(minutes % 60)
-        return f"{hours}h {mins}min"
-
 @api_view(['GET'])
 def get_location_info(request):
     """Get administrative boundary info for a location"""
@@ -1201,7 +1048,7 @@ def get_barangay_data(request):
         barangay_features = []
         
         # Use the NEW barangay model
-        barangay_records = BarangayBoundaryNew.objects.all()
+        barangay_records = BarangayBoundaryNew.objects.active()
         
         for record in barangay_records:
             feature = {
@@ -1244,7 +1091,7 @@ def get_barangay_from_point(request):
         point = Point(lng, lat, srid=4326)
         
         # Find which barangay boundary contains this point
-        barangay = BarangayBoundaryNew.objects.filter(
+        barangay = BarangayBoundaryNew.objects.active().filter(
             geometry__contains=point
         ).first()
         
@@ -1397,121 +1244,18 @@ def get_categorized_facilities(lat, lng, radius=3000):
     - Seaport
     - Post Office
     """
-    from .overpass_client import OverpassClient    
+    from .overpass_client import OverpassClient
+    from .facility_engine import FacilityEngine, barangay_facility_categories
+    
     # Query facilities
     facilities = OverpassClient.query_facilities(lat, lng, radius)
     
     if not facilities:
         return {}
     
-    # Calculate straight-line distances (fast and reliable)
-    from .utils import calculate_haversine_distance
-    for facility in facilities:
-        distance_meters = calculate_haversine_distance(
-            lat, lng,
-            facility['lat'], facility['lng']
-        )
-        
-        facility['distance_meters'] = distance_meters
-        facility['distance_km'] = round(distance_meters / 1000, 2)
-        facility['distance_display'] = format_distance(distance_meters)
-        facility['is_walkable'] = distance_meters <= 500
-        
-        # Estimate travel time (assuming 40 km/h average speed)
-        duration_minutes = (distance_meters / 1000) / 40 * 60
-        facility['duration_minutes'] = round(duration_minutes, 1)
-        facility['duration_display'] = format_duration(duration_minutes * 60)
-        facility['method'] = 'straight_line'
-
-    # Categorize facilities
-    categorized = {
-        'education_elementary': [],
-        'education_highschool': [],
-        'education_college': [],
-        'hospital': [],
-        'health_center': [],
-        'fire_station': [],
-        'seaport': [],
-        'post_office': [],
-    }
-    
-    for facility in facilities:
-        ftype = facility.get('facility_type', '')
-        name = facility.get('name', 'Unnamed')
-        distance = facility.get('distance_meters', 999999)
-        distance_display = facility.get('distance_display', 'N/A')
-        
-        # Only include facilities within 3km
-        if distance > 3000:
-            continue
-        
-        facility_info = {
-            'name': name,
-            'distance': distance_display,
-            'distance_meters': distance,
-        }
-        
-        # Education - Elementary
-        if ftype in ['school', 'kindergarten']:
-            # Check if it's specifically elementary or assume elementary for generic "school"
-            if 'elementary' in name.lower() or 'elem' in name.lower() or ftype == 'kindergarten':
-                categorized['education_elementary'].append(facility_info)
-            elif 'high' in name.lower() or 'secondary' in name.lower():
-                categorized['education_highschool'].append(facility_info)
-            elif 'college' in name.lower() or 'university' in name.lower():
-                categorized['education_college'].append(facility_info)
-            else:
-                # Default to elementary for generic schools
-                categorized['education_elementary'].append(facility_info)
-        
-        # Education - High School
-        elif ftype == 'school' and ('high' in name.lower() or 'secondary' in name.lower()):
-            categorized['education_highschool'].append(facility_info)
-        
-        # Education - College/University
-        elif ftype in ['college', 'university']:
-            categorized['education_college'].append(facility_info)
-        
-        # Hospital
-        elif ftype == 'hospital':
-            categorized['hospital'].append(facility_info)
-        
-        # Health Center/Clinic
-        elif ftype in ['clinic', 'doctors']:
-            categorized['health_center'].append(facility_info)
-        
-        # Fire Station
-        elif ftype == 'fire_station':
-            categorized['fire_station'].append(facility_info)
-        
-        # Seaport (we need to query this separately via Overpass)
-        elif ftype in ['ferry_terminal', 'port']:
-            categorized['seaport'].append(facility_info)
-        
-        # Post Office
-        elif ftype == 'post_office':
-            categorized['post_office'].append(facility_info)
-    
-    # Sort each category by distance
-    for category in categorized:
-        categorized[category].sort(key=lambda x: x['distance_meters'])
-    
-    # Count facilities in each category
-    counts = {
-        'education_elementary': len(categorized['education_elementary']),
-        'education_highschool': len(categorized['education_highschool']),
-        'education_college': len(categorized['education_college']),
-        'hospital': len(categorized['hospital']),
-        'health_center': len(categorized['health_center']),
-        'fire_station': len(categorized['fire_station']),
-        'seaport': len(categorized['seaport']),
-        'post_office': len(categorized['post_office']),
-    }
-    
-    return {
-        'facilities': categorized,
-        'counts': counts
-    }
+    # Only include facilities within the radius, nearest first
+    categorized = FacilityEngine(facilities).categorize(lat, lng, radius=radius)
+    return barangay_facility_categories(categorized)
 
 
 @api_view(['GET'])
@@ -1528,39 +1272,40 @@ def get_zonal_values(request):
         
         from .models import ZonalValue
         
-        # Find all zonal values for this barangay
-        zonal_values = ZonalValue.objects.filter(
+        # Find all zonal values for this barangay (one query)
+        zonal_values = list(ZonalValue.objects.filter(
             barangay_code=barangay_code
-        ).order_by('street', 'vicinity')
+        ).order_by('street', 'vicinity').values(
+            'barangay_name', 'municipality', 'street', 'vicinity', 'land_class', 'price_per_sqm'
+        ))
         
-        if not zonal_values.exists():
+        if not zonal_values:
             return Response({
                 'found': False,
                 'message': 'No zonal value data available for this barangay'
             })
         
-        # Calculate statistics
-        prices = [float(zv.price_per_sqm) for zv in zonal_values]
-        avg_price = sum(prices) / len(prices)
-        min_price = min(prices)
-        max_price = max(prices)
+        # Statistics from the rows just fetched, so they always match the list
+        prices = [float(zv['price_per_sqm']) for zv in zonal_values]
+        avg_price, min_price, max_price = sum(prices) / len(prices), min(prices), max(prices)
         
         # Build zonal value list
         values_list = []
         for zv in zonal_values:
+            price = float(zv['price_per_sqm'])
             values_list.append({
-                'street': zv.street or 'General',
-                'vicinity': zv.vicinity or '',
-                'land_class': zv.land_class or 'N/A',
-                'price_per_sqm': float(zv.price_per_sqm),
-                'price_display': zv.get_price_display(),
-                'price_formatted': zv.get_price_per_sqm_formatted(),
+                'street': zv['street'] or 'General',
+                'vicinity': zv['vicinity'] or '',
+                'land_class': zv['land_class'] or 'N/A',
+                'price_per_sqm': price,
+                'price_display': f"₱{price:,.2f}",
+                'price_formatted': f"₱{price:,.2f}/m²",
             })
         
         return Response({
             'found': True,
-            'barangay_name': zonal_values.first().barangay_name,
-            'municipality': zonal_values.first().municipality,
+            'barangay_name': zonal_values[0]['barangay_name'],
+            'municipality': zonal_values[0]['municipality'],
             'zonal_values': values_list,
             'statistics': {
                 'count': len(values_list),
@@ -1574,4 +1319,780 @@ def get_zonal_values(request):
         })
         
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def get_isochrones(request):
+    """
+    Travel-time isochrones from a point or a stored facility
+    
+    Query params:
+    - lat, lng OR facility_id (Facility primary key)
+    - minutes: comma-separated time bands (default 5,10,15)
+    - mode: drive (default) or walk
+    """
+    try:
+        from .routing import MODES, compute_isochrones, get_road_graph, road_graph_version
+        
+        graph = get_road_graph()
+        if graph is None:
+            return Response({
+                'error': 'Road network not available. Run "python manage.py build_road_graph" first.'
+            }, status=503)
+        
+        facility_id = request.GET.get('facility_id')
+        if facility_id:
+            from .models import Facility
+            facility = Facility.objects.filter(pk=int(facility_id)).first()
+            if not facility:
+                return Response({'error': 'Facility not found'}, status=404)
+            lat, lng = facility.location.y, facility.location.x
+        else:
+            lat = float(request.GET.get('lat'))
+            lng = float(request.GET.get('lng'))
+        
+        mode = request.GET.get('mode', 'drive')
+        if mode not in MODES:
+            return Response({'error': f'Invalid mode. Must be one of: {list(MODES)}'}, status=400)
+        
+        bands = sorted({int(m) for m in request.GET.get('minutes', '5,10,15').split(',') if m.strip()})
+        if not bands or len(bands) > 6 or bands[0] < 1 or bands[-1] > 60:
+            return Response({'error': 'Provide 1-6 time bands between 1 and 60 minutes'}, status=400)
+        
+        # Cache each band separately so overlapping requests reuse work
+        version = road_graph_version()
+        keys = {
+            band: f"isochrone_{version}_{mode}_{round(lat, 4)}_{round(lng, 4)}_{band}"
+            for band in bands
+        }
+        cached = cache.get_many(list(keys.values()))
+        features = {band: cached[key] for band, key in keys.items() if key in cached}
+        
+        missing = [band for band in bands if band not in features]
+        if missing:
+            results = compute_isochrones(graph, lat, lng, missing, mode)
+            for band, result in results.items():
+                geometry = result['geometry']
+                features[band] = {
+                    'type': 'Feature',
+                    'properties': {
+                        'minutes': band,
+                        'mode': mode,
+                        'area_sqkm': result['area_sqkm'],
+                    },
+                    'geometry': json.loads(geometry.geojson) if geometry else None,
+                }
+            cache.set_many({keys[band]: features[band] for band in missing}, 60 * 60 * 24)
+        
+        return Response({
+            'type': 'FeatureCollection',
+            'origin': {'lat': lat, 'lng': lng},
+            'mode': mode,
+            'cached_bands': [band for band in bands if band not in missing],
+            # Largest band first so smaller bands draw on top
+            'features': [features[band] for band in reversed(bands)],
+        })
+    
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid coordinates, facility or time bands'}, status=400)
+    except Exception as e:
+        print(f"❌ Error in get_isochrones: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def get_suitability_heatmap(request):
+    """
+    Metadata for the province-wide suitability heatmap
+    
+    Query params (optional):
+    - lat, lng: also return the precomputed scores at that point
+    """
+    try:
+        from .suitability import SUITABILITY_CLASSES, load_heatmap_metadata, sample_heatmap
+        
+        metadata = load_heatmap_metadata()
+        if metadata is None:
+            return Response({
+                'error': 'Suitability heatmap not available. Run "python manage.py build_suitability_heatmap" first.'
+            }, status=503)
+        
+        result = {
+            'tile_url': '/api/suitability-tiles/{z}/{x}/{y}.png?v=' + str(metadata['version']),
+            'min_zoom': metadata['min_zoom'],
+            'max_zoom': metadata['zoom'],
+            'bounds': metadata['bounds'],
+            'cell_size_m': round(metadata['cell'], 1),
+            'category_cells': metadata['category_cells'],
+            'legend': [
+                {'category': category, 'min_score': min_score, 'color': '#%02x%02x%02x' % rgb}
+                for min_score, category, rgb in SUITABILITY_CLASSES
+            ],
+            'version': metadata['version'],
+        }
+        
+        if request.GET.get('lat') is not None and request.GET.get('lng') is not None:
+            lat = float(request.GET.get('lat'))
+            lng = float(request.GET.get('lng'))
+            scores = sample_heatmap(lat, lng)
+            result['point'] = {
+                'lat': lat,
+                'lng': lng,
+                'suitability': round(scores[0], 1) if scores else None,
+                'risk': round(scores[1], 1) if scores else None,
+            }
+        
+        return Response(result)
+    
+    except ValueError:
+        return Response({'error': 'Invalid coordinates'}, status=400)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+def get_suitability_tile(request, z, x, y):
+    """Serve one PNG tile of the suitability heatmap (204 where nothing was scored)"""
+    import os
+    from django.conf import settings
+    from django.http import FileResponse, HttpResponse
+    from .suitability import TILE_DIR
+    
+    path = os.path.join(str(settings.SUITABILITY_HEATMAP_DIR), TILE_DIR, str(z), str(x), f"{y}.png")
+    if not os.path.exists(path):
+        return HttpResponse(status=204)
+    
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+def parse_polygon(value):
+    """
+    GEOS polygon (SRID 4326) from a GeoJSON geometry or Feature, given as
+    a dict or string; None if it is not a valid Polygon/MultiPolygon
+    """
+    from django.contrib.gis.geos import GEOSException, GEOSGeometry
+    
+    try:
+        if isinstance(value, str):
+            value = json.loads(value)
+        if value.get('type') == 'Feature':
+            value = value.get('geometry') or {}
+        geometry = GEOSGeometry(json.dumps(value))
+    except (AttributeError, TypeError, ValueError, GEOSException):
+        return None
+    
+    if geometry.srid is None:
+        geometry.srid = 4326
+    if geometry.geom_type not in ('Polygon', 'MultiPolygon') or geometry.empty or not geometry.valid:
+        return None
+    return geometry
+
+
+@api_view(['GET', 'POST'])
+def get_top_sites(request):
+    """
+    K most suitable development sites in a municipality or polygon
+    
+    Params (query string or JSON body):
+    - adm3_pcode: municipality code, OR
+    - polygon: GeoJSON Polygon/MultiPolygon in WGS84
+    - k: number of sites (default 10, max 50)
+    - min_spacing: minimum distance between sites in metres (default 0)
+    - cell: grid cell size in metres (default 100)
+    """
+    try:
+        import hashlib
+        from django.contrib.gis.db.models import Union
+        from .accessibility import get_accessibility_rasters
+        from .facility_engine import get_local_engine
+        from .site_finder import DEFAULT_CELL_M, MAX_SITES, MIN_CELL_M, find_top_sites
+        
+        params = request.data if request.method == 'POST' else request.GET
+        adm3_pcode = params.get('adm3_pcode')
+        polygon = params.get('polygon')
+        k = int(params.get('k', 10))
+        min_spacing = float(params.get('min_spacing', 0))
+        cell = float(params.get('cell', DEFAULT_CELL_M))
+        
+        if not 1 <= k <= MAX_SITES:
+            return Response({'error': f'k must be between 1 and {MAX_SITES}'}, status=400)
+        if min_spacing < 0 or cell < MIN_CELL_M:
+            return Response({'error': f'min_spacing must be >= 0 and cell >= {MIN_CELL_M} m'}, status=400)
+        
+        if adm3_pcode:
+            area = BarangayBoundaryNew.objects.active().filter(adm3_pcode=adm3_pcode).aggregate(
+                area=Union('geometry')
+            )['area']
+            if area is None:
+                return Response({'error': 'Municipality not found'}, status=404)
+            area_key = adm3_pcode
+        elif polygon:
+            area = parse_polygon(polygon)
+            if area is None:
+                return Response({'error': 'polygon must be a valid GeoJSON Polygon or MultiPolygon'}, status=400)
+            area_key = hashlib.md5(area.wkb).hexdigest()
+        else:
+            return Response({'error': 'Provide adm3_pcode or polygon'}, status=400)
+        
+        rasters = get_accessibility_rasters()
+        if rasters is None and get_local_engine() is None:
+            return Response({
+                'error': 'Facility data not available. Run "python manage.py build_accessibility_rasters" first.'
+            }, status=503)
+        
+        from .versioning import data_version
+        cache_key = (
+            f"top_sites_{area_key}_{k}_{min_spacing}_{cell}_"
+            f"{rasters.version if rasters else 'table'}_{data_version()}"
+        )
+        result = cache.get(cache_key)
+        if result is None:
+            result = find_top_sites(area, k=k, min_spacing=min_spacing, cell=cell)
+            cache.set(cache_key, result, 60 * 60)
+        
+        return Response({
+            'adm3_pcode': adm3_pcode,
+            'k': k,
+            'min_spacing': min_spacing,
+            **result,
+        })
+    
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=400)
+    except Exception as e:
+        print(f"❌ Error in get_top_sites: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+def compare_sites(request):
+    """
+    Evaluate several candidate sites at once and rank them by suitability
+    
+    JSON body:
+    - sites: [{"lat": ..., "lng": ..., "label": "optional"}, ...] (max 20)
+    """
+    try:
+        from .site_comparison import MAX_SITES, compare_sites as run_comparison
+        
+        sites = request.data.get('sites')
+        if not isinstance(sites, list) or not sites:
+            return Response({'error': 'Provide a non-empty "sites" list'}, status=400)
+        if len(sites) > MAX_SITES:
+            return Response({'error': f'At most {MAX_SITES} sites can be compared at once'}, status=400)
+        
+        cleaned = []
+        for site in sites:
+            lat = float(site['lat'])
+            lng = float(site['lng'])
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+            cleaned.append({'lat': lat, 'lng': lng, 'label': str(site.get('label', ''))[:100]})
+        
+        return Response(run_comparison(cleaned))
+    
+    except (KeyError, TypeError, ValueError):
+        return Response({'error': 'Each site needs numeric lat and lng'}, status=400)
+    except Exception as e:
+        print(f"❌ Error in compare_sites: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+def assess_parcel(request):
+    """
+    Area of each susceptibility class inside a parcel polygon
+    
+    JSON body:
+    - polygon: GeoJSON Polygon/MultiPolygon (or Feature) in WGS84
+    """
+    try:
+        from .parcel import MAX_PARCEL_AREA_SQKM, assess_parcel as run_assessment, parcel_area_sqm
+        
+        parcel = parse_polygon(request.data.get('polygon'))
+        if parcel is None:
+            return Response({'error': 'polygon must be a valid GeoJSON Polygon or MultiPolygon'}, status=400)
+        
+        if parcel_area_sqm(parcel) > MAX_PARCEL_AREA_SQKM * 1_000_000:
+            return Response({'error': f'Parcels are limited to {MAX_PARCEL_AREA_SQKM} km²'}, status=400)
+        
+        return Response(run_assessment(parcel))
+    
+    except Exception as e:
+        print(f"❌ Error in assess_parcel: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
+
+
+def parse_lines(value):
+    """
+    (GEOS lines, names) from a GeoJSON LineString/MultiLineString, Feature
+    or FeatureCollection; names come from a feature's "name" property.
+    Returns None if anything is not a valid line.
+    """
+    from django.contrib.gis.geos import GEOSException, GEOSGeometry
+    
+    try:
+        if isinstance(value, (str, bytes)):
+            value = json.loads(value)
+        if value.get('type') == 'FeatureCollection':
+            features = value.get('features') or []
+        elif value.get('type') == 'Feature':
+            features = [value]
+        else:
+            features = [{'geometry': value}]
+        
+        lines, names = [], []
+        for feature in features:
+            line = GEOSGeometry(json.dumps(feature.get('geometry') or {}))
+            if line.geom_type not in ('LineString', 'MultiLineString') or line.empty:
+                return None
+            if line.srid is None:
+                line.srid = 4326
+            lines.append(line)
+            names.append((feature.get('properties') or {}).get('name'))
+    except (AttributeError, TypeError, ValueError, GEOSException):
+        return None
+    
+    return (lines, names) if lines else None
+
+
+@api_view(['POST'])
+def get_corridor_exposure(request):
+    """
+    Length of a proposed road/pipeline in each hazard class
+    
+    Body (JSON) or multipart upload:
+    - line: GeoJSON LineString/MultiLineString, Feature or FeatureCollection
+    - file: uploaded .geojson with many lines (instead of "line")
+    - segments: "false" to skip returning the intersecting segments
+    """
+    try:
+        from .corridor import MAX_LINES, MAX_TOTAL_LENGTH_KM, corridor_exposure, line_length_m
+        
+        if 'file' in request.FILES:
+            parsed = parse_lines(request.FILES['file'].read())
+        else:
+            parsed = parse_lines(request.data.get('line'))
+        
+        if parsed is None:
+            return Response({
+                'error': 'Provide a GeoJSON LineString/MultiLineString, Feature or FeatureCollection of lines'
+            }, status=400)
+        
+        lines, names = parsed
+        if len(lines) > MAX_LINES:
+            return Response({'error': f'At most {MAX_LINES} lines per request'}, status=400)
+        if sum(line_length_m(line) for line in lines) > MAX_TOTAL_LENGTH_KM * 1000:
+            return Response({'error': f'Total line length is limited to {MAX_TOTAL_LENGTH_KM} km'}, status=400)
+        
+        with_segments = str(request.data.get('segments', 'true')).lower() not in ('false', '0', 'no')
+        return Response(corridor_exposure(lines, names, with_segments=with_segments))
+    
+    except Exception as e:
+        print(f"❌ Error in get_corridor_exposure: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_barangay_exposure(request):
+    """
+    Precomputed hazard exposure of a barangay (or municipality roll-up)
+    
+    Query params:
+    - code: barangay adm4_pcode, OR
+    - municipality_code: adm3_pcode for the municipal roll-up
+    """
+    try:
+        from .exposure import barangay_exposure, municipality_exposure
+        
+        barangay_code = request.GET.get('code')
+        municipality_code = request.GET.get('municipality_code')
+        
+        if barangay_code:
+            result = barangay_exposure(barangay_code)
+        elif municipality_code:
+            result = municipality_exposure(municipality_code)
+        else:
+            return Response({'error': 'Barangay or municipality code not provided'}, status=400)
+        
+        if result is None:
+            return Response({
+                'found': False,
+                'message': 'No exposure statistics for this area. Run "python manage.py refresh_exposure".'
+            })
+        
+        return Response({'found': True, **result})
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_exposure_choropleth(request):
+    """
+    Choropleth values keyed by barangay_code (or municipality code)
+    
+    Query params:
+    - hazard: flood (default), landslide or liquefaction
+    - levels: comma-separated classes counted as exposed (default HS,VHS[,DF])
+    - unit: barangay (default) or municipality
+    - metric: percentage (default) or population
+    """
+    try:
+        from .exposure import EXPOSURE_VERSION_KEY, choropleth_values
+        from .subdivided import HAZARD_SOURCES
+        
+        hazard = request.GET.get('hazard', 'flood')
+        unit = request.GET.get('unit', 'barangay')
+        metric = request.GET.get('metric', 'percentage')
+        levels = [l.strip().upper() for l in request.GET.get('levels', '').split(',') if l.strip()]
+        
+        if hazard not in HAZARD_SOURCES:
+            return Response({'error': f'Invalid hazard. Must be one of: {list(HAZARD_SOURCES)}'}, status=400)
+        if unit not in ('barangay', 'municipality') or metric not in ('percentage', 'population'):
+            return Response({'error': 'unit must be barangay/municipality and metric percentage/population'}, status=400)
+        
+        version = cache.get(EXPOSURE_VERSION_KEY, 0)
+        cache_key = f"exposure_choropleth_{version}_{hazard}_{'-'.join(levels)}_{unit}_{metric}"
+        result = cache.get(cache_key)
+        if result is None:
+            result = choropleth_values(hazard, levels or None, unit, metric)
+            cache.set(cache_key, result, 60 * 10)
+        
+        return Response(result)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_facility_exposure(request):
+    """
+    Hospitals, schools, evacuation centres and fire/police stations with
+    their flood, landslide and liquefaction class, grouped by municipality
+    
+    Query params:
+    - municipality_code: only this adm3_pcode
+    - group: evacuation, medical or emergency_services
+    - high_only: true to list only facilities in high-hazard classes
+    """
+    try:
+        from .facility_exposure import CRITICAL_GROUPS, get_facility_exposure_report
+        
+        municipality_code = request.GET.get('municipality_code')
+        group = request.GET.get('group')
+        high_only = request.GET.get('high_only', 'false').lower() == 'true'
+        
+        if group and group not in CRITICAL_GROUPS:
+            return Response({'error': f'Invalid group. Must be one of: {CRITICAL_GROUPS}'}, status=400)
+        
+        report = get_facility_exposure_report()
+        if not (municipality_code or group or high_only):
+            return Response(report)
+        
+        municipalities = []
+        for municipality in report['municipalities']:
+            if municipality_code and municipality['code'] != municipality_code:
+                continue
+            facilities = [
+                f for f in municipality['facilities']
+                if (not group or f['group'] == group) and (not high_only or f['high_hazard'])
+            ]
+            if facilities:
+                municipalities.append({
+                    **municipality,
+                    'facility_count': len(facilities),
+                    'high_hazard_count': sum(f['high_hazard'] for f in facilities),
+                    'facilities': facilities,
+                })
+        
+        return Response({
+            **report,
+            'filters': {'municipality_code': municipality_code, 'group': group, 'high_only': high_only},
+            'municipalities': municipalities,
+        })
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_barangay_valuation(request):
+    """
+    Precomputed zonal value statistics by land class and hazard value at risk
+    
+    Query params:
+    - code: barangay adm4_pcode
+    """
+    try:
+        from .valuation import barangay_valuation
+        
+        barangay_code = request.GET.get('code')
+        if not barangay_code:
+            return Response({'error': 'Barangay code not provided'}, status=400)
+        
+        result = barangay_valuation(barangay_code)
+        if result is None:
+            return Response({
+                'found': False,
+                'message': 'No valuation summary for this barangay. Run "python manage.py refresh_exposure".'
+            })
+        
+        return Response({'found': True, **result})
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+def export_valuation(request):
+    """
+    Province-wide valuation summary as CSV, for analysts
+    
+    Query params:
+    - summary_only: true to export only the all-classes row of each barangay
+    """
+    import csv
+    from django.http import StreamingHttpResponse
+    from .valuation import EXPORT_FIELDS, valuation_rows
+    
+    class Echo:
+        def write(self, value):
+            return value
+    
+    summary_only = request.GET.get('summary_only', 'false').lower() == 'true'
+    writer = csv.writer(Echo())
+    
+    def stream():
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in valuation_rows(all_classes_only=summary_only):
+            yield writer.writerow(row)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="barangay_valuation.csv"'
+    return response
+
+
+@api_view(['POST'])
+def create_hazard_diff(request):
+    """
+    Start comparing two uploads of the same hazard layer in the background
+    
+    Body: {"old_dataset": id, "new_dataset": id}
+    Poll /api/hazard-diffs/<id>/ for progress and results.
+    """
+    try:
+        from .diff import diff_summary, start_diff
+        
+        try:
+            old_dataset = HazardDataset.objects.get(pk=int(request.data.get('old_dataset')))
+            new_dataset = HazardDataset.objects.get(pk=int(request.data.get('new_dataset')))
+        except (TypeError, ValueError):
+            return Response({'error': 'old_dataset and new_dataset ids are required'}, status=400)
+        except HazardDataset.DoesNotExist:
+            return Response({'error': 'Dataset not found'}, status=404)
+        
+        try:
+            diff = start_diff(old_dataset, new_dataset)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        return Response(diff_summary(diff), status=202)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_hazard_diff(request, diff_id):
+    """
+    Status of a hazard dataset diff and, once completed, its statistics
+    
+    Query params:
+    - barangay_code: only the changes in this barangay
+    """
+    try:
+        from .diff import diff_summary
+        from .models import HazardDatasetDiff
+        
+        diff = HazardDatasetDiff.objects.select_related('old_dataset', 'new_dataset').filter(pk=diff_id).first()
+        if diff is None:
+            return Response({'error': 'Diff not found'}, status=404)
+        
+        return Response(diff_summary(diff, request.GET.get('barangay_code')))
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_hazard_diff_changes(request, diff_id):
+    """
+    Changed areas of a completed diff as GeoJSON
+    
+    Query params:
+    - change_type: added, removed, upgraded or downgraded
+    - barangay_code: only this barangay
+    """
+    try:
+        from .models import HazardChange
+        
+        changes = HazardChange.objects.filter(diff_id=diff_id)
+        change_type = request.GET.get('change_type')
+        if change_type:
+            changes = changes.filter(change_type=change_type)
+        barangay_code = request.GET.get('barangay_code')
+        if barangay_code:
+            changes = changes.filter(adm4_pcode=barangay_code)
+        
+        features = []
+        for change in changes.iterator(chunk_size=500):
+            features.append({
+                'type': 'Feature',
+                'properties': {
+                    'change_type': change.change_type,
+                    'old_level': change.old_level,
+                    'new_level': change.new_level,
+                    'area_sqm': round(change.area_sqm, 1),
+                    'barangay': change.adm4_en,
+                    'barangay_code': change.adm4_pcode,
+                    'municipality': change.adm3_en,
+                },
+                'geometry': json.loads(change.geometry.geojson)
+            })
+        
+        return Response({
+            'type': 'FeatureCollection',
+            'features': features
+        })
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_evacuation_coverage(request):
+    """
+    Population served by each evacuation centre and uncovered population
+    per barangay (province-wide nearest-centre assignment)
+    
+    Query params:
+    - method: euclidean (default, straight-line Voronoi) or network (road travel time)
+    - mode: walk (default) or drive, for the network method
+    - unit: barangay (default, barangay interior points) or grid (populated cells)
+    - max_distance: covered within this many metres (euclidean, default 2000)
+    - max_minutes: covered within this many minutes (network, default 30)
+    - municipality_code: only list barangays and centres of this adm3_pcode
+    """
+    try:
+        from .evacuation_coverage import (
+            DEFAULT_MAX_DISTANCE_M, DEFAULT_MAX_MINUTES, METHODS, UNITS, evacuation_coverage,
+        )
+        from .facility_exposure import FACILITY_VERSION_KEY
+        from .routing import MODES, road_graph_version
+        from .versioning import data_version
+        
+        method = request.GET.get('method', 'euclidean')
+        mode = request.GET.get('mode', 'walk')
+        unit = request.GET.get('unit', 'barangay')
+        max_distance = float(request.GET.get('max_distance', DEFAULT_MAX_DISTANCE_M))
+        max_minutes = float(request.GET.get('max_minutes', DEFAULT_MAX_MINUTES))
+        municipality_code = request.GET.get('municipality_code')
+        
+        if method not in METHODS or unit not in UNITS or mode not in MODES:
+            return Response({
+                'error': f'method must be one of {list(METHODS)}, unit one of {list(UNITS)}, mode one of {list(MODES)}'
+            }, status=400)
+        
+        version = (
+            f"{data_version()}_{cache.get(FACILITY_VERSION_KEY, 0)}_"
+            f"{road_graph_version() if method == 'network' else ''}"
+        )
+        cache_key = f"evacuation_coverage_{version}_{method}_{mode}_{unit}_{max_distance}_{max_minutes}"
+        result = cache.get(cache_key)
+        if result is None:
+            try:
+                result = evacuation_coverage(method, mode, unit, max_distance, max_minutes)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=503)
+            cache.set(cache_key, result, 60 * 60)
+        
+        if municipality_code:
+            barangays = [b for b in result['barangays'] if b['municipality_code'] == municipality_code]
+            centre_ids = {b['nearest_centre_id'] for b in barangays}
+            result = {
+                **result,
+                'municipality_code': municipality_code,
+                'barangays': barangays,
+                'centres': [c for c in result['centres'] if c['id'] in centre_ids],
+                'underserved_barangay_count': sum(1 for b in barangays if b['uncovered_population'] > 0),
+            }
+        
+        return Response(result)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_barangay_neighbors(request):
+    """
+    A barangay and its neighbours side by side: hazard exposure,
+    characteristics and zonal value statistics
+    
+    Query params:
+    - code: barangay adm4_pcode
+    """
+    try:
+        from .adjacency import barangay_neighbors
+        
+        barangay_code = request.GET.get('code')
+        if not barangay_code:
+            return Response({'error': 'Barangay code not provided'}, status=400)
+        
+        result = barangay_neighbors(barangay_code)
+        if result is None:
+            return Response({'found': False, 'message': 'Barangay not found'})
+        
+        return Response({'found': True, **result})
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_job(request, job_id):
+    """Stage, features processed, rate and errors of an upload job"""
+    try:
+        from .jobs import job_status
+        from .models import IngestJob
+        
+        job = IngestJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=404)
+        
+        return Response(job_status(job))
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def get_data_version(request):
+    """Current data version (bumped on every activation; key caches on it) and the active dataset of each layer"""
+    try:
+        from .versioning import data_version
+        
+        active = HazardDataset.objects.filter(status='active').order_by('dataset_type', 'scope', 'version').values(
+            'id', 'dataset_type', 'scope', 'version', 'activated_at',
+        )
+        return Response({'version': data_version(), 'active': list(active)})
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
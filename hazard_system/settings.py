@@ -117,4 +117,31 @@ CACHES = {
             'MAX_ENTRIES': 10000  # Store up to 10k cached locations
         }
     }
-}
\ No newline at end of file
+}
+
+# Local analysis data (road graph, precomputed rasters)
+DATA_DIR = BASE_DIR / 'data'
+
+# Road graph built by `python manage.py build_road_graph`
+ROAD_GRAPH_PATH = DATA_DIR / 'road_graph.npz'
+
+# Facility distance/count rasters built by `python manage.py build_accessibility_rasters`
+ACCESSIBILITY_RASTER_DIR = DATA_DIR / 'accessibility'
+
+# Suitability COG and PNG tiles built by `python manage.py build_suitability_heatmap`
+SUITABILITY_HEATMAP_DIR = DATA_DIR / 'suitability'
+
+# Uploads waiting for an ingest worker (deleted once processed)
+INGEST_UPLOAD_DIR = DATA_DIR / 'uploads'
+
+# Process queued uploads in a thread of the web process; set to False when
+# running `python manage.py run_ingest_worker` instead
+INGEST_THREAD_WORKER = True
+
+# A running job whose progress has not been written for this long lost its
+# worker (the progress thread writes every second) and is marked failed
+INGEST_STALE_JOB_SECONDS = 300
+
+# Processes that parse and reproject geometries of large shapefile/GDB
+# uploads; 1 transforms them in the loading process
+INGEST_PROCESS_WORKERS = min(4, os.cpu_count() or 1)
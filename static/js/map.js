@@ -882,6 +882,13 @@ async function handleFileUpload(e) {
 
     formData.append('shapefile', fileInput.files[0]);
     formData.append('dataset_type', datasetType);
+    if (document.getElementById('upsert-mode').checked) {
+        formData.append('mode', 'upsert');
+    }
+    const province = document.getElementById('province-input').value.trim();
+    if (province) {
+        formData.append('province', province);
+    }
 
     showUploadProgress();
 
@@ -893,13 +900,20 @@ async function handleFileUpload(e) {
 
         const result = await response.json();
 
-        if (response.ok) {
-            showUploadResult(true, `Successfully processed ${result.records_created} records`);
+        if (!response.ok) {
+            showUploadResult(false, result.error || 'Upload failed');
+            return;
+        }
+
+        const job = await waitForIngestJob(result.status_url);
+        if (job.status === 'completed') {
+            const errors = job.error_count ? ` (${job.error_count} features skipped)` : '';
+            showUploadResult(true, `Successfully processed ${job.records_created} records${errors}`);
             setTimeout(() => {
                 location.reload();
             }, 2000);
         } else {
-            showUploadResult(false, result.error || 'Upload failed');
+            showUploadResult(false, job.message || 'Upload failed');
         }
     } catch (error) {
         showUploadResult(false, 'Network error occurred');
@@ -907,6 +921,31 @@ async function handleFileUpload(e) {
     }
 }
 
+async function waitForIngestJob(statusUrl) {
+    const label = document.querySelector('#upload-progress p');
+    const fill = document.querySelector('#upload-progress .progress-fill');
+
+    while (true) {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Could not read upload status');
+        }
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+
+        if (job.features_total) {
+            const rate = job.rate ? `, ${Math.round(job.rate)}/s` : '';
+            label.textContent = `${job.stage}: ${job.features_processed.toLocaleString()} of ${job.features_total.toLocaleString()} features${rate}`;
+            fill.style.width = `${job.progress}%`;
+        } else {
+            label.textContent = `${job.stage}...`;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 function showUploadProgress() {
     document.getElementById('upload-form').classList.add('hidden');
     document.getElementById('upload-progress').classList.remove('hidden');